@@ -1,54 +1,638 @@
-import shutil
+import asyncio
+import math
 import os
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import json
+import time
+import uuid
+from typing import Optional
+import redis
+import redis.asyncio as aioredis
+from fastapi import (APIRouter, Body, UploadFile, File, HTTPException,
+                     Request, WebSocket)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from celery.result import AsyncResult
 from app.core.config import settings
+from app.core.metrics import (JOB_PLANS, JOBS_CANCELLED, UPLOAD_BYTES,
+                              UPLOADS_REJECTED, collect_stage_times,
+                              render_metrics)
+from app.services.aligner import render_sheet_text, sheet_to_jsonl
+from app.services.assembly import reassemble
+from app.services.cache import (CHORD_ENGINES, ResultCache, hash_file,
+                                stage_fingerprints)
+from app.services.live import END_OF_STREAM, live_audio_key, live_channel
+from app.services.lyrics import LyricsCache
+from app.services.policy import TIERS, choose_plan
+from app.services.progress import (JobCancelled, cancel_key, encode_event,
+                                   progress_channel)
+from app.services.results import MAX_PAGE_SIZE, ResultStore, task_payload
+from app.services.scheduler import (PRIORITY_CLASSES, JobScheduler,
+                                    admission_delay)
+from app.services.ingest import (UploadRejected, normalize_audio,
+                                 parse_filename, probe_duration, save_upload)
 
-# This imports the task name so we can send work to it
-# We use send_task to avoid importing heavy libraries in the API
-from workers.tasks import celery_app
+# Task signatures only: work is sent by task name (send_task), so the API
+# never imports the ML stack (see benchmarks/bench_startup.py)
+from workers.celery_app import celery_app
+from workers.pipeline import submit_job
 
 router = APIRouter()
 
+# The worker's result cache: duplicate detection, and the sheets rebuilt
+# by /songs/{id}/relyric
+result_cache = ResultCache(settings.CACHE_DIR,
+                           max_bytes=settings.CACHE_MAX_BYTES,
+                           enabled=settings.CACHE_ENABLED)
+
+# Finished jobs: read before the Celery backend, whose results expire.
+# Opened on first use (get_result_store), so importing the API creates no file
+result_store = None
+# Lyrics corrected through /songs/{id}/relyric go to the workers' cache
+lyrics_cache = None
+
+
+# Scheduler state and cancellation flags
+redis_client = redis.Redis.from_url(settings.CELERY_RESULT_BACKEND)
+
+# In-flight dedupe, priorities and wait estimates (SCHEDULER_ENABLED)
+scheduler = (JobScheduler(
+    redis_client,
+    inflight_ttl=settings.SCHEDULER_INFLIGHT_TTL,
+    client_share=settings.SCHEDULER_CLIENT_SHARE,
+    default_job_seconds=settings.SCHEDULER_DEFAULT_JOB_SECONDS)
+    if settings.SCHEDULER_ENABLED else None)
+
+
+def _client_id(request: Request) -> str:
+    # Clients behind one proxy can tell themselves apart with a header
+    return (request.headers.get("X-Client-Id")
+            or (request.client.host if request.client else "anonymous"))
+
+
+def _queue_estimate(task_id: str) -> Optional[dict]:
+    if scheduler is None:
+        return None
+    try:
+        return scheduler.estimate(task_id)
+    except redis.RedisError:
+        return None
+
+
+def _expected_wait() -> Optional[float]:
+    # Load signal of the policy; unknown (None) without the scheduler
+    if scheduler is None:
+        return None
+    try:
+        return scheduler.backlog()["estimated_wait_seconds"]
+    except redis.RedisError:
+        return None
+
+
+def _cached_sheet(sheet_key: str) -> Optional[dict]:
+    cached = result_cache.get_json("sheet", sheet_key)
+    if cached is None:
+        return None
+    return {"task_id": None, "status": "SUCCESS",
+            "result": cached["sheet_text"], "sheet": cached.get("sheet"),
+            "cached": True}
+
+
+def get_result_store() -> Optional[ResultStore]:
+    global result_store
+    if result_store is None and settings.RESULT_STORE_FILE:
+        result_store = ResultStore(settings.RESULT_STORE_FILE)
+    return result_store
+
+
+def get_lyrics_cache() -> Optional[LyricsCache]:
+    global lyrics_cache
+    if lyrics_cache is None and settings.LYRICS_CACHE_FILE:
+        lyrics_cache = LyricsCache(settings.LYRICS_CACHE_FILE,
+                                   ttl=settings.LYRICS_CACHE_TTL,
+                                   miss_ttl=settings.LYRICS_MISS_TTL)
+    return lyrics_cache
+
+
+def _stored_job(task_id: str) -> Optional[dict]:
+    store = get_result_store()
+    return store.get(task_id) if store is not None else None
+
+
+def _task_result(task_id: str):
+    """
+    (status, result) of a job: the result store row if it finished,
+    otherwise whatever Celery has (PENDING, PROGRESS + event, ...).
+    """
+    record = _stored_job(task_id)
+    if record is not None:
+        return "SUCCESS", task_payload(record)
+    task_result = AsyncResult(task_id, app=celery_app)
+    return task_result.status, task_result.result
+
 
 @router.post("/upload")
-async def upload_song(file: UploadFile = File(...)):
-    # 1. Save the file locally so the Worker can find it
-    file_location = os.path.join(settings.RAW_DATA_PATH, file.filename)
+async def upload_song(request: Request, file: UploadFile = File(...),
+                      chord_mode: Optional[str] = None,
+                      priority: str = "interactive",
+                      tier: Optional[str] = None):
+    # chord_mode=fast: quick draft chords (see CHORD_MODE in config.py)
+    if chord_mode is not None and chord_mode not in CHORD_ENGINES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown chord_mode: {chord_mode}")
+    # tier=best|balanced|fast: how far the job may be degraded under load
+    if tier is not None and tier not in TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown tier: {tier}")
+    # priority=bulk: imports that should not hold interactive users back
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown priority: {priority}")
+
+    # 0. Admission control: with a backlog this long, a new job would only
+    # wait. Checked before the body is read, so a turned-away client has
+    # not uploaded anything (cached sheets included: their hash is unknown).
+    expected_wait = await run_in_threadpool(_expected_wait)
+    retry_after = admission_delay(
+        expected_wait, settings.ADMISSION_BULK_MAX_WAIT_SECONDS
+        if priority == "bulk" else settings.ADMISSION_MAX_WAIT_SECONDS)
+    if retry_after is not None:
+        UPLOADS_REJECTED.labels(priority).inc()
+        raise HTTPException(
+            status_code=503,
+            detail=f"Queue is full (about {expected_wait:.0f}s of waiting "
+                   f"work); try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))})
+
+    # 1. Stream the file to disk in chunks, hashing it on the way.
+    # The on-disk name is the content hash, never the client's filename.
+    try:
+        upload = await save_upload(file, settings.RAW_DATA_PATH,
+                                   max_bytes=settings.MAX_UPLOAD_BYTES,
+                                   chunk_size=settings.UPLOAD_CHUNK_SIZE)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    UPLOAD_BYTES.inc(upload.size)
+    artist, title = parse_filename(upload.original_name)
+
+    # 2. Duplicate upload: the sheet is already cached, skip the queue entirely
+    # (a full-quality sheet serves every tier). Normalized jobs are keyed by
+    # the re-encode instead (step 3)
+    audio_hash = upload.content_hash
+    if not settings.UPLOAD_NORMALIZE:
+        sheet_key = result_cache.sheet_key(audio_hash, settings, artist,
+                                           title, chord_mode)
+        cached = _cached_sheet(sheet_key)
+        if cached is not None:
+            return cached
+
+    # 3. Limits and optional normalization (blocking tools, so off the event loop)
+    duration = await run_in_threadpool(probe_duration, upload.path)
+    if duration is not None and duration > settings.MAX_UPLOAD_SECONDS:
+        os.remove(upload.path)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio is longer than {settings.MAX_UPLOAD_SECONDS:.0f} seconds")
 
-    # Write the uploaded file to disk
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_location = upload.path
+    if settings.UPLOAD_NORMALIZE:
+        try:
+            file_location = await run_in_threadpool(normalize_audio,
+                                                    upload.path)
+        except UploadRejected as e:
+            os.remove(upload.path)
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        # The job runs on the mono re-encode: its stems, words and sheet are
+        # cached under the re-encode's hash, apart from full-quality results
+        audio_hash = await run_in_threadpool(hash_file, file_location)
+        sheet_key = result_cache.sheet_key(audio_hash, settings, artist,
+                                           title, chord_mode)
+        cached = _cached_sheet(sheet_key)
+        if cached is not None:
+            return cached
 
-    # 2. Send the task to the Worker (Celery)
-    # "process_audio_task" matches the name in workers/tasks.py
-    task = celery_app.send_task("process_audio_task", args=[file_location])
+    # 4. The job's plan: Whisper model, beam size, compute type and chord
+    # mode from its tier, its duration and the queue's backlog
+    plan = None
+    if settings.POLICY_ENABLED:
+        plan = choose_plan(settings, tier, duration, expected_wait,
+                           chord_mode)
+        chord_mode = plan["chord_mode"]
+        JOB_PLANS.labels(plan["tier"], str(plan["step"])).inc()
+        if plan["step"] > 0:
+            sheet_key = result_cache.sheet_key(audio_hash, settings,
+                                               artist, title, chord_mode, plan)
+            cached = _cached_sheet(sheet_key)
+            if cached is not None:
+                return cached
 
-    # 3. Return the Task ID to the user immediately
-    return {"task_id": task.id}
+    # 5. Send the job to the Workers (Celery): one process_audio_task, or
+    # the stage workflow with PIPELINE_MODE=stages
+    def enqueue(task_id: str = None, priority: int = None) -> str:
+        return submit_job(celery_app, file_location,
+                          original_name=upload.original_name,
+                          audio_hash=audio_hash,
+                          enqueued_at=time.time(), chord_mode=chord_mode,
+                          task_id=task_id, priority=priority, plan=plan)
+
+    if scheduler is None:
+        return {"task_id": await run_in_threadpool(enqueue), "plan": plan}
+
+    # The same song already in flight (same sheet key) joins that job
+    scheduled = await run_in_threadpool(scheduler.submit, sheet_key,
+                                        _client_id(request), priority, enqueue)
+
+    # 6. Return the Task ID to the user immediately
+    return {"task_id": scheduled["task_id"],
+            "deduplicated": scheduled["deduplicated"], "plan": plan,
+            "queue": await run_in_threadpool(_queue_estimate,
+                                             scheduled["task_id"])}
 
 
 @router.get("/status/{task_id}")
 async def get_status(task_id: str):
-    # 1. Ask Redis about the status of this task ID
-    task_result = AsyncResult(task_id, app=celery_app)
+    # 1. Finished jobs come from the result store; Redis is only asked
+    # about jobs that are still running
+    status, data = await run_in_threadpool(_task_result, task_id)
 
     response = {
         "task_id": task_id,
-        "status": task_result.status,  # PENDING, STARTED, SUCCESS, FAILURE
+        "status": status,  # PENDING, STARTED, SUCCESS, FAILURE
     }
 
     # 2. If finished, attach the result
-    if task_result.status == "SUCCESS":
+    if status == "SUCCESS":
         # The worker returns a dict like {"status": "SUCCESS", "sheet_text": "..."}
         # We extract the sheet_text from it
-        data = task_result.result
         if isinstance(data, dict) and "sheet_text" in data:
             response["result"] = data["sheet_text"]
+            response["sheet"] = data.get("sheet")
         else:
             response["result"] = str(data)
 
-    elif task_result.status == "FAILURE":
-        response["error"] = str(task_result.result)
+    elif status == "FAILURE":
+        response["error"] = str(data)
+
+    elif status == "REVOKED":
+        # Cancelled before a worker started it (DELETE /jobs/{task_id})
+        response["error"] = str(JobCancelled())
+
+    elif status == "PROGRESS":
+        # Latest stage event published by the worker
+        response["progress"] = data
+
+    if status in ("PENDING", "STARTED", "PROGRESS"):
+        # Queue position and estimated wait (None once running or unknown)
+        response["queue"] = await run_in_threadpool(_queue_estimate, task_id)
+
+    return response
+
+
+def _progress_snapshot(task_id: str) -> dict:
+    """
+    Current state of a task as a progress event, so a client that connects
+    late (or after the job finished) still gets a complete picture.
+    """
+    status, data = _task_result(task_id)
+
+    if status == "PROGRESS" and isinstance(data, dict):
+        return data
+    if status == "SUCCESS":
+        if isinstance(data, dict) and data.get("status") == "ERROR":
+            return {"stage": "error", "percent": 100,
+                    "message": data.get("message", "")}
+        sheet_text = data.get("sheet_text") if isinstance(data, dict) else str(data)
+        return {"stage": "done", "percent": 100, "message": "Sheet ready",
+                "partial": {"sheet_text": sheet_text}}
+    if status == "FAILURE":
+        return {"stage": "error", "percent": 100, "message": str(data)}
+    if status == "REVOKED":
+        return {"stage": "error", "percent": 100,
+                "message": str(JobCancelled())}
+    event = {"stage": "queued", "percent": 0, "message": status}
+    queue = _queue_estimate(task_id)
+    if queue is not None and queue["position"] is not None:
+        event["message"] = (f"Queued (#{queue['position'] + 1}, about "
+                            f"{queue['estimated_wait_seconds']:.0f}s)")
+        event["queue"] = queue
+    return event
+
+
+@router.get("/events/{task_id}")
+async def stream_events(task_id: str):
+    """
+    Server-Sent Events stream of a task's progress (one connection per client
+    instead of polling /status). Ends after the 'done' or 'error' event.
+    """
+    async def event_stream():
+        client = aioredis.from_url(settings.CELERY_RESULT_BACKEND)
+        pubsub = client.pubsub()
+        # Subscribe BEFORE reading the snapshot, so no event falls in between
+        await pubsub.subscribe(progress_channel(task_id))
+        try:
+            snapshot = await run_in_threadpool(_progress_snapshot, task_id)
+            yield encode_event(snapshot)
+            if snapshot["stage"] in ("done", "error"):
+                return
+
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+                if message is None:
+                    # SSE comment line: keeps proxies from closing the stream
+                    yield ": keep-alive\n\n"
+                    continue
+
+                event = json.loads(message["data"])
+                yield encode_event(event)
+                if event["stage"] in ("done", "error"):
+                    return
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/live")
+async def live_session(websocket: WebSocket, title: Optional[str] = None):
+    """
+    Near-live chord sheet of an audio stream (see app/services/live.py).
+    The client sends binary frames of 16-bit mono PCM at LIVE_SAMPLE_RATE,
+    then the text frame "end". The server sends JSON events:
+      {"type": "session", "session_id"}  the result is stored as live-{id}
+      {"type": "update", "time", "committed", "tentative", "behind"}
+          every LIVE_HOP_SECONDS of audio; committed words and chords are
+          sent once, tentative ones are replaced by the next update
+      {"type": "final", ..., "sheet", "sheet_text"}, then {"type": "closed"}
+    The analysis runs on a worker of the 'live' queue; this endpoint only
+    relays audio and events through Redis. Without one (LIVE_ENABLED off,
+    or no worker took the session within LIVE_START_TIMEOUT) the client
+    gets {"type": "error", "message"} and the socket closes with 1013; a
+    worker that dies mid-session gets it an error and 1011.
+    """
+    await websocket.accept()
+    if not settings.LIVE_ENABLED:
+        await websocket.send_json({"type": "error",
+                                   "message": "Live mode is disabled"})
+        await websocket.close(code=1013)
+        return
+    session_id = uuid.uuid4().hex
+    key = live_audio_key(session_id)
+    client = aioredis.from_url(settings.CELERY_RESULT_BACKEND)
+    pubsub = client.pubsub()
+    # Subscribe BEFORE the task starts, so no event falls in between
+    await pubsub.subscribe(live_channel(session_id))
+
+    async def forward() -> bool:
+        """Relays events until "closed" (True) or the worker is gone (False)."""
+        # A live worker sends an update every hop while audio comes in and
+        # closes the session after LIVE_IDLE_TIMEOUT without: this long a
+        # silence means it died without its "closed" (OOM, time limit)
+        dead_after = 2 * settings.LIVE_IDLE_TIMEOUT
+        last_event = time.monotonic()
+        while time.monotonic() - last_event < dead_after:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            if message is None:
+                continue
+            last_event = time.monotonic()
+            event = json.loads(message["data"])
+            await websocket.send_json(event)
+            if event["type"] == "closed":
+                return True
+        return False
+
+    async def started() -> bool:
+        # A worker's first event is "ready"
+        deadline = time.monotonic() + settings.LIVE_START_TIMEOUT
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=max(0.1, deadline - time.monotonic()))
+            if message is not None:
+                await websocket.send_json(json.loads(message["data"]))
+                return True
+        return False
+
+    forwarder = None
+    try:
+        task = await run_in_threadpool(celery_app.send_task, "live.session",
+                                       args=[session_id],
+                                       kwargs={"title": title})
+        await websocket.send_json({"type": "session",
+                                   "session_id": session_id})
+        if not await started():
+            await run_in_threadpool(task.revoke)
+            await websocket.send_json({"type": "error",
+                                       "message": "No live worker available"})
+            await websocket.close(code=1013)
+            return
+        forwarder = asyncio.create_task(forward())
+
+        finished = False
+        while not finished:
+            receiver = asyncio.ensure_future(websocket.receive())
+            await asyncio.wait({receiver, forwarder},
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not receiver.done():
+                # The session ended before the client did
+                receiver.cancel()
+                if forwarder.exception() is not None:
+                    return  # Sending failed: the client is gone too
+                if not forwarder.result():
+                    await websocket.send_json({
+                        "type": "error", "message": "The live worker stopped"})
+                await websocket.close(code=1000 if forwarder.result()
+                                      else 1011)
+                return
+            message = receiver.result()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                await client.rpush(key, message["bytes"])
+                # Audio of a session no worker picked up does not pile up
+                await client.expire(key, int(2 * settings.LIVE_IDLE_TIMEOUT))
+            elif message.get("text") == "end":
+                finished = True
+        # The worker stores the sheet either way; only a client that said
+        # "end" is still there for the final event
+        await client.rpush(key, END_OF_STREAM)
+        if finished:
+            try:
+                await asyncio.wait_for(forwarder,
+                                       timeout=settings.LIVE_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            await websocket.close()
+    finally:
+        if forwarder is not None and not forwarder.done():
+            forwarder.cancel()
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
+
+
+@router.get("/sheet/{task_id}")
+async def get_sheet(task_id: str, format: str = "jsonl"):
+    """
+    The finished structured sheet.
+    format=jsonl streams a header and then one JSON object per line, so the
+    frontend can render the top of a long sheet before the rest arrives;
+    format=json returns it whole, format=text as plain text.
+    """
+    if format not in ("jsonl", "json", "text"):
+        raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
+    status, data = await run_in_threadpool(_task_result, task_id)
+    if status != "SUCCESS":
+        data = None
+    if not isinstance(data, dict) or not data.get("sheet"):
+        raise HTTPException(status_code=404, detail="Sheet not ready")
+
+    sheet = data["sheet"]
+    if format == "json":
+        return sheet
+    if format == "text":
+        return Response(content=render_sheet_text(sheet),
+                        media_type="text/plain")
+    return StreamingResponse(sheet_to_jsonl(sheet),
+                             media_type="application/x-ndjson")
+
+
+def _require_store() -> ResultStore:
+    store = get_result_store()
+    if store is None:
+        raise HTTPException(status_code=404,
+                            detail="Result store disabled (RESULT_STORE_FILE)")
+    return store
+
+
+@router.get("/songs")
+async def list_songs(artist: Optional[str] = None, title: Optional[str] = None,
+                     audio_hash: Optional[str] = None,
+                     status: Optional[str] = None, limit: int = 20,
+                     offset: int = 0):
+    """
+    Past jobs, newest first, one page at a time. artist and title match
+    by case-insensitive prefix; audio_hash finds every job of one file.
+    Items leave out words, chords and the sheet: see /songs/{id}.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE or offset < 0:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be 1-{MAX_PAGE_SIZE} and offset >= 0")
+    store = _require_store()
+    total, items = await run_in_threadpool(store.search, artist, title,
+                                           audio_hash, status, limit, offset)
+    next_offset = offset + len(items)
+    return {"total": total, "limit": limit, "offset": offset,
+            "next_offset": next_offset if next_offset < total else None,
+            "items": items}
+
+
+@router.get("/songs/{song_id}")
+async def get_song(song_id: str):
+    """One finished job: metadata, stage timings, words, chords and sheet."""
+    record = await run_in_threadpool(_require_store().get, song_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Song not found")
+    return record
+
+
+def _relyric(song_id: str, lyrics: Optional[str]) -> dict:
+    store = _require_store()
+    record = store.get(song_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Song not found")
+    if record["status"] != "SUCCESS":
+        raise HTTPException(status_code=409, detail="Song has no sheet")
+    with collect_stage_times() as timings:
+        try:
+            result = reassemble(record, lyrics)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    # Same id: /status and /sheet of the job now return the new sheet
+    store.put(song_id, "SUCCESS", audio_hash=record["audio_hash"],
+              artist=record["artist"], title=record["title"],
+              original_name=record["original_name"],
+              chord_mode=record["chord_mode"],
+              enqueued_at=record["enqueued_at"], result=result,
+              timings=dict(record["timings"] or {}, **timings),
+              fingerprints=record["fingerprints"])
+
+    # The next upload of the song gets the new sheet from the result cache,
+    # and a full re-run the corrected lyrics
+    if record["audio_hash"]:
+        sheet_fp = (record["fingerprints"] or {}).get("sheet") or \
+            stage_fingerprints(settings, record["chord_mode"])["sheet"]
+        result_cache.put_json("sheet", result_cache.stored_sheet_key(
+            record["audio_hash"], sheet_fp, record["artist"], record["title"]),
+            result)
+    if lyrics is not None and get_lyrics_cache() is not None:
+        get_lyrics_cache().put(record["artist"], record["title"],
+                               lyrics or None, source="relyric")
+    return {"id": song_id, "status": "SUCCESS",
+            "sheet_text": result["sheet_text"], "sheet": result["sheet"],
+            "timings": timings}
+
+
+@router.post("/songs/{song_id}/relyric")
+async def relyric_song(song_id: str,
+                       lyrics: Optional[str] = Body(None, embed=True)):
+    """
+    Rebuilds a finished song's sheet from its stored Whisper words and
+    chords: body {"lyrics": "..."} replaces the lyrics, no body re-runs
+    sync and layout with the current rules. No worker, no audio: this
+    takes milliseconds, so lyrics can be edited interactively.
+    """
+    return await run_in_threadpool(_relyric, song_id, lyrics)
+
+
+def _cancel_job(task_id: str) -> dict:
+    status = AsyncResult(task_id, app=celery_app).status
+    if _stored_job(task_id) is not None or status in ("SUCCESS", "FAILURE",
+                                                      "REVOKED"):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    # Celery reports ids it never saw as PENDING; the scheduler knows
+    if (status == "PENDING" and scheduler is not None
+            and _queue_estimate(task_id) is None):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # A running job stops at its next checkpoint; its stage workers and
+    # Demucs process are killed (see ProgressReporter.checkpoint)
+    redis_client.set(cancel_key(task_id), 1,
+                     ex=int(settings.SCHEDULER_INFLIGHT_TTL))
+    # A queued one is dropped by the worker that receives it
+    celery_app.control.revoke(task_id)
+    if scheduler is not None:
+        # Frees its queue slot and dedupe key: the next upload runs anew
+        scheduler.finished(task_id, timed=False)
+    redis_client.publish(progress_channel(task_id), json.dumps(
+        {"stage": "error", "percent": 100, "message": str(JobCancelled())}))
+    JOBS_CANCELLED.inc()
+    return {"task_id": task_id, "status": "CANCELLED", "previous": status}
+
+
+@router.delete("/jobs/{task_id}")
+async def cancel_job(task_id: str):
+    """
+    Cancels a queued or running job (409 once it finished). Clients that
+    joined it as a duplicate upload see it fail too.
+    """
+    try:
+        return await run_in_threadpool(_cancel_job, task_id)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Redis unavailable")
+
 
-    return response
\ No newline at end of file
+@router.get("/metrics")
+def metrics():
+    # Prometheus scrape endpoint for the API process(es)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,340 @@
+"""
+Offline batch processing of a music library, without Celery, Redis or HTTP.
+
+    python -m app.batch /music/library --separation-workers 1 \\
+        --analysis-workers 3 --summary data/batch_summary.json
+
+Songs are pipelined across two process pools: separation workers run
+Demucs on the next tracks while analysis workers (lyrics, Whisper, chords,
+alignment) finish the ones before. Stems go from one pool to the other
+through the result cache, so CACHE_DIR needs room for the tracks in flight.
+
+- Songs whose sheet is already in the result cache or the result store
+  (same content hash, chord mode and Whisper settings) are skipped;
+  --force redoes them.
+- Every finished file is appended to the checkpoint (JSON lines), so an
+  interrupted run started again with the same --checkpoint resumes where
+  it stopped, without even rehashing the files it already saw.
+- Finished songs are saved to the result store like API jobs, and the
+  summary lists per-file timings.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import inference_device, settings
+from app.core.metrics import collect_stage_times
+from app.services.cache import (CHORD_ENGINES, ResultCache, hash_file,
+                                stage_fingerprints)
+from app.services.ingest import parse_filename
+from app.services.results import ResultStore
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".flac", ".ogg", ".m4a", ".aac", ".opus",
+                    ".aiff", ".aif", ".wma"}
+
+# Per-process state of the pool workers (see _init_separation/_init_analysis)
+_engine = None
+_generator = None
+
+
+def find_audio_files(root: str) -> List[str]:
+    return sorted(str(path) for path in Path(root).rglob("*")
+                  if path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS)
+
+
+def _file_id(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size,
+            "mtime": stat.st_mtime}
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict]:
+    """Last checkpoint entry per file path; a torn last line is ignored."""
+    entries = {}
+    if not path or not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def _cache() -> ResultCache:
+    return ResultCache(settings.CACHE_DIR, max_bytes=settings.CACHE_MAX_BYTES,
+                       enabled=settings.CACHE_ENABLED)
+
+
+def _store() -> Optional[ResultStore]:
+    return (ResultStore(settings.RESULT_STORE_FILE)
+            if settings.RESULT_STORE_FILE else None)
+
+
+def _sheet_key(cache: ResultCache, path: str, audio_hash: str,
+               chord_mode: str) -> str:
+    artist, title = parse_filename(path)
+    return cache.sheet_key(audio_hash, settings, artist, title, chord_mode)
+
+
+def already_processed(cache: ResultCache, store: Optional[ResultStore],
+                      path: str, audio_hash: str, chord_mode: str) -> bool:
+    if cache.get_json("sheet", _sheet_key(cache, path, audio_hash,
+                                          chord_mode)) is not None:
+        return True
+    if store is None:
+        return False
+    # Only a sheet made with the current settings counts: the sheet
+    # fingerprint covers the chord mode, Whisper model, beam and compute type
+    sheet_fp = stage_fingerprints(settings, chord_mode)["sheet"]
+    _, jobs = store.search(audio_hash=audio_hash, status="SUCCESS")
+    for job in jobs:
+        fingerprints = (store.get(job["id"]) or {}).get("fingerprints") or {}
+        if fingerprints.get("sheet") == sheet_fp:
+            return True
+    return False
+
+
+# --- Pool workers (spawned processes: torch and CTranslate2 start clean) ---
+
+
+def _init_separation():
+    global _engine
+    from app.services.audio import AudioEngine, load_demucs_model
+    demucs = (load_demucs_model(settings.DEMUCS_MODEL,
+                                inference_device(),
+                                settings.DEMUCS_THREADS)
+              if settings.DEMUCS_IN_PROCESS else None)
+    _engine = AudioEngine(cache=_cache(), model=demucs)
+
+
+def _init_analysis():
+    global _generator
+    from app.services.orchestrator import ChordSheetGenerator
+    # Demucs only loads if a song's stems are missing from the cache
+    _generator = ChordSheetGenerator(load_demucs=False)
+
+
+def separate(path: str, audio_hash: str) -> Dict:
+    started = time.perf_counter()
+    with collect_stage_times() as timings:
+        # store=True: the analysis workers read the WAVs from the cache
+        stems = _engine.split_stems(path, audio_hash=audio_hash, store=True)
+    for stem in stems.values():
+        stem.release()
+    return {"seconds": round(time.perf_counter() - started, 3),
+            "timings": timings}
+
+
+def analyze(path: str, audio_hash: str, chord_mode: str = None) -> Dict:
+    started = time.perf_counter()
+    artist, title = parse_filename(path)
+    with collect_stage_times() as timings:
+        result = _generator.process_song(path, artist=artist, title=title,
+                                         audio_hash=audio_hash,
+                                         chord_mode=chord_mode)
+    seconds = round(time.perf_counter() - started, 3)
+
+    store = _store()
+    if store is not None:
+        # Same row as an API job, under an id that is stable across runs
+        job_id = "batch-" + _sheet_key(_generator.cache, path, audio_hash,
+                                       chord_mode)
+        store.put(job_id, "SUCCESS", audio_hash=audio_hash, artist=artist,
+                  title=title, original_name=Path(path).name,
+                  chord_mode=chord_mode, result=result,
+                  timings=dict(timings, total=seconds),
+                  fingerprints=stage_fingerprints(settings, chord_mode))
+    return {"seconds": seconds, "timings": timings}
+
+
+# --- Driver ---
+
+
+class BatchRun:
+    # Pool entry points per stage, (initializer, function): module-level,
+    # so the spawned workers can import them
+    stages = {"separation": (_init_separation, separate),
+              "analysis": (_init_analysis, analyze)}
+
+    def __init__(self, files: List[str], separation_workers: int = 1,
+                 analysis_workers: int = 1, chord_mode: str = None,
+                 checkpoint: str = None, force: bool = False):
+        self.files = files
+        self.separation_workers = separation_workers
+        self.analysis_workers = analysis_workers
+        self.chord_mode = chord_mode
+        self.checkpoint = checkpoint
+        self.force = force
+        self.entries: List[Dict] = []
+        # Without the cache the stems cannot be handed over: analysis
+        # workers then run whole songs, Demucs included
+        self.pipelined = settings.CACHE_ENABLED and separation_workers > 0
+
+    def _record(self, entry: Dict):
+        self.entries.append(entry)
+        if self.checkpoint:
+            with open(self.checkpoint, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        label = f"[{len(self.entries)}/{len(self.files)}]"
+        line = f"{label} {entry['status']:>7} {Path(entry['path']).name}"
+        if entry.get("total_seconds") is not None:
+            line += f" ({entry['total_seconds']:.1f}s)"
+        if entry.get("error"):
+            line += f": {entry['error']}"
+        print(line, flush=True)
+
+    def _plan(self) -> deque:
+        """Hashes new files and skips finished ones; returns the work queue."""
+        done = {} if self.force else load_checkpoint(self.checkpoint)
+        cache, store = _cache(), _store()
+        todo = deque()
+        for path in self.files:
+            entry = _file_id(path)
+            previous = done.get(entry["path"])
+            if (previous and previous["size"] == entry["size"]
+                    and previous["mtime"] == entry["mtime"]):
+                if previous["status"] in ("done", "skipped"):
+                    # Counted, but not written to the checkpoint again
+                    self.entries.append(dict(previous, status="resumed"))
+                    continue
+                entry["hash"] = previous["hash"]
+            else:
+                entry["hash"] = hash_file(path)
+
+            if not self.force and already_processed(
+                    cache, store, path, entry["hash"], self.chord_mode):
+                self._record(dict(entry, status="skipped"))
+                continue
+            todo.append(entry)
+        return todo
+
+    def run(self) -> List[Dict]:
+        todo = self._plan()
+        if not todo:
+            return self.entries
+
+        spawn = get_context("spawn")
+        init_separation, separate_song = self.stages["separation"]
+        init_analysis, analyze_song = self.stages["analysis"]
+        separation = (ProcessPoolExecutor(self.separation_workers,
+                                          mp_context=spawn,
+                                          initializer=init_separation)
+                      if self.pipelined else None)
+        analysis = ProcessPoolExecutor(self.analysis_workers, mp_context=spawn,
+                                       initializer=init_analysis)
+        # Separated songs wait on disk; keep a few ready, not the library
+        ahead = self.separation_workers + 2 * self.analysis_workers
+        running: Dict = {}  # future -> (stage, entry)
+        try:
+            while todo or running:
+                while todo and len(running) < ahead:
+                    entry = todo.popleft()
+                    entry["started_at"] = time.time()
+                    if separation is not None:
+                        future = separation.submit(separate_song,
+                                                   entry["path"], entry["hash"])
+                        running[future] = ("separation", entry)
+                    else:
+                        future = analysis.submit(analyze_song, entry["path"],
+                                                 entry["hash"], self.chord_mode)
+                        running[future] = ("analysis", entry)
+
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, entry = running.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        self._record(self._finish(entry, "failed",
+                                                  error=f"{stage}: {e}"))
+                        continue
+                    entry[f"{stage}_seconds"] = outcome["seconds"]
+                    entry.setdefault("timings", {}).update(outcome["timings"])
+                    if stage == "separation":
+                        future = analysis.submit(analyze_song, entry["path"],
+                                                 entry["hash"], self.chord_mode)
+                        running[future] = ("analysis", entry)
+                    else:
+                        self._record(self._finish(entry, "done"))
+        finally:
+            for pool in (separation, analysis):
+                if pool is not None:
+                    pool.shutdown(wait=True, cancel_futures=True)
+        return self.entries
+
+    @staticmethod
+    def _finish(entry: Dict, status: str, error: str = None) -> Dict:
+        entry = dict(entry, status=status)
+        entry["total_seconds"] = round(time.time() - entry.pop("started_at"), 3)
+        if error:
+            entry["error"] = error
+        return entry
+
+
+def summarize(entries: List[Dict], wall_seconds: float) -> Dict:
+    counts = {}
+    for entry in entries:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    processed = [e for e in entries if e["status"] == "done"]
+    busy = sum(e.get("total_seconds", 0.0) for e in processed)
+    return {
+        "files": len(entries),
+        "counts": counts,
+        "wall_seconds": round(wall_seconds, 3),
+        "songs_per_hour": (round(3600 * len(processed) / wall_seconds, 1)
+                           if wall_seconds and processed else None),
+        # > 1 means songs really overlapped
+        "pipeline_overlap": round(busy / wall_seconds, 2) if wall_seconds else None,
+        "entries": entries,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("directory", help="Library root (searched recursively)")
+    parser.add_argument("--separation-workers", type=int, default=1,
+                        help="Demucs processes (0 = no pipelining)")
+    parser.add_argument("--analysis-workers", type=int, default=1,
+                        help="Whisper/chords processes")
+    parser.add_argument("--chord-mode", choices=sorted(CHORD_ENGINES),
+                        default=None)
+    parser.add_argument("--checkpoint", default="data/batch_checkpoint.jsonl")
+    parser.add_argument("--summary", default="data/batch_summary.json")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess songs that already have a sheet")
+    args = parser.parse_args(argv)
+
+    files = find_audio_files(args.directory)
+    print(f"Found {len(files)} audio files in {args.directory}", flush=True)
+    started = time.perf_counter()
+    batch = BatchRun(files, separation_workers=args.separation_workers,
+                     analysis_workers=max(1, args.analysis_workers),
+                     chord_mode=args.chord_mode, checkpoint=args.checkpoint,
+                     force=args.force)
+    try:
+        batch.run()
+    except KeyboardInterrupt:
+        print("Interrupted: run the same command again to resume", flush=True)
+    finally:
+        summary = summarize(batch.entries, time.perf_counter() - started)
+        if args.summary:
+            Path(args.summary).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.summary, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+        print(f"{summary['counts']} in {summary['wall_seconds']:.0f}s "
+              f"({summary['songs_per_hour']} songs/hour)", flush=True)
+    return 0 if not summary["counts"].get("failed") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,185 @@
 import os
-import torch
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Chord Aligner AI"
 
-    # AI Config
-    INFERENCE_DEVICE: str = "cuda" if torch.cuda.is_available() else "cpu"
+    # AI Config. "auto" is resolved by inference_device()/compute_type()
+    # when a model loads, so the API never imports torch to read its config
+    INFERENCE_DEVICE: str = "auto"  # "auto" = cuda if available, else cpu
     WHISPER_MODEL_SIZE: str = "medium"
-    COMPUTE_TYPE: str = "float16" if torch.cuda.is_available() else "int8"
+    COMPUTE_TYPE: str = "auto"  # "auto" = float16 on cuda, int8 on cpu
+    WHISPER_BEAM_SIZE: int = 5  # Beam search width of full-quality jobs
+    # Batched Whisper: >0 decodes this many VAD chunks per forward pass and
+    # lets concurrent jobs in one process share a batch (0 = sequential)
+    WHISPER_BATCH_SIZE: int = 0
+    WHISPER_BATCH_MAX_WAIT: float = 0.2  # Seconds to wait for other jobs
+    # Vocal-activity pre-pass (see app/services/vocals.py): only the parts
+    # of the vocal stem with singing go to Whisper. Opt-in: quiet verses
+    # under VOCAL_LEVEL are dropped, so tune it on your catalogue first
+    VOCAL_PREPASS: bool = False
+    VOCAL_LEVEL: float = 0.5  # Threshold between bleed floor (0) and loud vocals (1)
+    VOCAL_MAX_FLATNESS: float = 0.3  # Noisier frames (drum bleed) are not vocal
+    VOCAL_MIN_GAP: float = 1.5  # Shorter pauses stay inside one region
+    VOCAL_PAD: float = 0.4  # Seconds added around every region
+    VOCAL_MAX_COVERAGE: float = 0.9  # Regions cover more: send the whole stem
+
+    # Demucs (stem separation)
+    DEMUCS_MODEL: str = "htdemucs"
+    DEMUCS_IN_PROCESS: bool = True  # Warm model in the worker instead of the CLI
+    DEMUCS_SEGMENT: Optional[float] = None  # Seconds per chunk (None = model default)
+    DEMUCS_OVERLAP: float = 0.25  # Overlap between chunks (CLI default)
+    DEMUCS_THREADS: int = 0  # torch intra-op threads (0 = torch default)
+    # Back stems with memory-mapped float32 files: lower peak RSS, and
+    # stage processes open the file instead of receiving a copy
+    AUDIO_BUFFER_MMAP: bool = False
+
+    # Chord recognition: "accurate" (madmom CNN+CRF) or "fast" (chroma,
+    # beat-synchronous Viterbi: a quick draft at a fraction of the CPU).
+    # Clients can pick per job with /upload?chord_mode=...
+    CHORD_MODE: str = "accurate"
+    # Stems longer than this are decoded in overlapping windows (bounded
+    # memory, chords as they are found); 0 = always
+    CHORD_STREAM_MIN_SECONDS: float = 900.0
+    CHORD_WINDOW_SECONDS: float = 120.0  # Audio each window decides
+    CHORD_WINDOW_CONTEXT: float = 10.0  # Extra audio on each side of a window
+
+    # Parallel stages: Whisper and madmom run in dedicated spawned processes
+    # so transcription, chord extraction and the Genius lookup overlap.
+    PARALLEL_STAGES: bool = False
+    TRANSCRIPTION_THREADS: int = 2  # CTranslate2/OMP threads for Whisper
+    HARMONY_THREADS: int = 1  # OMP/BLAS threads for madmom
+
+    # Worker model pool and sizing (see app/services/registry.py)
+    MODEL_PRELOAD: bool = True  # Load models at worker boot, not on the first job
+    MODEL_PRELOAD_TIMEOUT: float = 600.0  # Seconds a child may take to boot
+    MODEL_FOOTPRINTS_FILE: str = "data/model_footprints.json"  # Measured MB per model
+    WORKER_CONCURRENCY: int = 0  # Celery children (0 = from RAM/cores)
+    WORKER_RESERVED_MB: int = 1024  # Left for the OS, the parent and Redis
+    JOB_WORKING_MB: int = 1500  # Audio buffers and activations of one job
+
+    # Pipeline layout (see workers/pipeline.py)
+    # "monolithic": one process_audio_task per song on the 'celery' queue
+    # "stages": one task per stage, each on its own queue (separation,
+    # lyrics, transcription, chords, alignment) with its own workers
+    PIPELINE_MODE: str = "monolithic"
+    WORKER_QUEUES: str = "celery"  # Queues this worker consumes (decides its preload)
+    STAGE_MAX_RETRIES: int = 2  # Retries of a stage task after a transient error
+
+    # Scheduling in front of the queue (see app/services/scheduler.py):
+    # in-flight dedupe, interactive/bulk priorities, per-client fairness
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_CLIENT_SHARE: int = 2  # In-flight jobs per client before its next drop a step
+    SCHEDULER_INFLIGHT_TTL: float = 6 * 3600  # Seconds a queued job may wait before it counts as lost; started jobs hold a stage-timeout lease renewed by heartbeats
+    SCHEDULER_DEFAULT_JOB_SECONDS: float = 180.0  # Wait estimates before any job finished
+
+    # Time limits and cancellation (DELETE /jobs/{id}): jobs stop at the
+    # next stage checkpoint; Demucs CLI and stage worker processes are killed
+    STAGE_TIMEOUT_SECONDS: float = 1800.0  # Per stage (Demucs CLI, stage workers, stage tasks); 0 = none
+    TASK_SOFT_TIME_LIMIT: float = 3 * 3600.0  # process_audio_task fails after this (prefork pool only)
+    TASK_TIME_LIMIT: float = 3 * 3600.0 + 300  # ...and its worker child is killed after this
+    # Admission control on /upload: past this expected queue wait, uploads
+    # get 503 + Retry-After instead of a place in the queue (0 = never)
+    ADMISSION_MAX_WAIT_SECONDS: float = 2 * 3600.0
+    ADMISSION_BULK_MAX_WAIT_SECONDS: float = 1800.0  # Bulk imports are turned away sooner
+
+    # Per-job plans (see app/services/policy.py): Whisper model, beam size,
+    # compute type and chord mode from the quality tier (/upload?tier=...),
+    # the track's duration and the queue's backlog
+    POLICY_ENABLED: bool = True
+    POLICY_DEFAULT_TIER: str = "balanced"  # best, balanced or fast
+    POLICY_SHORT_SECONDS: float = 60.0  # Shorter tracks go one step up
+    POLICY_LONG_SECONDS: float = 480.0  # Longer tracks go one step down while other jobs wait
+    POLICY_TARGET_WAIT_SECONDS: float = 300.0  # One step down per this much expected wait (0 = ignore load)
+
+    # Live sessions (WebSocket /live, see app/services/live.py): a sliding
+    # window over the incoming audio, analyzed again every hop on the 'live'
+    # queue; results within the lookahead of the newest audio are tentative
+    LIVE_ENABLED: bool = False  # Needs a 'live' queue worker (docker compose --profile live)
+    LIVE_START_TIMEOUT: float = 30.0  # Seconds for a live worker to take a session
+    LIVE_WINDOW_SECONDS: float = 10.0  # Audio each update analyzes
+    LIVE_HOP_SECONDS: float = 1.0  # New audio between updates
+    LIVE_LOOKAHEAD_SECONDS: float = 2.0  # Newest audio whose results may still change
+    LIVE_LATENCY_BUDGET: float = 3.0  # Target seconds behind the input (benchmarks/bench_live.py)
+    LIVE_WHISPER_MODEL: str = "base"  # Small enough to keep up on CPU
+    LIVE_COMPUTE_TYPE: str = "int8"
+    LIVE_BEAM_SIZE: int = 1  # Greedy decoding
+    LIVE_CHORD_MODE: str = "fast"  # "accurate" (madmom) rarely keeps up on CPU
+    LIVE_SEPARATION: bool = False  # Demucs on every window: GPU only
+    LIVE_SAMPLE_RATE: int = 16000  # Of the PCM clients send (16-bit mono)
+    LIVE_IDLE_TIMEOUT: float = 30.0  # Seconds without audio before a session ends
+
+    # Lyrics (see app/services/lyrics.py)
+    LYRICS_PROVIDERS: str = "local,genius"  # Tried in this order
+    LYRICS_DIR: str = "data/lyrics"  # 'Artist - Title.txt/.lrc' files, works offline
+    LYRICS_CACHE_FILE: str = "data/lyrics_cache.sqlite3"  # Empty = no cache
+    LYRICS_CACHE_TTL: float = 30 * 24 * 3600  # Seconds found lyrics are kept
+    LYRICS_MISS_TTL: float = 24 * 3600  # Seconds a "not found" is kept
+    LYRICS_TIMEOUT: float = 10.0  # Seconds per Genius request
+    LYRICS_FETCH_THREADS: int = 2  # Lookups running next to the pipeline
 
     # Paths
     RAW_DATA_PATH: str = "data/raw"
     PROCESSED_DATA_PATH: str = "data/processed"
 
+    # Finished jobs (see app/services/results.py): /status, /sheet and /songs
+    # read them from here once the Celery result has expired
+    RESULT_STORE_FILE: str = "data/results.sqlite3"  # Empty = Celery backend only
+    # Also write {name}_final_sheet.txt/.json to PROCESSED_DATA_PATH
+    SHEET_EXPORTS: bool = False
+
+    # Uploads
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Bytes read/written per await
+    MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+    MAX_UPLOAD_SECONDS: float = 20 * 60
+    # Convert uploads to mono 44.1kHz PCM WAV before queueing them; their
+    # results are cached under the re-encode's hash, apart from the originals'
+    UPLOAD_NORMALIZE: bool = False
+
+    # Result Cache (content-addressed by audio hash)
+    CACHE_ENABLED: bool = True
+    CACHE_DIR: str = "data/cache"
+    CACHE_MAX_BYTES: int = 10 * 1024 ** 3  # 10 GB, LRU-evicted
+
     # Redis - Defaults to localhost for local development.
     # Docker Compose overrides these to 'redis://redis...'
     CELERY_BROKER_URL: str = "redis://127.0.0.1:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://127.0.0.1:6379/0"
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0  # SSE heartbeat interval
+
+    # Prometheus exporter of the Celery worker (0 = disabled).
+    # The API serves its own metrics at GET /metrics.
+    WORKER_METRICS_PORT: int = 9100
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     # Secrets
-    GENIUS_API_TOKEN: str
+    GENIUS_API_TOKEN: str = ""  # Empty = local lyrics only
 
 
 settings = Settings()
 
+
+@lru_cache(maxsize=1)
+def _cuda_available() -> bool:
+    import torch  # Deferred: hundreds of MB the API process never needs
+    return torch.cuda.is_available()
+
+
+def inference_device(config=settings) -> str:
+    if config.INFERENCE_DEVICE != "auto":
+        return config.INFERENCE_DEVICE
+    return "cuda" if _cuda_available() else "cpu"
+
+
+def compute_type(config=settings) -> str:
+    if config.COMPUTE_TYPE != "auto":
+        return config.COMPUTE_TYPE
+    return "float16" if inference_device(config).startswith("cuda") else "int8"
+
+
 os.makedirs(settings.RAW_DATA_PATH, exist_ok=True)
 os.makedirs(settings.PROCESSED_DATA_PATH, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,142 @@
+# app/core/metrics.py
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter,
+                               Gauge, Histogram, generate_latest, multiprocess,
+                               start_http_server)
+
+# Kept free of ML imports: both the API and the worker load this.
+#
+# Celery prefork children, stage workers and uvicorn workers are separate
+# processes. When PROMETHEUS_MULTIPROC_DIR is set, every process writes its
+# samples there and the exporter aggregates them.
+
+# Stages run from milliseconds (alignment) to many minutes (Demucs on CPU)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+                    600, 1200, 1800)
+
+STAGE_SECONDS = Histogram(
+    "chord_stage_seconds", "Wall time of one pipeline stage",
+    ["stage"], buckets=DURATION_BUCKETS)
+
+MODEL_LOAD_SECONDS = Histogram(
+    "chord_model_load_seconds", "Time to load a model into a process",
+    ["model"], buckets=DURATION_BUCKETS)
+
+# One series per live process (pid label in multiprocess mode)
+MODEL_MEMORY_BYTES = Gauge(
+    "chord_model_memory_bytes", "Resident memory added by loading a model",
+    ["model"], multiprocess_mode="liveall")
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "chord_queue_wait_seconds", "Time between upload and task start",
+    buckets=DURATION_BUCKETS)
+
+TASK_SECONDS = Histogram(
+    "chord_task_seconds", "Total duration of process_audio_task",
+    ["status"], buckets=DURATION_BUCKETS)
+
+CACHE_REQUESTS = Counter(
+    "chord_cache_requests_total", "Result cache lookups",
+    ["stage", "result"])
+
+AUDIO_SECONDS = Counter(
+    "chord_audio_seconds_total", "Seconds of audio run through the pipeline")
+
+REALTIME_FACTOR = Histogram(
+    "chord_realtime_factor", "Audio seconds processed per wall second (per job)",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64))
+
+UPLOAD_BYTES = Counter(
+    "chord_upload_bytes_total", "Bytes received by /upload")
+
+# Step 0 = the configured pipeline; higher steps are cheaper (policy.py)
+JOB_PLANS = Counter(
+    "chord_job_plans_total", "Jobs enqueued per quality tier and ladder step",
+    ["tier", "step"])
+
+UPLOADS_REJECTED = Counter(
+    "chord_uploads_rejected_total",
+    "Uploads turned away by admission control (queue too long)",
+    ["priority"])
+
+JOBS_CANCELLED = Counter(
+    "chord_jobs_cancelled_total", "DELETE /jobs/{id} calls that cancelled a job")
+
+
+LIVE_LAG_SECONDS = Histogram(
+    "chord_live_lag_seconds",
+    "How far a live session's updates trail the client's audio",
+    buckets=(0.25, 0.5, 1, 1.5, 2, 3, 4, 6, 10, 20))
+
+# Per-job stage times for the result store (see collect_stage_times)
+_stage_times: ContextVar = ContextVar("stage_times", default=None)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Times a block into chord_stage_seconds{stage=...}.
+    Usage: with stage_timer("demucs"): ...
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        times = _stage_times.get()
+        if times is not None:
+            times[stage] = round(times.get(stage, 0.0) + elapsed, 3)
+
+
+@contextmanager
+def collect_stage_times() -> Iterator[Dict[str, float]]:
+    """
+    Also sums every stage_timer() of this job into the yielded dict
+    (windowed stages add up). Only timers in the calling thread count:
+    stage worker processes and lookup threads report to Prometheus only.
+    """
+    times: Dict[str, float] = {}
+    token = _stage_times.set(times)
+    try:
+        yield times
+    finally:
+        _stage_times.reset(token)
+
+
+@contextmanager
+def model_load_timer(model: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        MODEL_LOAD_SECONDS.labels(model).observe(time.perf_counter() - start)
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    from prometheus_client import REGISTRY
+    return REGISTRY
+
+
+def render_metrics():
+    """(body, content_type) for a /metrics endpoint."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def serve_metrics(port: int):
+    """Starts the standalone exporter (used by the Celery worker)."""
+    start_http_server(port, registry=_registry())
+
+
+def mark_process_dead(pid: int):
+    """Drops a dead process's live gauges from the multiprocess directory."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
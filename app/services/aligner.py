@@ -1,13 +1,318 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
+import bisect
 import difflib
+import json
+import re
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+
+# Regions between anchors up to this many DP cells are solved exactly
+FULL_DP_CELLS = 10_000
+# Larger regions without anchors are solved in a band around the diagonal
+DP_BAND = 64
+# Second-chance anchors: tokens seen equally often (at most this much) on both sides
+RARE_TOKEN_COUNT = 4
+_UNREACHABLE = -(2 ** 30)
+
+# Structured sheet layout
+SHEET_FORMAT_VERSION = 1
+LINE_GAP_SECONDS = 1.0  # A pause this long ends a line
+SECTION_GAP_SECONDS = 4.0  # ...and this long ends a section
+MAX_LINE_WORDS = 12
+
+
+def normalize_token(token: str) -> str:
+    """'Night,' and 'night' are the same word for matching purposes."""
+    normalized = _PUNCTUATION.sub("", token.lower())
+    return normalized or token.lower()
+
+
+def encode_tokens(*token_lists: List[str]) -> List[np.ndarray]:
+    """Interns normalized tokens into one shared vocabulary of int32 ids."""
+    vocab, seen = {}, {}
+
+    def intern(token):
+        # Songs repeat words a lot; normalize each distinct spelling once
+        if token not in seen:
+            seen[token] = vocab.setdefault(normalize_token(token), len(vocab))
+        return seen[token]
+
+    return [np.fromiter(map(intern, tokens), dtype=np.int32, count=len(tokens))
+            for tokens in token_lists]
+
+
+def _longest_increasing(values: List[int]) -> List[int]:
+    """Indices of a longest strictly increasing subsequence (patience sort)."""
+    tails, tail_index = [], []
+    previous = [-1] * len(values)
+    for k, value in enumerate(values):
+        pos = bisect.bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+            tail_index.append(k)
+        else:
+            tails[pos] = value
+            tail_index[pos] = k
+        previous[k] = tail_index[pos - 1] if pos else -1
+
+    chain = []
+    k = tail_index[-1] if tail_index else -1
+    while k != -1:
+        chain.append(k)
+        k = previous[k]
+    return chain[::-1]
+
+
+def _anchors(a: np.ndarray, b: np.ndarray,
+             max_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Candidate (i, j) anchor pairs: tokens that occur equally often in both
+    sides, at most 'max_count' times; the k-th occurrence pairs with the k-th.
+    Returned sorted by i; the caller keeps only a non-crossing chain.
+    """
+    a_vals, a_counts = np.unique(a, return_counts=True)
+    b_vals, b_counts = np.unique(b, return_counts=True)
+    common, ai, bi = np.intersect1d(a_vals, b_vals, assume_unique=True,
+                                    return_indices=True)
+    tokens = common[(a_counts[ai] == b_counts[bi]) & (a_counts[ai] <= max_count)]
+    if not len(tokens):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    a_pos = np.flatnonzero(np.isin(a, tokens))
+    b_pos = np.flatnonzero(np.isin(b, tokens))
+    # Group by token (stable keeps occurrences in order), then pair up
+    a_pos = a_pos[np.argsort(a[a_pos], kind="stable")]
+    b_pos = b_pos[np.argsort(b[b_pos], kind="stable")]
+    order = np.argsort(a_pos)
+    return a_pos[order], b_pos[order]
+
+
+def _banded_lcs(a: np.ndarray, b: np.ndarray, band: int) -> List[Tuple[int, int]]:
+    """
+    Longest common subsequence restricted to a band around the diagonal.
+    Rows are vectorized: L[i] is the running max of max(up, diag + match).
+    With band >= len(b) this is the exact LCS.
+    """
+    n, m = len(a), len(b)
+    center = np.arange(n + 1) * m // n
+    width = max(band, -(-m // n) + 1)  # The band must stay connected
+    lo = np.clip(center - width, 0, m)
+    hi = np.clip(center + width, 0, m)
+    span = int((hi - lo).max()) + 1
+
+    table = np.full((n + 1, span), _UNREACHABLE, dtype=np.int32)
+    table[0, :hi[0] - lo[0] + 1] = 0
+    for i in range(1, n + 1):
+        cols = np.arange(lo[i], hi[i] + 1)
+        prev, plo, phi = table[i - 1], lo[i - 1], hi[i - 1]
+
+        up = np.where(cols <= phi, prev[np.minimum(cols - plo, span - 1)],
+                      _UNREACHABLE)
+        left = cols - 1
+        diag_ok = (left >= plo) & (left <= phi)
+        match = (b[np.maximum(left, 0)] == a[i - 1]) & (left >= 0)
+        diag = np.where(diag_ok,
+                        prev[np.clip(left - plo, 0, span - 1)] + match,
+                        _UNREACHABLE)
+
+        candidates = np.maximum(up, diag)
+        if lo[i] == 0:
+            candidates[0] = 0
+        table[i, :len(cols)] = np.maximum.accumulate(candidates)
+
+    lo, hi = lo.tolist(), hi.tolist()
+    a_list, b_list = a.tolist(), b.tolist()
+
+    def cell(i, j):
+        if lo[i] <= j <= hi[i]:
+            return int(table[i, j - lo[i]])
+        return _UNREACHABLE
+
+    pairs = []
+    i, j = n, m
+    while i > 0 and j > 0:
+        value = cell(i, j)
+        if a_list[i - 1] == b_list[j - 1] and cell(i - 1, j - 1) == value - 1:
+            pairs.append((i - 1, j - 1))
+            i -= 1
+            j -= 1
+        elif cell(i - 1, j) == value:
+            i -= 1
+        elif cell(i, j - 1) == value:
+            j -= 1
+        else:
+            i -= 1
+            j -= 1
+    return pairs[::-1]
+
+
+def match_tokens(a: np.ndarray, b: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Anchor-based alignment of two encoded token arrays (patience-diff style).
+
+    Each region is trimmed of its common prefix/suffix, then split on
+    anchors: tokens unique to both sides (or, failing that, rare tokens with
+    equal counts) chained by a longest increasing subsequence. Small regions
+    get an exact LCS; large anchor-less ones a banded LCS. Every step is
+    near-linear, so long live recordings and medleys stay fast, and repeated
+    choruses never confuse it the way difflib's autojunk heuristic does.
+    Returns matched (i, j) pairs sorted by i.
+    """
+    pairs = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # Common prefix and suffix
+        n = min(ahi - alo, bhi - blo)
+        if n:
+            same = a[alo:alo + n] == b[blo:blo + n]
+            prefix = n if same.all() else int(np.argmin(same))
+            pairs.extend(zip(range(alo, alo + prefix), range(blo, blo + prefix)))
+            alo += prefix
+            blo += prefix
+
+            n = min(ahi - alo, bhi - blo)
+            same = a[ahi - n:ahi][::-1] == b[bhi - n:bhi][::-1]
+            suffix = n if same.all() else int(np.argmin(same))
+            pairs.extend(zip(range(ahi - suffix, ahi),
+                             range(bhi - suffix, bhi)))
+            ahi -= suffix
+            bhi -= suffix
+
+        if alo == ahi or blo == bhi:
+            continue
+
+        if (ahi - alo) * (bhi - blo) <= FULL_DP_CELLS:
+            pairs.extend((alo + i, blo + j) for i, j in
+                         _banded_lcs(a[alo:ahi], b[blo:bhi], bhi - blo))
+            continue
+
+        for max_count in (1, RARE_TOKEN_COUNT):
+            ai, bj = _anchors(a[alo:ahi], b[blo:bhi], max_count)
+            if len(ai):
+                break
+        if not len(ai):
+            pairs.extend((alo + i, blo + j) for i, j in
+                         _banded_lcs(a[alo:ahi], b[blo:bhi], DP_BAND))
+            continue
+
+        chain = _longest_increasing(bj.tolist())
+        ai, bj = ai[chain] + alo, bj[chain] + blo
+        pairs.extend(zip(ai.tolist(), bj.tolist()))
+        # Gaps between consecutive anchors (and the two ends) are new regions
+        starts_a = np.concatenate(([alo], ai + 1))
+        ends_a = np.concatenate((ai, [ahi]))
+        starts_b = np.concatenate(([blo], bj + 1))
+        ends_b = np.concatenate((bj, [bhi]))
+        stack.extend(zip(starts_a.tolist(), ends_a.tolist(),
+                         starts_b.tolist(), ends_b.tolist()))
+
+    pairs.sort()
+    return pairs
+
+
+def pairs_to_opcodes(pairs: List[Tuple[int, int]], n: int,
+                     m: int) -> List[Tuple[str, int, int, int, int]]:
+    """Matched pairs -> difflib-style (tag, i1, i2, j1, j2) opcodes."""
+    opcodes = []
+    i = j = k = 0
+
+    def gap(i2, j2):
+        if i < i2 and j < j2:
+            opcodes.append(("replace", i, i2, j, j2))
+        elif i < i2:
+            opcodes.append(("delete", i, i2, j, j2))
+        elif j < j2:
+            opcodes.append(("insert", i, i2, j, j2))
+
+    while k < len(pairs):
+        mi, mj = pairs[k]
+        gap(mi, mj)
+        run = 1
+        while (k + run < len(pairs) and
+               pairs[k + run] == (mi + run, mj + run)):
+            run += 1
+        opcodes.append(("equal", mi, mi + run, mj, mj + run))
+        i, j, k = mi + run, mj + run, k + run
+    gap(n, m)
+    return opcodes
+
+
+class WordColumns:
+    """
+    Words as columns: start/end/segment arrays plus interned text ids.
+    A missing segment id is stored as -1.
+    """
+
+    def __init__(self, words: List[Dict]):
+        n = len(words)
+        self.start = np.fromiter((w['start'] for w in words), dtype=np.float64,
+                                 count=n)
+        self.end = np.fromiter((w['end'] for w in words), dtype=np.float64,
+                               count=n)
+        self.segment = np.fromiter(
+            (-1 if w.get('segment') is None else w['segment'] for w in words),
+            dtype=np.int64, count=n)
+        vocab = {}
+        self.word_ids = np.fromiter(
+            (vocab.setdefault(w['text'], len(vocab)) for w in words),
+            dtype=np.int32, count=n)
+        self.vocab = list(vocab)
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def texts(self) -> List[str]:
+        vocab = self.vocab
+        return [vocab[i] for i in self.word_ids.tolist()]
+
+
+class ChordTrack:
+    """Chords as columns: sorted onset times plus interned label ids."""
+
+    def __init__(self, chords: List[Dict]):
+        ids = {}
+        self.times = np.fromiter((c['timestamp'] for c in chords),
+                                 dtype=np.float64, count=len(chords))
+        self.ids = np.fromiter((ids.setdefault(c['label'], len(ids))
+                                for c in chords),
+                               dtype=np.int32, count=len(chords))
+        # No chords at all: every word gets "N/A"
+        self.labels = list(ids) or ["N/A"]
+
+    def lookup(self, times: np.ndarray) -> np.ndarray:
+        """Label id of the chord active at each time."""
+        if not len(self.ids):
+            return np.zeros(len(times), dtype=np.int32)
+        index = np.searchsorted(self.times, times, side="right") - 1
+        return self.ids[np.maximum(index, 0)]
+
+
+class Alignment:
+    """Output of align_columns: one chord id and change flag per word."""
+
+    def __init__(self, words: WordColumns, labels: List[str],
+                 chord_ids: np.ndarray, is_new: np.ndarray):
+        self.words = words
+        self.labels = labels
+        self.chord_ids = chord_ids
+        self.is_new = is_new
 
 
 class AlignerService:
+    def __init__(self, sync_engine: str = "anchor"):
+        # "difflib" keeps the original SequenceMatcher path as a reference
+        if sync_engine not in ("anchor", "difflib"):
+            raise ValueError(f"Unknown sync engine: {sync_engine}")
+        self.sync_engine = sync_engine
+
     def sync_lyrics(self, whisper_words: List[Dict], genius_text: str) -> List[
         Dict]:
         """
         Merges the 'Correct Text' (Genius) with the 'Correct Timing' (Whisper).
-        Uses SequenceMatcher to find the best fit.
+        Token matching is anchor-based (see match_tokens); difflib on request.
         """
         if not genius_text:
             return whisper_words
@@ -16,16 +321,22 @@ class AlignerService:
         # Simple whitespace splitting preserves basic flow.
         genius_tokens = genius_text.split()
 
-        # Prepare lists for comparison (lowercase for matching)
-        whisper_tokens_lower = [w['text'].lower() for w in whisper_words]
-        genius_tokens_lower = [t.lower() for t in genius_tokens]
+        if self.sync_engine == "difflib":
+            # Prepare lists for comparison (lowercase for matching)
+            whisper_tokens_lower = [w['text'].lower() for w in whisper_words]
+            genius_tokens_lower = [t.lower() for t in genius_tokens]
 
-        matcher = difflib.SequenceMatcher(None, whisper_tokens_lower,
-                                          genius_tokens_lower)
+            matcher = difflib.SequenceMatcher(None, whisper_tokens_lower,
+                                              genius_tokens_lower)
+            opcodes = matcher.get_opcodes()
+        else:
+            a, b = encode_tokens([w['text'] for w in whisper_words],
+                                 genius_tokens)
+            opcodes = pairs_to_opcodes(match_tokens(a, b), len(a), len(b))
 
         synced_result = []
 
-        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        for tag, i1, i2, j1, j2 in opcodes:
             if tag == 'equal':
                 # Perfect match: Use Genius text (for casing/punctuation) + Whisper time
                 for i, j in zip(range(i1, i2), range(j1, j2)):
@@ -34,7 +345,8 @@ class AlignerService:
                         "text": genius_tokens[j],
                         "start": w['start'],
                         "end": w['end'],
-                        "probability": w.get('probability', 1.0)
+                        "probability": w.get('probability', 1.0),
+                        "segment": w.get('segment')
                     })
 
             elif tag == 'replace':
@@ -57,8 +369,10 @@ class AlignerService:
                             "text": word,
                             "start": round(start_t + (k * step), 3),
                             "end": round(start_t + ((k + 1) * step), 3),
-                            "probability": 0.5
+                            "probability": 0.5,
                             # Lower confidence since interpolated
+                            "segment": w_segment[
+                                k * len(w_segment) // count].get('segment')
                         })
 
             elif tag == 'insert':
@@ -66,11 +380,16 @@ class AlignerService:
                 # Interpolate them between the previous and next available timestamps.
                 # This fixes the "part of them" issue where lines are dropped.
                 prev_end = synced_result[-1]['end'] if synced_result else 0.0
+                # Missed words belong to the line they were sung in
+                segment = (synced_result[-1].get('segment') if synced_result
+                           else None)
 
                 # Find next valid start time
                 next_start = prev_end + 1.0  # Default buffer
                 if i1 < len(whisper_words):
                     next_start = whisper_words[i1]['start']
+                    if segment is None:
+                        segment = whisper_words[i1].get('segment')
 
                 duration = max(0.1, next_start - prev_end)
                 g_segment = genius_tokens[j1:j2]
@@ -82,73 +401,149 @@ class AlignerService:
                         "text": word,
                         "start": round(prev_end + (k * step), 3),
                         "end": round(prev_end + ((k + 1) * step), 3),
-                        "probability": 0.0  # Interpolated
+                        "probability": 0.0,  # Interpolated
+                        "segment": segment
                     })
 
             # 'delete' tag (Whisper has words Genius doesn't) are ignored (likely hallucinations)
 
         return synced_result
 
-    def align(self, words: List[Dict], chords: List[Dict]) -> List[Dict]:
+    def align_columns(self, words: List[Dict],
+                      chords: List[Dict]) -> Alignment:
         """
-        Synchronizes lyrics and chords using a two-pointer approach.
-        Assumes both inputs are pre-sorted by timestamp.
+        Chord active at each word's start, for all words at once.
+        Assumes chords are sorted by timestamp; words before the first chord
+        take the first chord (as the old two-pointer walk did).
         """
-        aligned_result = []
-        last_seen_chord = None
-        chord_idx = 0
-        num_chords = len(chords)
-
-        for word in words:
-            t_start = word['start']
-
-            # Advance chord pointer until we find the chord active at t_start
-            while (chord_idx + 1 < num_chords and
-                   chords[chord_idx + 1]['timestamp'] <= t_start):
-                chord_idx += 1
-
-            current_label = chords[chord_idx]['label'] if chords else "N/A"
-            is_transition = (current_label != last_seen_chord)
-
-            aligned_result.append({
-                "word": word['text'],  # Storing as 'word'
-                "chord": current_label,
-                "is_new_chord": is_transition,
-                "start": t_start,
-                "end": word['end']
-            })
+        columns = WordColumns(words)
+        track = ChordTrack(chords)
+        chord_ids = track.lookup(columns.start)
 
-            last_seen_chord = current_label
+        is_new = np.ones(len(columns), dtype=bool)
+        is_new[1:] = chord_ids[1:] != chord_ids[:-1]
+        return Alignment(columns, track.labels, chord_ids, is_new)
 
-        return aligned_result
+    def align(self, words: List[Dict], chords: List[Dict]) -> List[Dict]:
+        """
+        Row view of align_columns: one dict per word.
+        """
+        alignment = self.align_columns(words, chords)
+        columns = alignment.words
+        labels = alignment.labels
+        return [{
+            "word": text,  # Storing as 'word'
+            "chord": labels[chord_id],
+            "is_new_chord": is_new,
+            "start": start,
+            "end": end,
+            "segment": segment if segment >= 0 else None,
+        } for text, chord_id, is_new, start, end, segment in zip(
+            columns.texts(), alignment.chord_ids.tolist(),
+            alignment.is_new.tolist(), columns.start.tolist(),
+            columns.end.tolist(), columns.segment.tolist())]
 
-    def generate_sheet_buffer(self, aligned_data: List[Dict]) -> str:
+    def build_sheet(self, alignment: Alignment) -> Dict:
         """
-        Formats the lyrics into a structured song sheet with line breaks.
+        Structured lead sheet:
+
+            {"format": "lead-sheet", "version": 1, "chords": [labels...],
+             "sections": [{"start", "end", "lines": [
+                 {"start", "end", "text",
+                  "chords": [{"offset", "chord", "time"}]}]}]}
+
+        A chord's 'offset' is the character in 'text' where it changes.
+        Lines end where Whisper started a new segment or the singer paused;
+        long pauses end a section (verse, chorus...).
         """
-        lines = []
-        current_line = []
-        words_on_line = 0
+        columns = alignment.words
+        sheet = {"format": "lead-sheet", "version": SHEET_FORMAT_VERSION,
+                 "chords": alignment.labels, "sections": []}
+        n = len(columns)
+        if n == 0:
+            return sheet
+
+        gaps = columns.start[1:] - columns.end[:-1]
+        segment = columns.segment
+        # Words without a segment id (older cached transcripts) rely on gaps
+        new_segment = ((segment[1:] != segment[:-1]) &
+                       (segment[1:] >= 0) & (segment[:-1] >= 0))
+        section_break = np.concatenate(([True], gaps >= SECTION_GAP_SECONDS))
+        line_break = section_break | np.concatenate(
+            ([True], new_segment | (gaps >= LINE_GAP_SECONDS)))
+
+        # Very long lines still wrap every MAX_LINE_WORDS words
+        index = np.arange(n)
+        line_of = np.maximum.accumulate(np.where(line_break, index, 0))
+        line_break |= (index - line_of) % MAX_LINE_WORDS == 0
+        line_of = np.maximum.accumulate(np.where(line_break, index, 0))
+
+        # Character offset of each word within its line (words + spaces)
+        texts = columns.texts()
+        widths = np.fromiter(map(len, texts), dtype=np.int64, count=n) + 1
+        char_start = np.cumsum(widths) - widths
+        offsets = (char_start - char_start[line_of]).tolist()
 
-        for item in aligned_data:
-            word = item['word']
-            chord = item['chord']
-            is_new = item['is_new_chord']
+        # Chord markers at every change, and at the top of every section
+        marks = np.flatnonzero(alignment.is_new | section_break)
+        line_starts = np.flatnonzero(line_break)
+        line_ends = np.append(line_starts[1:], n)
+        mark_bounds = np.searchsorted(marks, line_starts).tolist() + [len(marks)]
+        marks = marks.tolist()
 
-            # Logic for line breaks:
-            if (is_new and words_on_line >= 4) or words_on_line >= 8:
-                lines.append(" ".join(current_line))
-                current_line = []
-                words_on_line = 0
+        labels = alignment.labels
+        chord_ids = alignment.chord_ids.tolist()
+        starts, ends = columns.start.tolist(), columns.end.tolist()
+        section_break = section_break.tolist()
 
-            if is_new:
-                current_line.append(f"[{chord}] {word}")
-            else:
-                current_line.append(word)
+        section = None
+        for k, (lo, hi) in enumerate(zip(line_starts.tolist(),
+                                         line_ends.tolist())):
+            if section_break[lo]:
+                section = {"start": starts[lo], "lines": []}
+                sheet["sections"].append(section)
+            section["lines"].append({
+                "start": starts[lo],
+                "end": ends[hi - 1],
+                "text": " ".join(texts[lo:hi]),
+                "chords": [{"offset": offsets[w],
+                            "chord": labels[chord_ids[w]],
+                            "time": starts[w]}
+                           for w in marks[mark_bounds[k]:mark_bounds[k + 1]]],
+            })
+            section["end"] = ends[hi - 1]
+
+        return sheet
 
-            words_on_line += 1
 
-        if current_line:
-            lines.append(" ".join(current_line))
+def render_sheet_text(sheet: Dict) -> str:
+    """
+    Plain-text version of a structured sheet: '[C] word' inline markers,
+    one line per sheet line and a blank line between sections.
+    """
+    blocks = []
+    for section in sheet["sections"]:
+        lines = []
+        for line in section["lines"]:
+            text = line["text"]
+            # Insert from the right so earlier offsets stay valid
+            for chord in reversed(line["chords"]):
+                offset = chord["offset"]
+                text = f"{text[:offset]}[{chord['chord']}] {text[offset:]}"
+            lines.append(text)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks).strip()
+
 
-        return "\n".join(lines).strip()
\ No newline at end of file
+def sheet_to_jsonl(sheet: Dict) -> Iterator[str]:
+    """
+    JSON Lines stream of a sheet: a header, then one object per line, so a
+    client can render the first lines before the rest has arrived.
+    """
+    yield json.dumps({"type": "header", "format": sheet["format"],
+                      "version": sheet["version"],
+                      "chords": sheet["chords"],
+                      "sections": len(sheet["sections"])}) + "\n"
+    for index, section in enumerate(sheet["sections"]):
+        for line in section["lines"]:
+            yield json.dumps({"type": "line", "section": index, **line}) + "\n"
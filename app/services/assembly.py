@@ -0,0 +1,70 @@
+# app/services/assembly.py
+import logging
+from typing import Dict
+from app.core.metrics import stage_timer
+from app.services.aligner import AlignerService, render_sheet_text
+from app.services.progress import ProgressReporter
+
+# Kept free of ML imports: the API re-runs the tail of the pipeline for
+# /songs/{id}/relyric, without a worker.
+#
+# Demucs, Whisper and the chord model take minutes; sync, alignment and the
+# sheet take milliseconds. Their inputs (Whisper's words, the chords and the
+# lyrics text) are kept with every finished job, so a lyrics correction or
+# a change to the line-break rules only re-runs this part.
+
+logger = logging.getLogger(__name__)
+
+
+def assemble_sheet(aligner: AlignerService, raw_words, chords,
+                   full_lyrics_text: str = None,
+                   progress: ProgressReporter = None) -> dict:
+    """
+    The CPU-cheap tail of the pipeline: Genius text onto Whisper timing,
+    words onto chords, then the sheet. Shared by process_song, the
+    'alignment' stage task and reassemble.
+    """
+    progress = progress or ProgressReporter()
+
+    # 3. Sync
+    if full_lyrics_text:
+        logger.info("Aligning Genius lyrics to Whisper timestamps...")
+        progress.update("sync", "Syncing lyrics")
+        with stage_timer("sync_lyrics"):
+            final_words = aligner.sync_lyrics(raw_words, full_lyrics_text)
+    else:
+        final_words = raw_words
+
+    # 4. Align Words to Chords
+    print("DEBUG: [4/4] Aligning and generating sheet...", flush=True)
+    progress.update("alignment", "Aligning and generating sheet")
+    with stage_timer("align"):
+        alignment = aligner.align_columns(final_words, chords)
+    with stage_timer("sheet"):
+        sheet = aligner.build_sheet(alignment)
+        sheet_text = render_sheet_text(sheet)
+
+    # The text sheet is kept for the .txt export and old clients; the rest
+    # goes to the result store, raw_words and lyrics so reassemble can
+    # start over from them
+    return {"sheet_text": sheet_text, "sheet": sheet, "words": final_words,
+            "chords": chords, "raw_words": raw_words,
+            "lyrics": full_lyrics_text}
+
+
+def reassemble(record: Dict, lyrics: str = None,
+               aligner: AlignerService = None) -> dict:
+    """
+    Re-runs sync, alignment and the sheet of a stored job (ResultStore row)
+    from its Whisper words and chords, with new lyrics or, if None, the
+    ones it used. The words stay those Whisper heard with the old lyrics
+    as prompt: sync_lyrics puts the new text on their timing.
+    Raises ValueError for jobs stored without their stage outputs.
+    """
+    if record.get("raw_words") is None or record.get("chords") is None:
+        raise ValueError("This job was stored without its Whisper words "
+                         "and chords; upload the song again")
+    if lyrics is None:
+        lyrics = record.get("lyrics")
+    return assemble_sheet(aligner or AlignerService(), record["raw_words"],
+                          record["chords"], lyrics or None)
@@ -1,46 +1,204 @@
 # app/services/audio.py
-import subprocess
-import os
+import tempfile
 from pathlib import Path
+from typing import Callable, Union
+from app.core.config import inference_device, settings
+from app.core.metrics import model_load_timer, stage_timer
+from app.services.buffer import AudioBuffer
+from app.services.cache import ResultCache, hash_file, stage_fingerprints
+from app.services.parallel import run_killable
+
+
+def load_demucs_model(model_name: str, device: str, threads: int = 0):
+    """Loads Demucs weights ready for inference (used by the model registry)."""
+    import torch
+    from demucs.pretrained import get_model
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    print(f"Loading Demucs Model: {model_name} on {device}")
+    with model_load_timer("demucs"):
+        model = get_model(model_name)
+        model.to(device)
+        model.eval()
+    return model
+
 
 class AudioEngine:
-    def __init__(self, output_dir: str = "data/processed"):
+    STEM_FILES = {"vocals": "vocals.wav", "other": "no_vocals.wav"}
+
+    def __init__(self, output_dir: str = "data/processed",
+                 cache: ResultCache = None, in_process: bool = None,
+                 model=None):
         self.output_dir = Path(output_dir).resolve()
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = cache or ResultCache(str(self.output_dir / "cache"))
 
-    def split_stems(self, input_file: str):
-        # FIX: Use the full filename stem (e.g., 'Hayley_Williams_-_Hard')
-        # This ensures we look in the exact folder Demucs creates.
-        song_stem = Path(input_file).stem
-        stems = self._find_stems(song_stem)
+        # Use config defaults if not provided
+        self.model_name = settings.DEMUCS_MODEL
+        self.in_process = (settings.DEMUCS_IN_PROCESS if in_process is None
+                           else in_process)
+        self.segment = settings.DEMUCS_SEGMENT
+        self.overlap = settings.DEMUCS_OVERLAP
+        self.threads = settings.DEMUCS_THREADS
+        self.device = inference_device()
+        self.mmap_stems = settings.AUDIO_BUFFER_MMAP
+        # A preloaded model (e.g. from the worker's registry) skips the load
+        self._model = model
 
-        # Check if stems already exist (Deduplication)
-        if os.path.exists(stems["vocals"]) and os.path.exists(stems["other"]):
-            print(f"Existing stems found for '{song_stem}'. Reusing them.")
-            return stems
+    def fingerprint(self) -> str:
+        # Everything that changes the stems must be part of the cache key
+        return stage_fingerprints(settings)["stems"]
 
-        input_path = str(Path(input_file).resolve())
-        output_path = str(self.output_dir)
+    def load_model(self):
+        """
+        Loads the Demucs weights once per worker process and keeps them warm.
+        Only used in in-process mode; the CLI path reloads them every call.
+        """
+        if self._model is None:
+            self._model = load_demucs_model(self.model_name, self.device,
+                                            self.threads)
+        return self._model
+
+    def stems_key(self, audio_hash: str) -> str:
+        return self.cache.key(audio_hash, "stems", self.fingerprint())
+
+    def split_stems(self, audio: Union[str, AudioBuffer],
+                    audio_hash: str = None, store: bool = False,
+                    checkpoint: Callable[[], None] = None):
+        """
+        Returns {"vocals": AudioBuffer, "other": AudioBuffer}.
+        Cached stems are file-backed (decoded on first use); fresh ones are in memory.
+        store=True always writes the WAVs (stage tasks read them by reference).
+        The Demucs CLI is killed when 'checkpoint' raises (a cancelled job)
+        or after STAGE_TIMEOUT_SECONDS.
+        """
+        if isinstance(audio, str):
+            audio = AudioBuffer.from_file(audio)
 
-        # Demucs creates: [output_dir]/htdemucs/[song_stem]/vocals.wav
-        cmd = [
-            "demucs",
-            "--two-stems", "vocals",
-            "-o", output_path,
-            input_path
-        ]
+        # FIX: Stems are keyed by the audio content, not the filename.
+        # Re-uploads under another name reuse them; same-name songs never collide.
+        if audio_hash is None:
+            audio_hash = (hash_file(audio.path) if audio.path
+                          else audio.content_hash())
+        key = self.stems_key(audio_hash)
 
-        print(f"Running Demucs: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Check if stems already exist (Deduplication)
+        stem_files = self.cache.get_files("stems", key, self.STEM_FILES)
+        if stem_files:
+            print(f"Existing stems found for '{audio_hash[:12]}'. Reusing them.")
+            return {name: AudioBuffer.from_file(path)
+                    for name, path in stem_files.items()}
 
-        if result.returncode != 0:
-            raise Exception(f"Demucs failed: {result.stderr}")
+        with stage_timer("demucs"):
+            if self.in_process:
+                stems = self._separate(audio)
+                # WAVs are only written for the cache; this job uses the buffers
+                if self.cache.enabled or store:
+                    self._store_stems(key, stems)
+            else:
+                stem_files = self._split_stems_cli(audio, key, checkpoint)
+                stems = {name: AudioBuffer.from_file(path)
+                         for name, path in stem_files.items()}
 
+        if self.mmap_stems:
+            for stem in stems.values():
+                stem.spill(str(self.output_dir))
         return stems
 
-    def _find_stems(self, song_name: str):
-        base_path = self.output_dir / "htdemucs" / song_name
+    def separate(self, audio: AudioBuffer):
+        """In-memory stems of a short clip (live windows): no cache, no files."""
+        with stage_timer("demucs"):
+            return self._separate(audio)
+
+    def _separate(self, audio: AudioBuffer):
+        """
+        Runs the warm Demucs model on the song, chunked into overlapping segments.
+        """
+        import torch
+        from demucs.apply import apply_model
+        from demucs.audio import AudioFile
+
+        model = self.load_model()
+        if audio.path and audio.sample_rate is None:
+            # Let Demucs' ffmpeg reader decode and resample in one pass
+            wav = AudioFile(Path(audio.path)).read(
+                streams=0, samplerate=model.samplerate,
+                channels=model.audio_channels)
+        else:
+            samples = audio.at(model.samplerate)
+            if samples.shape[0] != model.audio_channels:
+                samples = samples.mean(axis=0, keepdims=True).repeat(
+                    model.audio_channels, axis=0)
+            wav = torch.from_numpy(samples)
+
+        # Same normalization and single random shift as the Demucs CLI
+        ref = wav.mean(0)
+        mean, std = ref.mean(), ref.std()
+        wav = (wav - mean) / std
+
+        with torch.no_grad():
+            sources = apply_model(model, wav[None], device=self.device,
+                                  shifts=1, split=True, overlap=self.overlap,
+                                  segment=self.segment, progress=False)[0]
+        sources = (sources * std + mean).cpu()
+
+        # --two-stems vocals: everything that is not vocals is summed
+        vocals_idx = model.sources.index("vocals")
+        vocals = sources[vocals_idx]
+        other = sources.sum(0) - vocals
+
         return {
-            "vocals": str(base_path / "vocals.wav"),
-            "other": str(base_path / "no_vocals.wav")
-        }
\ No newline at end of file
+            "vocals": AudioBuffer.from_array(vocals.numpy(), model.samplerate),
+            "other": AudioBuffer.from_array(other.numpy(), model.samplerate),
+        }
+
+    def _store_stems(self, key: str, stems: dict):
+        import torch
+        from demucs.audio import save_audio
+
+        with tempfile.TemporaryDirectory(dir=self.output_dir) as scratch:
+            files = {}
+            for name, filename in self.STEM_FILES.items():
+                path = str(Path(scratch) / filename)
+                save_audio(torch.from_numpy(stems[name].samples), path,
+                           samplerate=stems[name].sample_rate)
+                files[name] = path
+            self.cache.put_files("stems", key, files)
+
+    def _split_stems_cli(self, audio: AudioBuffer, key: str,
+                         checkpoint: Callable[[], None] = None):
+        if audio.path is None:
+            raise ValueError("Demucs CLI mode needs a file, not an in-memory buffer")
+        input_file = audio.path
+        input_path = str(Path(input_file).resolve())
+
+        # Demucs writes into a scratch dir first; the cache then adopts the files
+        with tempfile.TemporaryDirectory(dir=self.output_dir) as scratch:
+            # Demucs creates: [scratch]/htdemucs/[song_stem]/vocals.wav
+            cmd = [
+                "demucs",
+                "--two-stems", "vocals",
+                "-n", self.model_name,
+                "--overlap", str(self.overlap),
+                "-o", scratch,
+                input_path
+            ]
+            if self.segment:
+                cmd[1:1] = ["--segment", str(int(self.segment))]
+
+            print(f"Running Demucs: {' '.join(cmd)}")
+            result = run_killable(cmd, settings.STAGE_TIMEOUT_SECONDS or None,
+                                  checkpoint)
+
+            if result.returncode != 0:
+                raise Exception(f"Demucs failed: {result.stderr}")
+
+            produced = self._find_stems(Path(scratch), Path(input_file).stem)
+            return self.cache.put_files("stems", key, produced)
+
+    def _find_stems(self, base_dir: Path, song_name: str):
+        base_path = base_dir / self.model_name / song_name
+        return {name: str(base_path / filename)
+                for name, filename in self.STEM_FILES.items()}
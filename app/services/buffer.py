@@ -0,0 +1,211 @@
+# app/services/buffer.py
+import hashlib
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+
+# Fallback decode format for files libsndfile can't read (mp3/m4a on old builds)
+FFMPEG_SAMPLE_RATE = 44100
+FFMPEG_CHANNELS = 2
+
+
+def to_mono(audio: np.ndarray) -> np.ndarray:
+    """(channels, samples) or (samples,) -> float32 (samples,)"""
+    if audio.ndim > 1:
+        audio = audio.mean(axis=0)
+    return audio.astype(np.float32, copy=False)
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    if orig_sr == target_sr:
+        return audio
+    from scipy.signal import resample_poly
+
+    # Polyphase filtering with the reduced ratio (44100 -> 16000 is 160/441)
+    g = np.gcd(int(orig_sr), int(target_sr))
+    return resample_poly(audio, target_sr // g, orig_sr // g,
+                         axis=-1).astype(np.float32)
+
+
+def _decode_file(path: str):
+    """
+    Returns (float32 array of shape (channels, samples), sample_rate).
+    """
+    try:
+        import soundfile as sf
+        data, sr = sf.read(path, dtype="float32", always_2d=True)
+        return np.ascontiguousarray(data.T), sr
+    except Exception:
+        pass
+
+    cmd = ["ffmpeg", "-v", "error", "-i", path,
+           "-f", "f32le", "-ac", str(FFMPEG_CHANNELS),
+           "-ar", str(FFMPEG_SAMPLE_RATE), "-"]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"Could not decode {path}: {result.stderr.decode()}")
+
+    data = np.frombuffer(result.stdout, dtype=np.float32)
+    return data.reshape(-1, FFMPEG_CHANNELS).T.copy(), FFMPEG_SAMPLE_RATE
+
+
+class AudioBuffer:
+    """
+    Decoded audio shared by every stage of one job.
+
+    - Decoded once: a file-backed buffer decodes lazily, on first access.
+    - Resampled once per rate: mono(16000) for Whisper and mono(44100) for
+      madmom are computed a single time and reused.
+    - Optionally memory-mapped: spill() moves the samples into a float32 .npy
+      file, so pages can be dropped under memory pressure and stage processes
+      open the same file instead of receiving a pickled copy.
+    """
+
+    def __init__(self, samples: Optional[np.ndarray] = None,
+                 sample_rate: Optional[int] = None, path: Optional[str] = None):
+        self._samples = samples
+        self.sample_rate = sample_rate
+        self.path = path  # Source file, decoded on demand
+        self._mmap_path: Optional[str] = None
+        self._mono: Dict[int, np.ndarray] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "AudioBuffer":
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Audio file not found: {path}")
+        return cls(path=str(path))
+
+    @classmethod
+    def from_array(cls, samples: np.ndarray, sample_rate: int) -> "AudioBuffer":
+        return cls(samples=np.asarray(samples, dtype=np.float32),
+                   sample_rate=sample_rate)
+
+    # --- Access ---
+
+    @property
+    def samples(self) -> np.ndarray:
+        """float32 array of shape (channels, samples)."""
+        if self._samples is None:
+            if self._mmap_path:
+                self._samples = np.load(self._mmap_path, mmap_mode="r")
+            else:
+                self._samples, self.sample_rate = _decode_file(self.path)
+        if self._samples.ndim == 1:
+            return self._samples[None]
+        return self._samples
+
+    @property
+    def duration(self) -> float:
+        if self._samples is None and not self._mmap_path and self.path:
+            # Read from the header: deciding how to process a file must
+            # not decode all of it
+            try:
+                import soundfile as sf
+                return sf.info(self.path).duration
+            except Exception:
+                pass
+        return self.samples.shape[-1] / self.sample_rate
+
+    def at(self, sample_rate: int) -> np.ndarray:
+        """Multi-channel samples at the requested rate (not cached)."""
+        return resample(self.samples, self.sample_rate, sample_rate)
+
+    def mono(self, sample_rate: Optional[int] = None) -> np.ndarray:
+        """Mono float32 samples at the requested rate, computed once per rate."""
+        samples = self.samples
+        sample_rate = sample_rate or self.sample_rate
+        if sample_rate not in self._mono:
+            self._mono[sample_rate] = resample(to_mono(samples),
+                                               self.sample_rate, sample_rate)
+        return self._mono[sample_rate]
+
+    def iter_windows(self, sample_rate: int, window: float, context: float
+                     ) -> Iterator[Tuple[float, float, float, np.ndarray]]:
+        """
+        Long-recording access: yields (start, core_start, core_end, mono)
+        for consecutive 'window'-second cores, each padded with up to
+        'context' seconds of audio on both sides. Times are in seconds;
+        'mono' starts at 'start'.
+
+        A file that is not decoded yet is read window by window, so memory
+        stays bounded by the window size, not the recording length.
+        """
+        reader = None
+        if self._samples is None and not self._mmap_path and self.path:
+            try:
+                import soundfile as sf
+                reader = sf.SoundFile(self.path)
+            except Exception:
+                pass  # Not readable by libsndfile (mp3...): full decode
+
+        if reader is not None:
+            source_rate, total = reader.samplerate, reader.frames
+        else:
+            total = self.samples.shape[-1]  # Decodes (and sets the rate) if needed
+            source_rate = self.sample_rate
+
+        try:
+            core = 0.0
+            duration = total / source_rate
+            while core < duration:
+                core_end = min(duration, core + window)
+                start = max(0.0, core - context)
+                first = int(start * source_rate)
+                last = min(total, int(np.ceil((core_end + context) * source_rate)))
+
+                if reader is not None:
+                    reader.seek(first)
+                    chunk = reader.read(last - first, dtype="float32",
+                                        always_2d=True).T
+                else:
+                    chunk = self.samples[:, first:last]
+                yield (first / source_rate, core, core_end,
+                       resample(to_mono(chunk), source_rate, sample_rate))
+                core = core_end
+        finally:
+            if reader is not None:
+                reader.close()
+
+    def content_hash(self) -> str:
+        """SHA-256 of the decoded PCM (for buffers that have no source file)."""
+        digest = hashlib.sha256(str(self.sample_rate).encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.samples).tobytes())
+        return digest.hexdigest()
+
+    # --- Memory ---
+
+    def spill(self, directory: Optional[str] = None) -> "AudioBuffer":
+        """
+        Moves the samples into a memory-mapped float32 file.
+        The file is removed by release().
+        """
+        if self._mmap_path:
+            return self
+
+        fd, mmap_path = tempfile.mkstemp(suffix=".npy", dir=directory)
+        with open(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.samples, dtype=np.float32))
+
+        self._mmap_path = mmap_path
+        self._samples = np.load(mmap_path, mmap_mode="r")
+        return self
+
+    def release(self):
+        """Drops every decoded/resampled copy (and the mmap file, if any)."""
+        self._samples = None
+        self._mono.clear()
+        if self._mmap_path:
+            Path(self._mmap_path).unlink(missing_ok=True)
+            self._mmap_path = None
+
+    # --- Pickling (stage processes) ---
+
+    def __getstate__(self):
+        # File-backed and mmap-backed buffers travel as a path, not as samples
+        state = self.__dict__.copy()
+        state["_mono"] = {}
+        if self._mmap_path or (self.path and self._samples is None):
+            state["_samples"] = None
+        return state
@@ -0,0 +1,284 @@
+# app/services/cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.core.metrics import CACHE_REQUESTS
+from app.services.policy import whisper_params
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Returns the SHA-256 of the file contents.
+    This is the identity of a song: same bytes -> same results, whatever the filename.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(**params) -> str:
+    """
+    Stable short hash of a stage's model/config parameters.
+    Changing any parameter changes the key, so stale results are never reused.
+    """
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Bump when the alignment/sheet logic changes so cached sheets are rebuilt
+SHEET_VERSION = 2
+
+# CHORD_MODE -> chord engine (each has its own cached chords and sheets)
+CHORD_ENGINES = {"accurate": "madmom-cnn-crf", "fast": "chroma-viterbi"}
+
+
+def stage_fingerprints(settings, chord_mode: str = None,
+                       plan: Dict = None) -> Dict[str, str]:
+    """
+    Config fingerprint of every stage, chained on the stages it reads from.
+    A change in a later stage keeps the cached results of earlier ones.
+    Light on purpose: the API uses it to spot duplicate uploads.
+    chord_mode overrides settings.CHORD_MODE for one job, 'plan' (see
+    policy.py) its Whisper model, beam size and compute type.
+    """
+    whisper = whisper_params(settings, plan)
+    stems_fp = fingerprint(engine="demucs", model=settings.DEMUCS_MODEL,
+                           two_stems="vocals", segment=settings.DEMUCS_SEGMENT,
+                           overlap=settings.DEMUCS_OVERLAP)
+    words_fp = fingerprint(stems=stems_fp, engine="faster-whisper",
+                           model=whisper["model"],
+                           beam_size=whisper["beam_size"],
+                           # As configured ("auto" too): the API and the
+                           # workers must agree without probing the GPU
+                           compute_type=whisper["compute_type"],
+                           vocal_prepass=settings.VOCAL_PREPASS and [
+                               settings.VOCAL_LEVEL,
+                               settings.VOCAL_MAX_FLATNESS,
+                               settings.VOCAL_MIN_GAP, settings.VOCAL_PAD,
+                               settings.VOCAL_MAX_COVERAGE])
+    chords_fp = fingerprint(
+        stems=stems_fp,
+        engine=CHORD_ENGINES[chord_mode or settings.CHORD_MODE])
+    sheet_fp = fingerprint(words=words_fp, chords=chords_fp,
+                           version=SHEET_VERSION)
+    return {"stems": stems_fp, "words": words_fp, "chords": chords_fp,
+            "sheet": sheet_fp}
+
+
+class ResultCache:
+    """
+    Content-addressed, size-bounded on-disk cache for pipeline stage results.
+
+    Layout: [root]/[stage]/[key]/  (one directory per entry)
+    - JSON results (words, chords, sheets) live in 'value.json'
+    - File results (stems) are stored next to it under their own names
+
+    The directory mtime is the "last used" time, so eviction is a plain LRU
+    that works across worker processes without a shared index.
+    """
+
+    VALUE_FILE = "value.json"
+
+    def __init__(self, root: str = "data/cache",
+                 max_bytes: int = 10 * 1024 ** 3, enabled: bool = True):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # When disabled, lookups always miss but results are still written,
+        # because downstream stages need a place to read stems from.
+        self.enabled = enabled
+
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # --- Keys ---
+
+    def key(self, content_hash: str, stage: str, config: str) -> str:
+        return hashlib.sha256(
+            f"{content_hash}:{stage}:{config}".encode("utf-8")).hexdigest()
+
+    def sheet_key(self, content_hash: str, settings, artist: str = None,
+                  title: str = None, chord_mode: str = None,
+                  plan: Dict = None) -> str:
+        return self.stored_sheet_key(
+            content_hash, stage_fingerprints(settings, chord_mode, plan)["sheet"],
+            artist, title)
+
+    def stored_sheet_key(self, content_hash: str, sheet_fp: str,
+                         artist: str = None, title: str = None) -> str:
+        """sheet_key() of a finished job, from its stored fingerprints."""
+        # The sheet also depends on which lyrics were looked up
+        return self.key(content_hash, "sheet",
+                        fingerprint(sheet=sheet_fp, artist=artist, title=title))
+
+    def _entry_dir(self, stage: str, key: str) -> Path:
+        return self.root / stage / key
+
+    # --- Lookups ---
+
+    def get_json(self, stage: str, key: str) -> Optional[Any]:
+        entry = self._lookup(stage, key)
+        if entry is None:
+            return None
+        try:
+            with open(entry / self.VALUE_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Entry was evicted or half-written by a crashed process
+            return None
+
+    def get_files(self, stage: str, key: str,
+                  names: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """
+        Returns {logical_name: absolute_path} if every file of the entry exists.
+        'names' maps logical names (e.g. 'vocals') to stored filenames.
+        """
+        entry = self._lookup(stage, key)
+        if entry is None:
+            return None
+
+        files = {name: str(entry / filename) for name, filename in names.items()}
+        if not all(os.path.exists(p) for p in files.values()):
+            return None
+        return files
+
+    def _lookup(self, stage: str, key: str) -> Optional[Path]:
+        entry = self._entry_dir(stage, key)
+        if not self.enabled or not entry.is_dir():
+            self._count(self.misses, stage)
+            return None
+
+        # Touch the entry so LRU eviction sees it as recently used
+        try:
+            os.utime(entry, None)
+        except OSError:
+            self._count(self.misses, stage)
+            return None
+
+        self._count(self.hits, stage)
+        return entry
+
+    # --- Artifacts ---
+    # Stage outputs handed from one Celery stage task to the next by
+    # reference ({"stage", "key"}) instead of through the result backend.
+    # They must be readable even when cache lookups are disabled.
+
+    @staticmethod
+    def artifact_ref(stage: str, key: str) -> Dict[str, str]:
+        return {"stage": stage, "key": key}
+
+    def load_artifact(self, ref: Dict[str, str]) -> Any:
+        entry = self._entry_dir(ref["stage"], ref["key"])
+        with open(entry / self.VALUE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def artifact_files(self, ref: Dict[str, str],
+                       names: Dict[str, str]) -> Dict[str, str]:
+        entry = self._entry_dir(ref["stage"], ref["key"])
+        files = {name: str(entry / filename) for name, filename in names.items()}
+        missing = [p for p in files.values() if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"Artifact files missing: {missing}")
+        return files
+
+    # --- Writes ---
+
+    def put_json(self, stage: str, key: str, value: Any) -> None:
+        def write(tmp_dir: Path):
+            with open(tmp_dir / self.VALUE_FILE, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+
+        self._commit(stage, key, write)
+
+    def put_files(self, stage: str, key: str,
+                  files: Dict[str, str]) -> Dict[str, str]:
+        """
+        Moves the given files into the cache and returns their new paths.
+        'files' maps logical names to source paths; the source filename is kept.
+        """
+        def write(tmp_dir: Path):
+            for src in files.values():
+                shutil.move(str(src), str(tmp_dir / Path(src).name))
+
+        entry = self._commit(stage, key, write)
+        return {name: str(entry / Path(src).name) for name, src in files.items()}
+
+    def _commit(self, stage: str, key: str, write) -> Path:
+        entry = self._entry_dir(stage, key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write into a private temp dir, then rename: readers never see partial entries
+        tmp_dir = entry.parent / f".tmp-{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            write(tmp_dir)
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_dir, entry)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            # Another process committed the same key first; theirs is as good as ours
+            if not entry.is_dir():
+                raise
+
+        self.evict(keep=entry)
+        return entry
+
+    # --- Eviction ---
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """
+        Deletes least recently used entries until the cache fits in max_bytes.
+        Returns the number of bytes freed.
+        """
+        entries = []
+        total = 0
+        for stage_dir in self.root.iterdir():
+            if not stage_dir.is_dir():
+                continue
+            for entry in stage_dir.iterdir():
+                if entry.name.startswith(".tmp-") or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue  # Evicted concurrently
+                entries.append((mtime, size, entry))
+                total += size
+
+        freed = 0
+        for mtime, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total - freed <= self.max_bytes:
+                break
+            if keep is not None and entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            freed += size
+
+        return freed
+
+    # --- Stats ---
+
+    def _count(self, counter: Dict[str, int], stage: str):
+        with self._lock:
+            counter[stage] = counter.get(stage, 0) + 1
+        CACHE_REQUESTS.labels(stage,
+                              "hit" if counter is self.hits else "miss").inc()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            stages = set(self.hits) | set(self.misses)
+            return {
+                stage: {"hits": self.hits.get(stage, 0),
+                        "misses": self.misses.get(stage, 0)}
+                for stage in sorted(stages)
+            }
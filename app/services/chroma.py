@@ -0,0 +1,250 @@
+# app/services/chroma.py
+from typing import Dict, Iterator, List, Tuple, Union
+import numpy as np
+from app.core.metrics import stage_timer
+from app.services.buffer import AudioBuffer
+from app.services.streaming import (NO_CHORD, as_buffer, stream_chords,
+                                    use_windows)
+
+# Kept free of ML imports: plain NumPy, no model to load.
+#
+# "Quick draft" chord recognition (CHORD_MODE=fast), a fraction of the CPU
+# of madmom's CNN+CRF:
+#   1. one STFT pass at 11.025 kHz gives both a chromagram and an onset curve
+#   2. beats are tracked on the onset curve (tempo + dynamic programming)
+#   3. chroma is averaged between beats, so chords can only change on a beat
+#   4. each beat is scored against 24 major/minor triad templates plus
+#      "no chord", and Viterbi picks the best path with a penalty per change
+# Labels use madmom's notation ("C:maj", "A:min"), so sheets look the same.
+
+FAST_SAMPLE_RATE = 11025
+N_FFT = 4096  # 2.7 Hz bins: enough to separate semitones above ~90 Hz
+ONSET_FFT = 1024  # Onsets need timing, not resolution: a short window
+HOP = 512  # 46 ms frames
+MIN_FREQ = 65.0  # C2
+MAX_FREQ = 2100.0  # C7
+FRAME_BLOCK = 1024  # Frames per STFT block (caps the spectrogram's memory)
+
+PITCH_CLASSES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#",
+                 "B"]
+# Decoder tuning (chosen on the synthetic songs in benchmarks/synth.py)
+CHANGE_PENALTY = 0.15  # Score a chord change costs, in cosine-similarity units
+NO_CHORD_SCORE = 0.35  # Similarity "N" gets; silent beats score 1.0
+SILENCE_DB = -45.0  # Beats this far below the loudest beat are silent
+TEMPO_PRIOR_BPM = 120.0
+BEAT_TIGHTNESS = 100.0
+
+
+def _pitch_class_matrix(sr: int, n_fft: int) -> np.ndarray:
+    """(bins, 12) map from STFT bins to pitch classes, MIN..MAX_FREQ only."""
+    freqs = np.arange(n_fft // 2 + 1) * sr / n_fft
+    matrix = np.zeros((len(freqs), 12), dtype=np.float32)
+    valid = (freqs >= MIN_FREQ) & (freqs <= MAX_FREQ)
+    midi = 69 + 12 * np.log2(freqs[valid] / 440.0)
+    nearest = np.round(midi)
+    # Bins between two semitones count less than bins right on one
+    weight = np.exp(-0.5 * ((midi - nearest) / 0.25) ** 2)
+    matrix[np.flatnonzero(valid), nearest.astype(int) % 12] = weight
+    return matrix
+
+
+def _band_matrix(sr: int, n_fft: int, bands: int = 48) -> np.ndarray:
+    """(bins, bands) averaging matrix over log-spaced bands, 30 Hz..5 kHz."""
+    freqs = np.arange(n_fft // 2 + 1) * sr / n_fft
+    edges = np.geomspace(30.0, 5000.0, bands + 1)
+    band = np.searchsorted(edges, freqs) - 1
+    matrix = np.zeros((len(freqs), bands), dtype=np.float32)
+    valid = (band >= 0) & (band < bands)
+    matrix[np.flatnonzero(valid), band[valid]] = 1.0
+    return matrix / np.maximum(matrix.sum(axis=0), 1.0)
+
+
+def chroma_and_onsets(y: np.ndarray, sr: int = FAST_SAMPLE_RATE
+                      ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (chroma (frames, 12), onset strength (frames,)); frame i is
+    centered on sample i * HOP. Frames are computed in blocks, so a long
+    song never holds its whole spectrogram in memory.
+    """
+    y = np.pad(np.asarray(y, dtype=np.float32), N_FFT // 2)
+    n_frames = 1 + (len(y) - N_FFT) // HOP
+
+    def framed(length: int, offset: int):
+        view = y[offset:]
+        return np.lib.stride_tricks.as_strided(
+            view, shape=(n_frames, length), strides=(HOP * 4, 4),
+            writeable=False)
+
+    long_frames = framed(N_FFT, 0)
+    short_frames = framed(ONSET_FFT, (N_FFT - ONSET_FFT) // 2)
+    long_window = np.hanning(N_FFT).astype(np.float32)
+    short_window = np.hanning(ONSET_FFT).astype(np.float32)
+    to_chroma = _pitch_class_matrix(sr, N_FFT)
+    to_bands = _band_matrix(sr, ONSET_FFT)
+    chroma = np.empty((n_frames, 12), dtype=np.float32)
+    onsets = np.zeros(n_frames, dtype=np.float32)
+    previous = None
+    for start in range(0, n_frames, FRAME_BLOCK):
+        block = long_frames[start:start + FRAME_BLOCK] * long_window
+        magnitude = np.abs(np.fft.rfft(block, axis=1)).astype(np.float32)
+        chroma[start:start + len(block)] = np.log1p(100.0 * magnitude) @ to_chroma
+
+        # Spectral flux over coarse bands (averaging keeps noise out of it):
+        # how much louder each band got since the last frame
+        block = short_frames[start:start + FRAME_BLOCK] * short_window
+        magnitude = np.abs(np.fft.rfft(block, axis=1)).astype(np.float32)
+        bands = np.log1p(10.0 * (magnitude @ to_bands))
+        before = previous if previous is not None else bands[:1]
+        onsets[start:start + len(block)] = np.maximum(
+            0.0, np.diff(bands, axis=0, prepend=before)).sum(axis=1)
+        previous = bands[-1:]
+
+    # Only peaks above the local (~1 s) level count as onsets
+    local = np.convolve(onsets, np.ones(21) / 21, mode="same")
+    return chroma, np.maximum(0.0, onsets - local)
+
+
+def estimate_period(onsets: np.ndarray, sr: int = FAST_SAMPLE_RATE) -> float:
+    """
+    Beat period in frames: onset autocorrelation, weighted toward 120 BPM.
+    Sparse material (a pad changing once per bar) only repeats at the bar;
+    that period is halved down to >= 60 BPM, so the grid still has beats.
+    """
+    env = onsets - onsets.mean()
+    n = len(env)
+    if n < 4 or not env.any():
+        return 0.5 * sr / HOP
+    spectrum = np.fft.rfft(env, 2 * n)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+
+    frame_rate = sr / HOP
+    lags = np.arange(1, n)
+    bpm = 60.0 * frame_rate / lags
+    valid = (bpm >= 20) & (bpm <= 240)
+    if not valid.any():
+        return 0.5 * frame_rate
+    prior = np.exp(-0.5 * np.log2(bpm[valid] / TEMPO_PRIOR_BPM) ** 2)
+    period = float(lags[valid][np.argmax(autocorr[1:][valid] * prior)])
+    while period > frame_rate:
+        period /= 2
+    return period
+
+
+def track_beats(onsets: np.ndarray, period: float) -> np.ndarray:
+    """
+    Beat frames by dynamic programming (Ellis 2007): every beat is worth
+    its onset strength, and the gap to the previous beat is penalized by
+    how far it strays from the period.
+    """
+    n = len(onsets)
+    std = onsets.std()
+    env = onsets / std if std > 0 else onsets
+    score = env.astype(np.float64).copy()
+    backlink = np.full(n, -1)
+
+    low, high = int(round(period / 2)), int(round(2 * period))
+    gaps = np.arange(high, low - 1, -1)
+    gap_cost = -BEAT_TIGHTNESS * np.log(gaps / period) ** 2
+    for t in range(low, n):
+        first = t - high
+        candidates = score[max(0, first):t - low + 1] + gap_cost[
+            max(0, -first):]
+        best = int(np.argmax(candidates))
+        if candidates[best] > 0:
+            score[t] += candidates[best]
+            backlink[t] = max(0, first) + best
+
+    # Last beat: the best score within the final period
+    tail = max(0, n - int(round(period)))
+    beat = tail + int(np.argmax(score[tail:])) if n else -1
+    beats = []
+    while beat >= 0:
+        beats.append(beat)
+        beat = backlink[beat]
+    return np.array(beats[::-1], dtype=int)
+
+
+def chord_templates() -> Tuple[List[str], np.ndarray]:
+    """24 unit-norm triad templates; the 25th row (no chord) stays zero."""
+    labels, rows = [], []
+    for quality, third in (("maj", 4), ("min", 3)):
+        for root in range(12):
+            row = np.zeros(12, dtype=np.float32)
+            row[[root, (root + third) % 12, (root + 7) % 12]] = 1.0
+            labels.append(f"{PITCH_CLASSES[root]}:{quality}")
+            rows.append(row / np.linalg.norm(row))
+    labels.append(NO_CHORD)
+    rows.append(np.zeros(12, dtype=np.float32))
+    return labels, np.stack(rows)
+
+
+def viterbi_decode(scores: np.ndarray, change_penalty: float) -> np.ndarray:
+    """
+    Best state path for (steps, states) scores when staying is free and any
+    change costs 'change_penalty'. O(steps * states), no transition matrix.
+    """
+    steps, states = scores.shape
+    total = scores[0].astype(np.float64).copy()
+    backlink = np.zeros((steps, states), dtype=np.int32)
+    for t in range(1, steps):
+        best = int(np.argmax(total))
+        switch = total[best] - change_penalty
+        stay = total >= switch
+        backlink[t] = np.where(stay, np.arange(states), best)
+        total = np.where(stay, total, switch) + scores[t]
+
+    path = np.empty(steps, dtype=np.int32)
+    path[-1] = int(np.argmax(total))
+    for t in range(steps - 1, 0, -1):
+        path[t - 1] = backlink[t, path[t]]
+    return path
+
+
+class FastChordService:
+    """Same interface as HarmonyService; nothing to load."""
+
+    def __init__(self, change_penalty: float = CHANGE_PENALTY):
+        self.change_penalty = change_penalty
+        self.labels, self.templates = chord_templates()
+
+    def extract_chords(self, audio: Union[str, AudioBuffer]) -> List[Dict]:
+        audio = as_buffer(audio)
+        if use_windows(audio):
+            return list(self.iter_chords(audio))
+        return [{"timestamp": round(start, 3), "label": label}
+                for start, _, label in self.decode(audio.mono(FAST_SAMPLE_RATE))
+                if label != NO_CHORD]
+
+    def iter_chords(self, audio: Union[str, AudioBuffer]) -> Iterator[Dict]:
+        """extract_chords() window by window (see streaming.py)."""
+        return stream_chords(self.decode, as_buffer(audio), FAST_SAMPLE_RATE)
+
+    def decode(self, mono: np.ndarray, sample_rate: int = FAST_SAMPLE_RATE
+               ) -> List[Tuple[float, float, str]]:
+        """(start, end, label) segments covering 'mono', "N" included."""
+        with stage_timer("chroma_features"):
+            chroma, onsets = chroma_and_onsets(mono, sample_rate)
+            beats = track_beats(onsets, estimate_period(onsets, sample_rate))
+
+        with stage_timer("chroma_decode"):
+            # Segments run from one beat to the next (the first from 0)
+            bounds = np.unique(np.concatenate([[0], beats]))
+            bounds = bounds[bounds < len(chroma)]
+            counts = np.diff(np.append(bounds, len(chroma)))
+            beat_chroma = np.add.reduceat(chroma, bounds, axis=0) / counts[:, None]
+
+            energy = beat_chroma.sum(axis=1)
+            norms = np.linalg.norm(beat_chroma, axis=1)
+            similarity = (beat_chroma @ self.templates.T) / np.maximum(
+                norms, 1e-9)[:, None]
+            loudness = 20 * np.log10(np.maximum(energy, 1e-9) /
+                                     max(float(energy.max()), 1e-9))
+            similarity[:, -1] = np.where(loudness < SILENCE_DB, 1.0,
+                                         NO_CHORD_SCORE)
+            path = viterbi_decode(similarity, self.change_penalty)
+
+        times = np.append(bounds * HOP / sample_rate, len(mono) / sample_rate)
+        changes = np.flatnonzero(np.diff(path, prepend=-1))
+        ends = np.append(changes[1:], len(path))
+        return [(float(times[i]), float(times[j]), self.labels[path[i]])
+                for i, j in zip(changes, ends)]
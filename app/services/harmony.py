@@ -1,29 +1,61 @@
 # app/services/harmony.py
-import os
+from typing import Dict, Iterator, List, Tuple, Union
+import numpy as np
+from madmom.audio.signal import Signal
 from madmom.features.chords import CNNChordFeatureProcessor, CRFChordRecognitionProcessor
+from app.core.metrics import model_load_timer, stage_timer
+from app.services.buffer import AudioBuffer
+from app.services.streaming import (NO_CHORD, as_buffer, stream_chords,
+                                    use_windows)
+
+# The chord CNN was trained on 44.1kHz mono input
+MADMOM_SAMPLE_RATE = 44100
 
 class HarmonyService:
     def __init__(self):
-        # 1. Feature Processor (CNN)
-        self.feature_processor = CNNChordFeatureProcessor()
-        # 2. Decoder (CRF - Conditional Random Field)
-        # This is the standard match for the CNN processor
-        self.chord_processor = CRFChordRecognitionProcessor()
-
-    def extract_chords(self, audio_path: str):
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        with model_load_timer("madmom"):
+            # 1. Feature Processor (CNN)
+            self.feature_processor = CNNChordFeatureProcessor()
+            # 2. Decoder (CRF - Conditional Random Field)
+            # This is the standard match for the CNN processor
+            self.chord_processor = CRFChordRecognitionProcessor()
 
-        # This produces the correct feature shape for the CRF processor
-        feats = self.feature_processor(audio_path)
-        decoded_chords = self.chord_processor(feats)
+    def extract_chords(self, audio: Union[str, AudioBuffer]) -> List[Dict]:
+        # FIX: an hour-long stem used to materialize CNN features for the
+        # whole file at once; long recordings now go window by window
+        audio = as_buffer(audio)
+        if use_windows(audio):
+            return list(self.iter_chords(audio))
 
+        # madmom only resamples files it loads itself, so the shared
+        # buffer provides 44.1kHz mono and madmom skips its own decode
         chords_data = []
-        for start, end, label in decoded_chords:
-            if label != "N":
+        for start, end, label in self.decode(audio.mono(MADMOM_SAMPLE_RATE)):
+            if label != NO_CHORD:
                 chords_data.append({
-                    "timestamp": round(float(start), 3),
+                    "timestamp": round(start, 3),
                     "label": label
                 })
 
-        return chords_data
\ No newline at end of file
+        return chords_data
+
+    def iter_chords(self, audio: Union[str, AudioBuffer]) -> Iterator[Dict]:
+        """
+        Chords as they are found, one window at a time (see streaming.py).
+        Memory stays flat however long the recording is.
+        """
+        return stream_chords(self.decode, as_buffer(audio), MADMOM_SAMPLE_RATE)
+
+    def decode(self, mono: np.ndarray, sample_rate: int = MADMOM_SAMPLE_RATE
+               ) -> List[Tuple[float, float, str]]:
+        """(start, end, label) segments covering 'mono', "N" included."""
+        audio = Signal(mono, sample_rate=sample_rate)
+
+        # This produces the correct feature shape for the CRF processor
+        with stage_timer("madmom_features"):
+            feats = self.feature_processor(audio)
+        with stage_timer("crf_decode"):
+            decoded_chords = self.chord_processor(feats)
+
+        return [(float(start), float(end), label)
+                for start, end, label in decoded_chords]
@@ -0,0 +1,145 @@
+# app/services/ingest.py
+import hashlib
+import os
+import re
+import subprocess
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+
+# Kept free of ML imports: this module runs inside the API process.
+
+
+class UploadRejected(Exception):
+    """Raised when an upload breaks a size/duration/format limit."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredUpload:
+    path: str  # Content-addressed location: [raw_dir]/[sha256][ext]
+    content_hash: str
+    size: int
+    original_name: str
+
+
+def parse_filename(file_path: str) -> Tuple[str, str]:
+    """
+    Extracts Artist and Title safely.
+    """
+    file_stem = Path(file_path).stem
+
+    if "_-_" in file_stem:
+        parts = file_stem.split("_-_", 1)
+        return parts[0].strip(), parts[1].strip()
+
+    for sep in [" - ", " – "]:
+        if sep in file_stem:
+            parts = file_stem.split(sep, 1)
+            return parts[0].strip(), parts[1].strip()
+
+    return "Unknown Artist", file_stem
+
+
+def safe_filename(filename: Optional[str]) -> str:
+    """
+    Strips directories and odd characters from a client-supplied filename.
+    It is only used for display and the artist/title guess, never as a path.
+    """
+    name = Path(filename or "upload").name
+    name = re.sub(r"[^\w\s.\-–()'&,]", "_", name).strip(" .")
+    return name or "upload"
+
+
+async def save_upload(upload, dest_dir: str, max_bytes: int,
+                      chunk_size: int = 1024 * 1024) -> StoredUpload:
+    """
+    Streams an UploadFile to disk in chunks without blocking the event loop,
+    hashing it on the fly. The file ends up named after its SHA-256, so the
+    same song uploaded twice lands on the same path.
+    """
+    original_name = safe_filename(upload.filename)
+    suffix = Path(original_name).suffix.lower()[:10]
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(dest_dir, f".upload-{uuid.uuid4().hex}{suffix}")
+
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(
+                        413, f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+    if size == 0:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise UploadRejected(400, "Empty file")
+
+    content_hash = digest.hexdigest()
+    final_path = os.path.join(dest_dir, f"{content_hash}{suffix}")
+    # Identical bytes may already be on disk; either copy is fine
+    os.replace(tmp_path, final_path)
+
+    return StoredUpload(path=final_path, content_hash=content_hash,
+                        size=size, original_name=original_name)
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """
+    Duration in seconds via ffprobe (reads the header, not the whole file).
+    Returns None when ffprobe is unavailable or can't tell.
+    """
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", file_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True,
+                                timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def normalize_audio(file_path: str, sample_rate: int = 44100) -> str:
+    """
+    Converts the upload to canonical mono 16-bit PCM WAV next to the original.
+    Blocking (ffmpeg); call it from a worker thread.
+    """
+    out_path = str(Path(file_path).with_suffix(".wav"))
+    if out_path == file_path:
+        out_path = str(Path(file_path).with_suffix(".norm.wav"))
+    if os.path.exists(out_path):
+        return out_path
+
+    tmp_path = out_path + f".{uuid.uuid4().hex}.tmp.wav"
+    cmd = ["ffmpeg", "-v", "error", "-y", "-i", file_path,
+           "-ac", "1", "-ar", str(sample_rate), "-c:a", "pcm_s16le", tmp_path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise UploadRejected(415, f"Could not decode audio: {result.stderr}")
+
+    os.replace(tmp_path, out_path)
+    return out_path
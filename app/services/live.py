@@ -0,0 +1,228 @@
+# app/services/live.py
+import bisect
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.services.aligner import AlignerService
+from app.services.assembly import assemble_sheet
+from app.services.buffer import AudioBuffer
+from app.services.streaming import NO_CHORD, Decoder
+
+# Kept free of ML imports: the API relays a session's audio and events by
+# these names, and the models are handed to LiveSession by the worker
+# (workers/live.py) or the replay benchmark (benchmarks/bench_live.py).
+#
+# Redis carries a live session between the two:
+#   live:{id}:audio   list of raw PCM chunks (int16 mono), END_OF_STREAM last
+#   live:{id}:events  pub/sub channel of the session's JSON events
+
+END_OF_STREAM = b""
+# Results this close to the start of a window may be cut off mid-word
+EDGE_SECONDS = 0.3
+
+
+def live_audio_key(session_id: str) -> str:
+    return f"live:{session_id}:audio"
+
+
+def live_channel(session_id: str) -> str:
+    return f"live:{session_id}:events"
+
+
+def pcm16_to_float(data: bytes) -> Tuple[np.ndarray, bytes]:
+    """
+    Little-endian 16-bit PCM (what browsers' recorders send) as float32,
+    and the odd trailing byte if a frame ended mid-sample: it goes in front
+    of the next batch, or every later sample would be misaligned.
+    """
+    usable = len(data) - len(data) % 2
+    samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+    return samples / 32768, data[usable:]
+
+
+class LiveSession:
+    """
+    Near-live chord sheet of an audio stream.
+
+    Audio arrives in chunks (feed). Once 'hop' seconds of new audio are in,
+    the last 'window' seconds are analyzed again: optional separation, then
+    Whisper on the vocals and the chord decoder on the rest. Whatever ends
+    within 'lookahead' seconds of the newest audio is tentative (the next
+    window hears more of it and may change it); everything before is
+    committed: sent once, never revised. Committed words get the chord
+    active at their start (AlignerService.align).
+
+    The caller decides how often feed() runs: a worker that fell behind
+    feeds all the audio that queued up at once and gets one update for it,
+    so the analysis never lags more than one update behind the input.
+    """
+
+    def __init__(self, transcriber, decode: Decoder, chord_sample_rate: int,
+                 separate: Callable[[AudioBuffer], Dict] = None,
+                 sample_rate: int = 16000, window: float = None,
+                 hop: float = None, lookahead: float = None,
+                 beam_size: int = None, aligner: AlignerService = None):
+        self.transcriber = transcriber
+        self.decode = decode
+        self.chord_sample_rate = chord_sample_rate
+        self.separate = separate
+        self.sample_rate = sample_rate
+        self.window = window or settings.LIVE_WINDOW_SECONDS
+        self.hop = hop or settings.LIVE_HOP_SECONDS
+        self.lookahead = (settings.LIVE_LOOKAHEAD_SECONDS if lookahead is None
+                          else lookahead)
+        if self.window < self.lookahead + self.hop + 2 * EDGE_SECONDS:
+            raise ValueError("window must cover lookahead + hop: results "
+                             "would leave it before they are committed")
+        self.beam_size = beam_size or settings.LIVE_BEAM_SIZE
+        self.aligner = aligner or AlignerService()
+
+        self._audio = np.zeros(0, dtype=np.float32)  # The last window
+        self.received = 0  # Samples since the start of the stream
+        self._analyzed = 0  # Samples in when the last update ran
+        self.words: List[Dict] = []  # Committed, in order
+        self.chords: List[Dict] = []  # Committed chord changes
+        self._words_until = 0.0  # Stream time before which words are final
+        self._chords_until = 0.0
+        self._label: Optional[str] = None  # Last committed label ("N" too)
+        self._chord_times: List[float] = []  # Of self.chords, for bisect
+        self._word_chord: Optional[str] = None  # Of the last committed word
+        self.result: Optional[Dict] = None
+
+    @property
+    def stream_seconds(self) -> float:
+        return self.received / self.sample_rate
+
+    def feed(self, samples: np.ndarray) -> Optional[Dict]:
+        """Adds mono samples; returns an 'update' event once a hop is in."""
+        keep = int(self.window * self.sample_rate)
+        self._audio = np.concatenate([self._audio, samples])[-keep:]
+        self.received += len(samples)
+        if self.received - self._analyzed < self.hop * self.sample_rate:
+            return None
+        return self._update(final=False)
+
+    def finish(self) -> Dict:
+        """
+        End of the stream: commits what is left and returns the 'final'
+        event, with the whole sheet (self.result keeps it for the store).
+        """
+        event = self._update(final=True)
+        self.result = assemble_sheet(self.aligner, self.words, self.chords)
+        event.update(type="final", sheet=self.result["sheet"],
+                     sheet_text=self.result["sheet_text"])
+        return event
+
+    def _update(self, final: bool) -> Dict:
+        started = time.perf_counter()
+        end = self.stream_seconds
+        start = end - len(self._audio) / self.sample_rate
+        # Nothing comes after the last window: all of it is final
+        horizon = end if final else end - self.lookahead
+        self._analyzed = self.received
+
+        vocals = other = AudioBuffer.from_array(self._audio, self.sample_rate)
+        if self.separate is not None and len(self._audio):
+            stems = self.separate(vocals)
+            vocals, other = stems["vocals"], stems["other"]
+        words = (self.transcriber.transcribe(vocals, self._prompt(),
+                                             self.beam_size)
+                 if len(self._audio) else [])
+        segments = (self.decode(other.mono(self.chord_sample_rate),
+                                self.chord_sample_rate)
+                    if len(self._audio) else [])
+
+        new_words, tentative_words = self._settle_words(words, start, horizon)
+        new_chords, tentative_chords = self._settle_chords(segments, start,
+                                                           horizon)
+        committed_words = self._align_next(new_words)
+        if committed_words:
+            self._word_chord = committed_words[-1]["chord"]
+        return {
+            "type": "update",
+            "time": round(end, 3),
+            "committed": {"words": committed_words, "chords": new_chords},
+            "tentative": {
+                "words": self._align_next(tentative_words, tentative_chords),
+                "chords": tentative_chords},
+            "compute_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _align_next(self, words: List[Dict], later_chords: List[Dict] = ()
+                    ) -> List[Dict]:
+        """
+        align() of words that follow the committed ones, as if aligned with
+        the whole session, but only against the chords that can reach them:
+        the committed one active at the first word on, plus 'later_chords'.
+        The cost stays bounded by the window, not the session's length.
+        """
+        if not words:
+            return []
+        first = bisect.bisect_right(self._chord_times, words[0]["start"]) - 1
+        aligned = self.aligner.align(
+            words, self.chords[max(first, 0):] + list(later_chords))
+        # The chord change is counted from the last committed word
+        if self._word_chord is not None:
+            aligned[0]["is_new_chord"] = aligned[0]["chord"] != self._word_chord
+        return aligned
+
+    def _prompt(self) -> Optional[str]:
+        # The words just committed steer Whisper through the window's start
+        text = " ".join(w["text"] for w in self.words[-30:])
+        return text[-200:] or None
+
+    def _settle_words(self, words: List[Dict], start: float, horizon: float
+                      ) -> Tuple[List[Dict], List[Dict]]:
+        committed, tentative = [], []
+        for word in words:
+            # Window positions to stream time; line breaks come from pauses
+            # (Whisper's segment ids restart in every window)
+            word = dict(word, start=round(start + word["start"], 3),
+                        end=round(start + word["end"], 3), segment=None)
+            if word["start"] < self._words_until:
+                continue  # Already decided
+            if start > 0 and word["start"] < start + EDGE_SECONDS:
+                continue  # Cut off by the window
+            if word["end"] <= horizon and not tentative:
+                committed.append(word)
+            else:
+                tentative.append(word)
+
+        self.words.extend(committed)
+        # A word still open at the horizon is decided by a later window
+        until = tentative[0]["start"] if tentative else horizon
+        if committed:
+            until = max(until, committed[-1]["end"])
+        self._words_until = max(self._words_until, until)
+        return committed, tentative
+
+    def _settle_chords(self, segments, start: float, horizon: float
+                       ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Like stream_chords, every instant is decided by one window: the
+        part of the segments before the horizon is committed (so the words
+        committed with it know their chord), the rest is tentative.
+        """
+        committed, tentative = [], []
+        previous = self._label
+        for seg_start, seg_end, label in segments:
+            seg_start, seg_end = start + seg_start, start + seg_end
+            if seg_end <= self._chords_until:
+                continue
+            seg_start = max(seg_start, self._chords_until)
+            if seg_start < horizon:
+                if label != self._label and label != NO_CHORD:
+                    committed.append({"timestamp": round(seg_start, 3),
+                                      "label": label})
+                self._label = previous = label
+                self._chords_until = min(seg_end, horizon)
+            elif label != previous:
+                previous = label
+                if label != NO_CHORD:
+                    tentative.append({"timestamp": round(seg_start, 3),
+                                      "label": label})
+
+        self.chords.extend(committed)
+        self._chord_times.extend(c["timestamp"] for c in committed)
+        return committed, tentative
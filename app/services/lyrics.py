@@ -0,0 +1,358 @@
+# app/services/lyrics.py
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, stage_timer
+from app.services.ingest import parse_filename
+
+# Kept free of ML imports: the lyrics stage worker only needs this.
+
+logger = logging.getLogger(__name__)
+
+LYRICS_EXTENSIONS = (".txt", ".lrc")
+
+# LRC timestamps ([01:23.45]) and ID tags ([ar:Artist]); also Genius-style
+# section headers ([Chorus]) in plain text files
+_BRACKETS = re.compile(r"\[.*?\]")
+_FEATURING = re.compile(r"[(\[]?\b(feat|ft|featuring)\b\.?.*$")
+_PARENS = re.compile(r"[(\[].*?[)\]]")
+
+
+def normalize_key(artist: str, title: str) -> str:
+    """
+    Cache/index key: lowercase, no accents, no "(feat. X)" or "(Remastered)",
+    punctuation dropped. 'Beyoncé - Halo (Live)' == 'beyonce - halo'.
+    """
+    def norm(text: str) -> str:
+        text = unicodedata.normalize("NFKD", text or "")
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        text = text.lower().replace("&", " and ")
+        text = _FEATURING.sub("", _PARENS.sub("", text))
+        return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+    return f"{norm(artist)}|{norm(title)}"
+
+
+def clean_lyrics(text: str) -> str:
+    if not text: return ""
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'\d*Embed', '', text)
+    text = re.sub(r'.*?Contributors', '', text)
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    return " ".join(lines)
+
+
+def read_lyrics_file(path: str) -> str:
+    """Plain text or LRC: timestamps, tags and section headers are dropped."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        lines = [_BRACKETS.sub("", line).strip() for line in f]
+    return " ".join(line for line in lines if line)
+
+
+# --- Providers ---
+# search(artist, title) returns the lyrics as one line of text, or None if
+# the source does not have the song. Errors are raised, not swallowed: the
+# service must not cache a "not found" that was really a network failure.
+# 'remote' providers sit behind the SQLite cache; local ones are asked first.
+
+
+class GeniusProvider:
+    name = "genius"
+    remote = True
+
+    def __init__(self, token: str, timeout: float = 10.0):
+        from lyricsgenius import Genius
+        self.genius = Genius(token, timeout=timeout, retries=0, verbose=False)
+
+    def search(self, artist: str, title: str) -> Optional[str]:
+        print(f"DEBUG: Searching Genius for {artist} - {title}...", flush=True)
+        with stage_timer("genius"):
+            song = self.genius.search_song(title, artist)
+        return clean_lyrics(song.lyrics) if song else None
+
+
+class LocalLyricsProvider:
+    """
+    A directory of 'Artist - Title.txt|.lrc' files (or 'Artist/Title.lrc'),
+    matched by normalized artist/title. New files are picked up on the
+    next miss, so songs can be added while the workers run. A miss only
+    walks the tree again if the directory or an artist folder changed
+    (their mtimes), or the last walk is 'rescan_seconds' old.
+    """
+    name = "local"
+    remote = False
+
+    def __init__(self, directory: str, rescan_seconds: float = 300.0):
+        self.directory = Path(directory)
+        self.rescan_seconds = rescan_seconds
+        self._index: Dict[str, Path] = {}
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._scanned = None  # (time, mtimes) of the last walk
+        self.rescan()
+
+    def _mtimes(self) -> Tuple:
+        # One listing of the top level: adding 'Artist/Title.lrc' changes
+        # the artist folder's mtime, a new folder or file the directory's
+        try:
+            entries = [self.directory] + [
+                Path(e.path) for e in os.scandir(self.directory)
+                if e.is_dir()]
+            return tuple(sorted((str(p), p.stat().st_mtime_ns)
+                                for p in entries))
+        except OSError:
+            return ()
+
+    def _stale(self) -> bool:
+        scanned_at, mtimes = self._scanned
+        return (time.monotonic() - scanned_at > self.rescan_seconds
+                or self._mtimes() != mtimes)
+
+    def rescan(self):
+        mtimes = self._mtimes()
+        index = {}
+        if self.directory.is_dir():
+            for path in self.directory.rglob("*"):
+                if path.suffix.lower() not in LYRICS_EXTENSIONS:
+                    continue
+                if path.parent == self.directory:
+                    artist, title = parse_filename(path.name)
+                else:
+                    artist, title = path.parent.name, path.stem
+                # .lrc wins over .txt: same words, and it is usually newer
+                key = normalize_key(artist, title)
+                if key not in index or path.suffix.lower() == ".lrc":
+                    index[key] = path
+        with self._lock:
+            self._index = index
+            self._scanned = (time.monotonic(), mtimes)
+
+    def search(self, artist: str, title: str) -> Optional[str]:
+        key = normalize_key(artist, title)
+        if key not in self._index:
+            # Concurrent misses wait for one walk instead of each doing one
+            with self._scan_lock:
+                if key not in self._index and self._stale():
+                    self.rescan()
+        path = self._index.get(key)
+        return read_lyrics_file(str(path)) if path else None
+
+
+class FakeLyricsProvider:
+    """Canned lyrics for tests and benchmarks, keyed like the real ones."""
+    name = "fake"
+
+    def __init__(self, lyrics: Dict[Tuple[str, str], str] = None,
+                 delay: float = 0.0, remote: bool = True):
+        self.lyrics = {normalize_key(*song): text
+                       for song, text in (lyrics or {}).items()}
+        self.delay = delay
+        self.remote = remote
+        self.calls: List[Tuple[str, str]] = []
+
+    def search(self, artist: str, title: str) -> Optional[str]:
+        self.calls.append((artist, title))
+        if self.delay:
+            time.sleep(self.delay)
+        return self.lyrics.get(normalize_key(artist, title))
+
+
+# --- Cache ---
+
+
+class LyricsCache:
+    """
+    On-disk lyrics cache (SQLite) shared by every worker process.
+
+    Keyed by normalize_key(). Found lyrics live for 'ttl' seconds; songs no
+    provider had are remembered for the shorter 'miss_ttl', so a missing
+    song is not searched again on every upload. A connection is opened per
+    call, which keeps the cache safe across Celery forks and threads.
+    """
+
+    def __init__(self, path: str, ttl: float = 30 * 24 * 3600,
+                 miss_ttl: float = 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS lyrics ("
+                       "key TEXT PRIMARY KEY, artist TEXT, title TEXT, "
+                       "text TEXT, source TEXT, fetched_at REAL NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:  # Commits on success
+                yield db
+        finally:
+            db.close()
+
+    def get(self, artist: str, title: str) -> Tuple[bool, Optional[str]]:
+        """Returns (hit, text); a hit with text None is a cached miss."""
+        with self._connect() as db:
+            row = db.execute("SELECT text, fetched_at FROM lyrics WHERE key = ?",
+                             (normalize_key(artist, title),)).fetchone()
+        if row is None:
+            return False, None
+        text, fetched_at = row
+        ttl = self.ttl if text is not None else self.miss_ttl
+        if time.time() - fetched_at > ttl:
+            return False, None
+        return True, text
+
+    def put(self, artist: str, title: str, text: Optional[str],
+            source: str = None):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?, ?, ?, ?)",
+                       (normalize_key(artist, title), artist, title, text,
+                        source, time.time()))
+
+    def purge(self) -> int:
+        """Deletes expired rows; returns how many."""
+        now = time.time()
+        with self._connect() as db:
+            return db.execute(
+                "DELETE FROM lyrics WHERE fetched_at < ? OR "
+                "(text IS NULL AND fetched_at < ?)",
+                (now - self.ttl, now - self.miss_ttl)).rowcount
+
+
+# --- Service ---
+
+
+class LyricsService:
+    """
+    Looks lyrics up in order: local providers, the cache, remote providers.
+
+    fetch_async() lets the pipeline start the lookup before Demucs and
+    collect it afterwards; cache and local hits come back as an already
+    finished Future, without touching the thread pool or the network.
+    """
+
+    def __init__(self, providers: List, cache: LyricsCache = None,
+                 threads: int = 2):
+        self.providers = providers
+        self.cache = cache
+        self.threads = threads
+        self._pool = None
+        self._pool_pid = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _local(self, artist: str, title: str) -> Tuple[bool, Optional[str]]:
+        for provider in self.providers:
+            if provider.remote:
+                continue
+            text = provider.search(artist, title)
+            if text:
+                logger.info(f"Lyrics found in {provider.name}.")
+                return True, text
+        if self.cache is not None:
+            hit, text = self.cache.get(artist, title)
+            CACHE_REQUESTS.labels("lyrics", "hit" if hit else "miss").inc()
+            if hit:
+                return True, text
+        return False, None
+
+    def _remote(self, artist: str, title: str) -> Optional[str]:
+        failed = False
+        for provider in self.providers:
+            if not provider.remote:
+                continue
+            try:
+                text = provider.search(artist, title)
+            except Exception as e:
+                logger.error(f"{provider.name} lyrics lookup failed: {e}")
+                print(f"DEBUG: {provider.name} lyrics lookup failed: {e}",
+                      flush=True)
+                failed = True
+                continue
+            if text:
+                logger.info(f"Lyrics found in {provider.name}.")
+                print(f"DEBUG: Lyrics found in {provider.name}.", flush=True)
+                if self.cache is not None:
+                    self.cache.put(artist, title, text, provider.name)
+                return text
+
+        # Only a clean "not found" is remembered; errors are retried next time
+        if self.cache is not None and not failed:
+            self.cache.put(artist, title, None)
+        return None
+
+    def fetch(self, artist: str, title: str) -> Optional[str]:
+        if not (artist and title):
+            return None
+        found, text = self._local(artist, title)
+        return text if found else self._remote(artist, title)
+
+    def fetch_async(self, artist: str, title: str) -> Future:
+        if not (artist and title):
+            return self._done(None)
+        found, text = self._local(artist, title)
+        if found:
+            return self._done(text)
+
+        # Two jobs for the same song share one lookup
+        key = normalize_key(artist, title)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._executor().submit(self._remote, artist, title)
+                self._pending[key] = future
+                future.add_done_callback(
+                    lambda f: self._pending.pop(key, None))
+            return future
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork: each worker process gets its own pool
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=self.threads,
+                                            thread_name_prefix="lyrics")
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    @staticmethod
+    def _done(text: Optional[str]) -> Future:
+        future = Future()
+        future.set_result(text)
+        return future
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False)
+        self._pool = None
+
+
+def build_lyrics_service(config=settings) -> LyricsService:
+    """Providers from LYRICS_PROVIDERS, in order; Genius needs a token."""
+    providers = []
+    for name in config.LYRICS_PROVIDERS.split(","):
+        name = name.strip()
+        if name == "local":
+            providers.append(LocalLyricsProvider(config.LYRICS_DIR))
+        elif name == "genius" and config.GENIUS_API_TOKEN:
+            providers.append(GeniusProvider(config.GENIUS_API_TOKEN,
+                                            timeout=config.LYRICS_TIMEOUT))
+        elif name == "genius":
+            logger.warning("GENIUS_API_TOKEN is not set: Genius lookups are off")
+        elif name:
+            raise ValueError(f"Unknown lyrics provider: {name}")
+
+    cache = (LyricsCache(config.LYRICS_CACHE_FILE,
+                         ttl=config.LYRICS_CACHE_TTL,
+                         miss_ttl=config.LYRICS_MISS_TTL)
+             if config.LYRICS_CACHE_FILE else None)
+    return LyricsService(providers, cache, threads=config.LYRICS_FETCH_THREADS)
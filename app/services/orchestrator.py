@@ -1,94 +1,319 @@
 # app/services/orchestrator.py
 import logging
-import re
-# import concurrent.futures  <-- REMOVED: Cause of deadlock on CPU
-from lyricsgenius import Genius
-from app.core.config import settings
-from app.services.audio import AudioEngine
+import time
+# Threads running torch/OMP deadlocked after fork; model work now goes
+# through spawned StageWorker processes instead (see parallel.py).
+from concurrent.futures import Future
+from app.core.config import compute_type, inference_device, settings
+from app.core.metrics import AUDIO_SECONDS, REALTIME_FACTOR
+from app.services.cache import (ResultCache, fingerprint, hash_file,
+                                stage_fingerprints)
+from app.services.audio import AudioEngine, load_demucs_model
 from app.services.transcription import TranscriptionService
 from app.services.harmony import HarmonyService
+from app.services.lyrics import LyricsService, build_lyrics_service
 from app.services.aligner import AlignerService
+from app.services.assembly import assemble_sheet
+from app.services.chroma import FastChordService
+from app.services.parallel import StageWorker, wait_for
+from app.services.policy import whisper_params
+from app.services.progress import ProgressReporter
+from app.services.streaming import use_windows
+from app.services.registry import ModelRegistry
 
 logger = logging.getLogger(__name__)
 
 
+def _load_transcriber(model_size: str = None, compute: str = None):
+    model_size = model_size or settings.WHISPER_MODEL_SIZE
+    if settings.PARALLEL_STAGES:
+        # Each model lives in its own spawned process (see parallel.py)
+        return StageWorker(
+            "app.services.transcription:TranscriptionService",
+            threads=settings.TRANSCRIPTION_THREADS,
+            model_size=model_size,
+            device=inference_device(),
+            cpu_threads=settings.TRANSCRIPTION_THREADS,
+            compute_type=compute
+        )
+    return TranscriptionService(
+        model_size=model_size,
+        device=inference_device(),
+        compute_type=compute
+    )
+
+
+def whisper_model(registry: ModelRegistry, plan: dict = None) -> str:
+    """
+    Registry name of the Whisper model a job's plan asks for (see
+    policy.py). The configured one is 'whisper'; another size or compute
+    type loads on its first job and stays until a job asks for a third,
+    so a worker holds at most two Whispers (Celery children run one job
+    at a time: the one dropped is not in use).
+    """
+    params = whisper_params(settings, plan)
+    # "auto" and what it resolves to are the same model
+    model, compute = params["model"], params["compute_type"]
+    if compute == "auto":
+        compute = compute_type()
+    if (model, compute) == (settings.WHISPER_MODEL_SIZE, compute_type()):
+        return "whisper"
+    name = f"whisper:{model}:{compute}"
+    for other in registry.names():
+        if (other.startswith("whisper:") and other != name
+                and registry.is_loaded(other)):
+            registry.unload(other)
+    registry.register(name, lambda: _load_transcriber(model, compute),
+                      variant=f"{model}:{compute}")
+    return name
+
+
+def _load_harmony():
+    if settings.PARALLEL_STAGES:
+        return StageWorker("app.services.harmony:HarmonyService",
+                           threads=settings.HARMONY_THREADS)
+    return HarmonyService()
+
+
+def register_models(registry: ModelRegistry) -> ModelRegistry:
+    """
+    Declares the pipeline's models. madmom (plain numpy) and the lyrics
+    service are fork-safe; Demucs (torch) and Whisper (CTranslate2) start
+    thread pools and must be loaded after the Celery fork.
+    """
+    if settings.DEMUCS_IN_PROCESS:
+        registry.register("demucs", lambda: load_demucs_model(
+            settings.DEMUCS_MODEL, inference_device(),
+            settings.DEMUCS_THREADS), variant=settings.DEMUCS_MODEL)
+    registry.register(
+        "whisper", _load_transcriber,
+        variant=f"{settings.WHISPER_MODEL_SIZE}:{compute_type()}")
+    registry.register("madmom", _load_harmony,
+                      fork_safe=not settings.PARALLEL_STAGES)
+    # CHORD_MODE=fast: plain NumPy, nothing to load
+    registry.register("chroma", FastChordService, fork_safe=True)
+    # Its fetch threads and SQLite connections are opened per process
+    registry.register("lyrics", build_lyrics_service, fork_safe=True)
+    # Live sessions (workers/live.py) run a smaller Whisper of their own
+    registry.register(
+        "live-whisper", lambda: _load_transcriber(settings.LIVE_WHISPER_MODEL,
+                                                  settings.LIVE_COMPUTE_TYPE),
+        variant=f"{settings.LIVE_WHISPER_MODEL}:{settings.LIVE_COMPUTE_TYPE}")
+    return registry
+
+
+def lyrics_prompt(full_lyrics_text: str = None):
+    # The start of the lyrics steers Whisper's vocabulary
+    return full_lyrics_text[:200] if full_lyrics_text else None
+
+
+def fetch_lyrics(lyrics: LyricsService, artist: str, title: str):
+    """
+    Returns (full_lyrics_text, prompt_guide), both None if not found.
+    """
+    full_lyrics_text = lyrics.fetch(artist, title)
+    return full_lyrics_text, lyrics_prompt(full_lyrics_text)
+
+
 class ChordSheetGenerator:
-    def __init__(self):
+    def __init__(self, registry: ModelRegistry = None,
+                 load_demucs: bool = True):
+        self.cache = ResultCache(settings.CACHE_DIR,
+                                 max_bytes=settings.CACHE_MAX_BYTES,
+                                 enabled=settings.CACHE_ENABLED)
+        self.parallel = settings.PARALLEL_STAGES
+        # Models already preloaded into the registry are reused as they are
+        self.registry = register_models(
+            registry or ModelRegistry(settings.MODEL_FOOTPRINTS_FILE))
+
         print("DEBUG: [Orchestrator] Initializing AudioEngine...", flush=True)
-        self.audio_engine = AudioEngine()
+        # Demucs stays warm next to Whisper and madmom. load_demucs=False
+        # (batch analysis workers, whose stems are already cached) only
+        # loads it on a stem cache miss.
+        demucs = (self.registry.get("demucs")
+                  if settings.DEMUCS_IN_PROCESS and load_demucs else None)
+        self.audio_engine = AudioEngine(cache=self.cache, model=demucs)
 
         print(
             f"DEBUG: [Orchestrator] Initializing Whisper ({settings.WHISPER_MODEL_SIZE})...",
             flush=True)
-        self.transcriber = TranscriptionService(
-            model_size=settings.WHISPER_MODEL_SIZE,
-            device=settings.INFERENCE_DEVICE
-        )
+        self.transcriber = self.registry.get("whisper")
 
         print("DEBUG: [Orchestrator] Initializing HarmonyService...",
               flush=True)
-        self.harmony = HarmonyService()
+        # The other chord mode is loaded on its first job
+        self.harmony = self.chord_service(settings.CHORD_MODE)
+
         self.aligner = AlignerService()
-        self.genius = Genius(settings.GENIUS_API_TOKEN)
+        self.lyrics = self.registry.get("lyrics")
         print("DEBUG: [Orchestrator] All services ready!", flush=True)
 
-    def _clean_lyrics(self, text: str) -> str:
-        if not text: return ""
-        text = re.sub(r'\[.*?\]', '', text)
-        text = re.sub(r'\d*Embed', '', text)
-        text = re.sub(r'.*?Contributors', '', text)
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        return " ".join(lines)
+    def close(self):
+        # Stops the stage worker processes and the lyrics threads
+        self.registry.close()
+
+    def chord_service(self, chord_mode: str = None):
+        """madmom for CHORD_MODE 'accurate', the chroma decoder for 'fast'."""
+        mode = chord_mode or settings.CHORD_MODE
+        return self.registry.get("chroma" if mode == "fast" else "madmom")
+
+    def _start(self, service, method: str, *args) -> Future:
+        """
+        Starts a model call. Stage workers (parallel mode) run it in the
+        service's own process; otherwise it runs right here and the Future
+        is already done.
+        """
+        if isinstance(service, StageWorker):
+            return service.submit(method, *args)
+
+        future = Future()
+        future.set_result(getattr(service, method)(*args))
+        return future
+
+    @staticmethod
+    def _result(future: Future, service, progress: ProgressReporter):
+        """
+        The result of _start(). A stage worker that runs past
+        STAGE_TIMEOUT_SECONDS or whose job is cancelled meanwhile is killed.
+        """
+        worker = service if isinstance(service, StageWorker) else None
+        return wait_for(future, settings.STAGE_TIMEOUT_SECONDS or None,
+                        progress.checkpoint, worker)
+
+    def _extract_chords(self, service, audio, progress: ProgressReporter
+                        ) -> Future:
+        """
+        Stage workers extract in their own process. In this process, long
+        recordings stream window by window and the chords found so far are
+        published as they come, before the stage is over.
+        """
+        if isinstance(service, StageWorker) or not use_windows(audio):
+            return self._start(service, "extract_chords", audio)
+
+        chords = []
+        reported = 0.0
+        for chord in service.iter_chords(audio):
+            progress.checkpoint()
+            chords.append(chord)
+            if chord["timestamp"] - reported >= settings.CHORD_WINDOW_SECONDS:
+                reported = chord["timestamp"]
+                progress.update("chords", f"Chords up to {reported:.0f}s",
+                                partial={"chords": chords})
+        future = Future()
+        future.set_result(chords)
+        return future
 
     def process_song(self, input_file: str, artist: str = None,
-                     title: str = None):
+                     title: str = None, audio_hash: str = None,
+                     progress: ProgressReporter = None,
+                     chord_mode: str = None, plan: dict = None) -> dict:
+        """
+        Returns {"sheet_text": str, "sheet": structured lead sheet}
+        (see AlignerService.build_sheet for the sheet layout).
+        chord_mode overrides settings.CHORD_MODE for this song, 'plan' its
+        Whisper model, beam size and compute type (see policy.py).
+        """
+        progress = progress or ProgressReporter()
+        # A job cancelled while it was queued stops before any work
+        progress.checkpoint()
+        started = time.perf_counter()
         print(f"DEBUG: [Orchestrator] processing {input_file}...", flush=True)
         logger.info(f"Starting pipeline for: {input_file}")
 
+        # 0. Content-addressed cache lookup (duplicate uploads return immediately)
+        # The API already hashed the upload while streaming it to disk
+        audio_hash = audio_hash or hash_file(input_file)
+        fps = stage_fingerprints(settings, chord_mode, plan)
+        sheet_key = self.cache.sheet_key(audio_hash, settings, artist, title,
+                                         chord_mode, plan)
+
+        cached_sheet = self.cache.get_json("sheet", sheet_key)
+        if cached_sheet is not None:
+            print(f"DEBUG: Cache hit for {audio_hash[:12]}. Returning sheet.",
+                  flush=True)
+            return cached_sheet
+
+        # The lyrics lookup is network-bound (no native threads), so it runs
+        # in a plain thread next to Demucs; cached lyrics return at once
+        lyrics_future = self.lyrics.fetch_async(artist, title)
+
         # 1. Split Stems
         print("DEBUG: [1/4] Splitting stems (Demucs)...", flush=True)
-        stems = self.audio_engine.split_stems(input_file)
+        progress.update("separation", "Splitting stems")
+        stems = self.audio_engine.split_stems(input_file, audio_hash=audio_hash,
+                                              checkpoint=progress.checkpoint)
         print("DEBUG: [1/4] Splitting complete.", flush=True)
+        # Cancellation checkpoints sit between the stages: in-process models
+        # cannot be stopped mid-call (TASK_TIME_LIMIT is the backstop)
+        progress.checkpoint()
 
-        prompt_guide = None
-        full_lyrics_text = None
+        # 2. Chords and Transcription read independent stems.
+        # Sequential mode runs them one after the other in this process (the
+        # old deadlock-free path); parallel mode overlaps them in stage workers.
 
-        if artist and title:
+        # Step A: Chords (no dependency on the lyrics, so it is started first)
+        chords_key = self.cache.key(audio_hash, "chords", fps["chords"])
+        chords = self.cache.get_json("chords", chords_key)
+        chords_future = None
+        if chords is None:
+            print("DEBUG: [3/4] Extracting Chords...", flush=True)
+            progress.update("chords", "Extracting chords")
+            chords_future = self._extract_chords(
+                self.chord_service(chord_mode), stems["other"], progress)
+
+        progress.update("lyrics", "Fetching lyrics")
+        full_lyrics_text = lyrics_future.result()
+        progress.checkpoint()
+        prompt_guide = lyrics_prompt(full_lyrics_text)
+
+        # Step B: Transcribe (the Genius prompt steers Whisper, so it is part of the key)
+        words_key = self.cache.key(
+            audio_hash, "words",
+            fingerprint(words=fps["words"], prompt=prompt_guide))
+        raw_words = self.cache.get_json("words", words_key)
+        if raw_words is None:
+            print("DEBUG: [2/4] Running Transcription...", flush=True)
+            progress.update("transcription", "Transcribing vocals")
+            transcriber = self.registry.get(whisper_model(self.registry, plan))
             try:
-                print(f"DEBUG: Searching Genius for {artist} - {title}...",
-                      flush=True)
-                song = self.genius.search_song(title, artist)
-                if song:
-                    full_lyrics_text = self._clean_lyrics(song.lyrics)
-                    prompt_guide = full_lyrics_text[:200]
-                    logger.info(f"Genius lyrics found.")
-                    print("DEBUG: Genius lyrics found.", flush=True)
-            except Exception as e:
-                logger.error(f"Genius API error: {e}")
-                print(f"DEBUG: Genius API failed: {e}", flush=True)
-
-        # 2. SEQUENTIAL EXECUTION (Fixes Deadlock)
-
-        # Step A: Transcribe
-        print("DEBUG: [2/4] Running Transcription...", flush=True)
-        raw_words = self.transcriber.transcribe(stems["vocals"], prompt_guide)
+                raw_words = self._result(self._start(
+                    transcriber, "transcribe", stems["vocals"], prompt_guide,
+                    whisper_params(settings, plan)["beam_size"]), transcriber,
+                    progress)
+            except BaseException:
+                # Nobody will wait for the chord stage worker either
+                if (chords_future is not None and not chords_future.done()
+                        and isinstance(self.chord_service(chord_mode),
+                                       StageWorker)):
+                    self.chord_service(chord_mode).kill()
+                raise
+            self.cache.put_json("words", words_key, raw_words)
         print(f"DEBUG: [2/4] Transcription done. ({len(raw_words)} segments)",
               flush=True)
+        progress.update("transcription", "Transcription done", percent=75,
+                        partial={"words": raw_words})
 
-        # Step B: Chords
-        print("DEBUG: [3/4] Extracting Chords...", flush=True)
-        chords = self.harmony.extract_chords(stems["other"])
+        if chords_future is not None:
+            chords = self._result(chords_future, self.chord_service(chord_mode),
+                                  progress)
+            self.cache.put_json("chords", chords_key, chords)
         print(f"DEBUG: [3/4] Chords done. ({len(chords)} chords)", flush=True)
+        progress.update("chords", "Chords done", percent=80,
+                        partial={"chords": chords})
+
+        # Audio is no longer needed; drop it before alignment to cut peak RSS
+        audio_seconds = stems["vocals"].duration
+        for stem in stems.values():
+            stem.release()
+        progress.checkpoint()
 
-        # 3. Sync
-        if full_lyrics_text:
-            logger.info("Aligning Genius lyrics to Whisper timestamps...")
-            final_words = self.aligner.sync_lyrics(raw_words, full_lyrics_text)
-        else:
-            final_words = raw_words
+        # 3-4. Sync, align and lay out the sheet
+        result = assemble_sheet(self.aligner, raw_words, chords,
+                                full_lyrics_text, progress)
+        self.cache.put_json("sheet", sheet_key, result)
+        logger.info(f"Cache stats: {self.cache.stats()}")
 
-        # 4. Align Words to Chords
-        print("DEBUG: [4/4] Aligning and generating sheet...", flush=True)
-        aligned_data = self.aligner.align(final_words, chords)
+        AUDIO_SECONDS.inc(audio_seconds)
+        REALTIME_FACTOR.observe(audio_seconds / (time.perf_counter() - started))
 
-        return self.aligner.generate_sheet_buffer(aligned_data)
\ No newline at end of file
+        return result
@@ -0,0 +1,259 @@
+# app/services/parallel.py
+import importlib
+import os
+import pickle
+import queue
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, List, Optional
+import billiard
+
+# Native thread pools that must be capped per process. Without a budget, every
+# stage process grabs all cores and they oversubscribe each other.
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# The model held by this stage process (set by _init_stage_worker)
+_service = None
+
+# How often waits below look at their deadline and checkpoint
+POLL_SECONDS = 0.5
+
+
+class StageTimeout(Exception):
+    """A stage ran past its time limit (not an OSError: never retried)."""
+
+
+def _init_stage_worker(factory: str, threads: int, factory_kwargs: dict):
+    """
+    Runs once inside the fresh (spawned) stage process.
+    Thread budgets are set BEFORE the heavy libraries are imported,
+    because OpenMP/CTranslate2 read them only at load time.
+    """
+    global _service
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    module_name, class_name = factory.split(":")
+    service_cls = getattr(importlib.import_module(module_name), class_name)
+    _service = service_cls(**factory_kwargs)
+
+
+def _call_service(method: str, args: tuple, kwargs: dict):
+    return getattr(_service, method)(*args, **kwargs)
+
+
+def _stage_main(conn, factory: str, threads: int, factory_kwargs: dict):
+    """Body of a stage process: load the model once, then serve calls."""
+    try:
+        _init_stage_worker(factory, threads, factory_kwargs)
+    except BaseException as e:
+        conn.send(("error", _picklable(e)))
+        return
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return  # The owner went away
+        if request is None:
+            return
+        try:
+            conn.send(("ok", _call_service(*request)))
+        except BaseException as e:
+            conn.send(("error", _picklable(e)))
+
+
+def _picklable(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+class StageWorkerDied(Exception):
+    """The stage process exited during a call (a crash, or kill())."""
+
+
+class StageWorker:
+    """
+    A dedicated process that owns one model (e.g. Whisper or madmom).
+
+    FIX: The old thread-based concurrency deadlocked because torch/OpenMP
+    state was inherited through fork(). Stage workers are started with the
+    'spawn' method, so each one is a clean interpreter that loads its own
+    model once and then serves calls for the lifetime of the generator.
+
+    The process is started with billiard, Celery's multiprocessing fork,
+    which (unlike multiprocessing) lets the daemonic prefork children start
+    processes of their own. Calls run one at a time, in submission order.
+    A process that dies (a crash in native code, kill()) fails the call it
+    was on; the next call starts a fresh one.
+    """
+
+    def __init__(self, factory: str, threads: int = 1, **factory_kwargs):
+        self.factory = factory
+        self._initargs = (factory, threads, factory_kwargs)
+        self._process = None
+        self._conn = None
+        self.pid = None
+        # Start the process (and load the model) now, not on the first song
+        self._start()
+        self._calls = queue.Queue()
+        self._dispatcher = threading.Thread(
+            target=self._serve, daemon=True, name=f"stage-{factory}")
+        self._dispatcher.start()
+
+    def _start(self):
+        self._reap()
+        ctx = billiard.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_stage_main,
+                                    args=(child_conn, *self._initargs),
+                                    daemon=True)
+        self._process.start()
+        # Only the child holds its end now: its death reads as EOF here
+        child_conn.close()
+        try:
+            status, value = self._conn.recv()
+        except EOFError:
+            self._reap()
+            raise StageWorkerDied(f"{self.factory} died while loading")
+        if status != "ready":
+            self._reap()
+            raise value
+        self.pid = value
+
+    def _reap(self):
+        if self._process is not None:
+            self._process.join(timeout=5)
+            self._conn.close()
+            self._process = None
+
+    def _serve(self):
+        while True:
+            call = self._calls.get()
+            if call is None:
+                return
+            future, request = call
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if self._process is None:
+                    self._start()  # The last one died
+                self._conn.send(request)
+                status, value = self._conn.recv()
+            except (EOFError, OSError):
+                self._reap()
+                future.set_exception(StageWorkerDied(
+                    f"{self.factory} stage process exited during "
+                    f"{request[0]}()"))
+                continue
+            except BaseException as e:
+                future.set_exception(e)
+                continue
+            if status == "ok":
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        future = Future()
+        self._calls.put((future, (method, args, kwargs)))
+        return future
+
+    def kill(self):
+        """
+        Kills the process mid-call (a stage past its timeout, a cancelled
+        job). The next call starts a fresh one, which loads the model again.
+        """
+        if self.pid is None:
+            return
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # Already gone
+
+    def shutdown(self):
+        self._calls.put(None)
+        self._dispatcher.join(timeout=30)
+        if self._process is not None:
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(timeout=10)
+            if self._process.is_alive():
+                self.kill()
+            self._reap()
+
+
+def wait_for(future: Future, timeout: float = None,
+             checkpoint: Callable[[], None] = None,
+             worker: Optional[StageWorker] = None):
+    """
+    future.result() that gives up after 'timeout' seconds (StageTimeout) or
+    when checkpoint() raises (e.g. JobCancelled). 'worker', the stage
+    process computing the result, is killed then: nothing else would stop it.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return future.result(timeout=POLL_SECONDS)
+        except FutureTimeout:
+            pass
+        try:
+            if checkpoint is not None:
+                checkpoint()
+            if deadline is not None and time.monotonic() > deadline:
+                raise StageTimeout(f"Stage did not finish in {timeout:.0f}s")
+        except BaseException:
+            if worker is not None:
+                worker.kill()
+            raise
+
+
+def run_killable(cmd: List[str], timeout: float = None,
+                 checkpoint: Callable[[], None] = None
+                 ) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(cmd, capture_output=True, text=True), but the command
+    and everything it started are killed after 'timeout' seconds
+    (StageTimeout) or when checkpoint() raises.
+    """
+    # Its own process group: the kill also reaches the command's children
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True,
+                               start_new_session=True)
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=POLL_SECONDS)
+                return subprocess.CompletedProcess(cmd, process.returncode,
+                                                   stdout, stderr)
+            except subprocess.TimeoutExpired:
+                pass
+            if checkpoint is not None:
+                checkpoint()
+            if deadline is not None and time.monotonic() > deadline:
+                raise StageTimeout(f"{cmd[0]} did not finish in {timeout:.0f}s")
+    finally:
+        if process.poll() is None:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
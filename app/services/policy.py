@@ -0,0 +1,71 @@
+# app/services/policy.py
+from typing import Dict, Optional
+
+# Kept free of ML imports: the API picks every job's plan at upload.
+#
+# A plan is what a job runs with: Whisper model size, beam size, compute
+# type and chord mode. Jobs start on LADDER at the step of their quality
+# tier, short tracks go a step up (they are cheap anyway), long ones a step
+# down while other jobs wait, and every POLICY_TARGET_WAIT_SECONDS of
+# expected queue wait pushes them one more step down, as far as the tier
+# allows. Under load, jobs get cheaper instead of the queue growing; on
+# an idle queue they run as their tier asks.
+#
+# The plan travels with the job (workers/pipeline.py) and is part of the
+# cache keys: a "fast" sheet is never served for a "best" request.
+
+# From the configured pipeline (step 0) to the cheapest; every step lists
+# only what it changes
+LADDER = [
+    {},
+    {"whisper_model": "small"},
+    {"whisper_model": "small", "beam_size": 2, "compute_type": "int8"},
+    {"whisper_model": "base", "beam_size": 1, "compute_type": "int8",
+     "chord_mode": "fast"},
+]
+
+# Tier -> (starting step, lowest step load may push it to)
+TIERS = {"best": (0, 0), "balanced": (0, 2), "fast": (2, 3)}
+
+
+def configured_plan(config) -> Dict:
+    """Step 0: the pipeline as configured."""
+    return {"whisper_model": config.WHISPER_MODEL_SIZE,
+            "beam_size": config.WHISPER_BEAM_SIZE,
+            "compute_type": config.COMPUTE_TYPE,
+            "chord_mode": config.CHORD_MODE}
+
+
+def choose_plan(config, tier: str = None, duration: float = None,
+                wait_seconds: float = None, chord_mode: str = None) -> Dict:
+    """
+    The plan of one job. 'duration' is the track's length in seconds and
+    'wait_seconds' how long a job enqueued now would wait (both None if
+    unknown). An explicit chord_mode from the client wins over the step's.
+    """
+    tier = tier or config.POLICY_DEFAULT_TIER
+    first, lowest = TIERS[tier]
+    step = first
+    if duration is not None:
+        if duration <= config.POLICY_SHORT_SECONDS:
+            step -= 1
+        elif duration >= config.POLICY_LONG_SECONDS and wait_seconds:
+            # Only under load: on an empty queue nobody waits for it
+            step += 1
+    if wait_seconds and config.POLICY_TARGET_WAIT_SECONDS > 0:
+        step += int(wait_seconds // config.POLICY_TARGET_WAIT_SECONDS)
+    step = max(0, min(step, lowest))
+
+    plan = dict(configured_plan(config), **LADDER[step], tier=tier,
+                step=step)
+    if chord_mode:
+        plan["chord_mode"] = chord_mode
+    return plan
+
+
+def whisper_params(config, plan: Optional[Dict] = None) -> Dict:
+    """Whisper model, beam size and compute type of a plan (None = config)."""
+    plan = plan or {}
+    return {"model": plan.get("whisper_model") or config.WHISPER_MODEL_SIZE,
+            "beam_size": plan.get("beam_size") or config.WHISPER_BEAM_SIZE,
+            "compute_type": plan.get("compute_type") or config.COMPUTE_TYPE}
@@ -0,0 +1,99 @@
+# app/services/progress.py
+import json
+import time
+from typing import Callable, Dict, Optional
+
+# Kept free of ML imports: the API imports this for the channel name.
+
+# Where each stage starts on the 0-100 progress bar
+STAGE_PERCENT = {
+    "queued": 0,
+    "separation": 5,
+    "chords": 35,
+    "lyrics": 55,
+    "transcription": 60,
+    "sync": 85,
+    "alignment": 90,
+    "done": 100,
+    "error": 100,
+}
+
+
+def progress_channel(task_id: str) -> str:
+    """Redis pub/sub channel carrying one task's progress events."""
+    return f"progress:{task_id}"
+
+
+def cancel_key(task_id: str) -> str:
+    """Redis key set by DELETE /jobs/{task_id}; workers check it."""
+    return f"cancel:{task_id}"
+
+
+class JobCancelled(Exception):
+    """The client cancelled the job (raised at the next checkpoint)."""
+
+    def __init__(self, message: str = "Cancelled by the client"):
+        super().__init__(message)
+
+
+class ProgressReporter:
+    """
+    Structured per-stage progress for one job.
+
+    Each event is a dict: {"stage", "percent", "elapsed", "message", "partial"}.
+    'partial' carries results as soon as a stage has them (words, chords),
+    so clients can render something before the sheet is done.
+    The orchestrator only calls update(); where events go is up to 'publish'.
+
+    It also calls checkpoint() between stages: if 'cancelled' says so, the
+    job stops there with JobCancelled instead of running to the end.
+    """
+
+    def __init__(self, publish: Optional[Callable[[Dict], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None):
+        self.publish = publish
+        self.cancelled = cancelled
+        self.started_at = time.monotonic()
+        self.last_event: Optional[Dict] = None
+
+    def update(self, stage: str, message: str = "", percent: float = None,
+               partial: Optional[Dict] = None):
+        if percent is None:
+            percent = STAGE_PERCENT.get(stage, 0)
+        # Overlapping stages finish out of order; the bar never goes back
+        if self.last_event is not None:
+            percent = max(percent, self.last_event["percent"])
+
+        event = {
+            "stage": stage,
+            "percent": round(percent, 1),
+            "elapsed": round(time.monotonic() - self.started_at, 3),
+            "message": message,
+        }
+        if partial:
+            event["partial"] = partial
+
+        self.last_event = event
+        if self.publish is not None:
+            try:
+                self.publish(event)
+            except Exception as e:
+                # Progress is best effort; it must never fail the job
+                print(f"DEBUG: Progress publish failed: {e}", flush=True)
+
+    def checkpoint(self):
+        if self.cancelled is None:
+            return
+        try:
+            cancelled = self.cancelled()
+        except Exception as e:
+            # Like progress, the check is best effort: the job goes on
+            print(f"DEBUG: Cancellation check failed: {e}", flush=True)
+            return
+        if cancelled:
+            raise JobCancelled()
+
+
+def encode_event(event: Dict) -> str:
+    """Server-Sent Events framing."""
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,285 @@
+# app/services/registry.py
+import argparse
+import json
+import os
+import resource
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.metrics import MODEL_MEMORY_BYTES
+
+# Kept free of ML imports: the sizing CLI runs before the worker starts.
+
+# Rough resident size (MB) of each model once loaded, used until a real load
+# on this host has been measured (see ModelRegistry.footprints_file).
+MODEL_MEMORY_MB = {
+    "demucs": 1200,
+    "madmom": 150,
+    "chroma": 5,
+    "lyrics": 5,
+}
+WHISPER_MEMORY_MB = {
+    "tiny": 200,
+    "base": 300,
+    "small": 700,
+    "medium": 1800,
+    "large-v2": 3500,
+    "large-v3": 3500,
+}
+
+
+def rss_mb(pid: int = None) -> float:
+    """Current resident set size of a process (this one by default)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid is None:
+        # No procfs (macOS): the peak is the best we have
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return 0.0
+
+
+def memory_limit_mb() -> float:
+    """
+    Memory this host (or container) may use: the cgroup limit if there is
+    one, otherwise physical RAM.
+    """
+    limits = []
+    for path in ("/sys/fs/cgroup/memory.max",
+                 "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            value = Path(path).read_text().strip()
+            if value.isdigit():
+                limits.append(int(value) / 2 ** 20)
+        except OSError:
+            pass
+    try:
+        limits.append(os.sysconf("SC_PAGE_SIZE") *
+                      os.sysconf("SC_PHYS_PAGES") / 2 ** 20)
+    except (ValueError, OSError, AttributeError):
+        pass
+    return min(limits) if limits else 0.0
+
+
+def cpu_limit() -> int:
+    """Cores this process may use (affinity and cgroup CPU quota)."""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+class ModelRegistry:
+    """
+    Loads every model of a worker process exactly once and remembers what it cost.
+
+    Models are registered as factories and loaded on first get() or by
+    preload(). 'fork_safe' models (pure numpy, no thread pools) may be loaded
+    in the Celery parent before it forks, so the children share their pages
+    copy-on-write; everything else must load after the fork (see workers/tasks.py).
+    Each load records its resident-memory cost, exported as a metric and
+    saved to 'footprints_file' so worker sizing uses measured numbers.
+    """
+
+    def __init__(self, footprints_file: str = None):
+        self.footprints_file = footprints_file
+        self._factories: Dict[str, Dict] = {}
+        self._models: Dict[str, Any] = {}
+        self.footprints: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any],
+                 variant: str = "", fork_safe: bool = False):
+        """Registering a name twice keeps the first factory."""
+        self._factories.setdefault(
+            name, {"factory": factory, "variant": variant,
+                   "fork_safe": fork_safe})
+
+    def get(self, name: str):
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self._load(name)
+            return self._models[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def unload(self, name: str):
+        """Drops a loaded model (stopping its process); get() loads it again."""
+        with self._lock:
+            model = self._models.pop(name, None)
+            self.footprints.pop(name, None)
+        if model is None:
+            return
+        MODEL_MEMORY_BYTES.labels(name).set(0)
+        if hasattr(model, "shutdown"):
+            model.shutdown()
+        print(f"DEBUG: [Registry] {name} unloaded", flush=True)
+
+    def names(self) -> List[str]:
+        """Registered model names, in registration order."""
+        return list(self._factories)
+
+    def preload(self, names: List[str] = None, fork_safe_only: bool = False):
+        for name in names or self.names():
+            if fork_safe_only and not self._factories[name]["fork_safe"]:
+                continue
+            self.get(name)
+
+    def _load(self, name: str):
+        entry = self._factories[name]
+        before = rss_mb()
+        started = time.perf_counter()
+        model = entry["factory"]()
+        load_seconds = time.perf_counter() - started
+
+        footprint = max(0.0, rss_mb() - before)
+        # Stage workers hold their model in a separate process
+        if getattr(model, "pid", None):
+            footprint += rss_mb(model.pid)
+
+        self.footprints[name] = {"variant": entry["variant"],
+                                 "rss_mb": round(footprint, 1),
+                                 "load_seconds": round(load_seconds, 2),
+                                 "pid": os.getpid()}
+        MODEL_MEMORY_BYTES.labels(name).set(footprint * 2 ** 20)
+        print(f"DEBUG: [Registry] {name} loaded in {load_seconds:.1f}s "
+              f"(+{footprint:.0f} MB)", flush=True)
+        self._save_footprint(name, entry["variant"], footprint)
+        return model
+
+    def _save_footprint(self, name: str, variant: str, footprint: float):
+        if not self.footprints_file:
+            return
+        try:
+            measured = load_footprints(self.footprints_file)
+            measured[f"{name}:{variant}"] = round(footprint, 1)
+            path = Path(self.footprints_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}")
+            tmp.write_text(json.dumps(measured, indent=2, sort_keys=True))
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"DEBUG: [Registry] Could not save footprints: {e}",
+                  flush=True)
+
+    def report(self) -> Dict:
+        return {"pid": os.getpid(), "rss_mb": round(rss_mb(), 1),
+                "models": dict(self.footprints)}
+
+    def close(self):
+        """Stops models that own processes (stage workers)."""
+        with self._lock:
+            for model in self._models.values():
+                if hasattr(model, "shutdown"):
+                    model.shutdown()
+            self._models.clear()
+
+
+def load_footprints(path: Optional[str]) -> Dict[str, float]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, TypeError, ValueError):
+        return {}
+
+
+def model_memory_mb(name: str, variant: str = "",
+                    measured: Dict[str, float] = None) -> float:
+    """Measured footprint if we have one, else the table estimate."""
+    measured = measured or {}
+    if f"{name}:{variant}" in measured:
+        return measured[f"{name}:{variant}"]
+    if name == "whisper":
+        return WHISPER_MEMORY_MB.get(variant.split(":")[0], 1800)
+    return MODEL_MEMORY_MB.get(name, 0)
+
+
+def sizing_compute_type(config=settings) -> str:
+    """
+    compute_type() without the CUDA probe, which imports torch: an "auto"
+    device is sized as CPU, where the model takes the most host memory.
+    """
+    if config.COMPUTE_TYPE != "auto":
+        return config.COMPUTE_TYPE
+    return "float16" if config.INFERENCE_DEVICE.startswith("cuda") else "int8"
+
+
+def recommend_concurrency(config=settings, total_mb: float = None,
+                          cores: int = None) -> Dict:
+    """
+    How many Celery children fit on this host.
+
+    Each child holds its own copy of the models (plus one job's audio), so
+    memory is usually the limit; the CPU bound keeps the children's native
+    thread pools from oversubscribing the cores. WORKER_CONCURRENCY > 0 wins.
+    """
+    measured = load_footprints(config.MODEL_FOOTPRINTS_FILE)
+    total_mb = memory_limit_mb() if total_mb is None else total_mb
+    cores = cpu_limit() if cores is None else cores
+
+    whisper_variant = (f"{config.WHISPER_MODEL_SIZE}:"
+                       f"{sizing_compute_type(config)}")
+    per_child = {"whisper": model_memory_mb("whisper", whisper_variant,
+                                            measured)}
+    shared = {"lyrics": model_memory_mb("lyrics", "", measured)}
+    if config.DEMUCS_IN_PROCESS:
+        per_child["demucs"] = model_memory_mb("demucs", config.DEMUCS_MODEL,
+                                              measured)
+    madmom = model_memory_mb("madmom", "", measured)
+    if config.PARALLEL_STAGES:
+        per_child["madmom"] = madmom
+    else:
+        # Preloaded in the parent and shared copy-on-write by the children
+        shared["madmom"] = madmom
+
+    per_child_mb = sum(per_child.values()) + config.JOB_WORKING_MB
+    budget_mb = total_mb - config.WORKER_RESERVED_MB - sum(shared.values())
+    by_memory = int(budget_mb // per_child_mb) if per_child_mb else 1
+
+    if config.PARALLEL_STAGES:
+        threads_per_job = config.TRANSCRIPTION_THREADS + config.HARMONY_THREADS
+    else:
+        threads_per_job = max(1, config.DEMUCS_THREADS,
+                              int(os.environ.get("OMP_NUM_THREADS", "1")))
+    by_cpu = cores // threads_per_job
+
+    recommended = max(1, min(by_memory, by_cpu))
+    return {
+        "concurrency": config.WORKER_CONCURRENCY or recommended,
+        "recommended": recommended,
+        "override": config.WORKER_CONCURRENCY or None,
+        "memory_mb": round(total_mb),
+        "cores": cores,
+        "per_child_mb": round(per_child_mb),
+        "per_child_models_mb": per_child,
+        "shared_models_mb": shared,
+        "limited_by": "memory" if by_memory < by_cpu else "cpu",
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.services.registry [--concurrency]
+    parser = argparse.ArgumentParser(description="Worker sizing from RAM/cores")
+    parser.add_argument("--concurrency", action="store_true",
+                        help="Print only the concurrency (for the worker command)")
+    args = parser.parse_args()
+
+    sizing = recommend_concurrency()
+    if args.concurrency:
+        print(sizing["concurrency"])
+    else:
+        print(json.dumps(sizing, indent=2))
@@ -0,0 +1,192 @@
+# app/services/results.py
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Kept free of ML imports: the API reads finished jobs from here.
+#
+# Celery results expire from Redis and the old exports were one text file
+# per song, so past jobs could not be listed or searched. Every finished
+# job (success or error) now gets a row here, written by the worker that
+# finished it. The schema sticks to types and statements SQLite and
+# Postgres share (TEXT, DOUBLE PRECISION, INSERT ... ON CONFLICT);
+# words, chords, sheet and timings are JSON text.
+#
+# Rows also keep what the tail of the pipeline started from (Whisper's
+# raw_words, the chords, the lyrics text) and the stage fingerprints of
+# the config that made them, so /songs/{id}/relyric can re-run sync,
+# alignment and the sheet alone (see assembly.reassemble).
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS jobs ("
+    "id TEXT PRIMARY KEY, "
+    "audio_hash TEXT, "
+    "artist TEXT, "
+    "title TEXT, "
+    "artist_key TEXT, "  # Lowercased, for case-insensitive search
+    "title_key TEXT, "
+    "original_name TEXT, "
+    "chord_mode TEXT, "
+    "status TEXT NOT NULL, "  # SUCCESS or ERROR
+    "error TEXT, "
+    "enqueued_at DOUBLE PRECISION, "
+    "finished_at DOUBLE PRECISION NOT NULL, "
+    "timings TEXT, "
+    "words TEXT, "
+    "chords TEXT, "
+    "sheet TEXT, "
+    "sheet_text TEXT, "
+    "raw_words TEXT, "
+    "lyrics TEXT, "
+    "fingerprints TEXT)",
+    "CREATE INDEX IF NOT EXISTS jobs_audio_hash ON jobs (audio_hash)",
+    "CREATE INDEX IF NOT EXISTS jobs_artist ON jobs (artist_key, title_key)",
+    "CREATE INDEX IF NOT EXISTS jobs_title ON jobs (title_key)",
+    "CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)",
+]
+
+COLUMNS = ["id", "audio_hash", "artist", "title", "artist_key", "title_key",
+           "original_name", "chord_mode", "status", "error", "enqueued_at",
+           "finished_at", "timings", "words", "chords", "sheet", "sheet_text",
+           "raw_words", "lyrics", "fingerprints"]
+JSON_COLUMNS = ("timings", "words", "chords", "sheet", "raw_words",
+                "fingerprints")
+# Added after the first release: ALTER TABLE brings older files up to date
+ADDED_COLUMNS = {"raw_words": "TEXT", "lyrics": "TEXT", "fingerprints": "TEXT"}
+# Listing leaves out the large columns
+SUMMARY_COLUMNS = ["id", "audio_hash", "artist", "title", "original_name",
+                   "chord_mode", "status", "error", "enqueued_at",
+                   "finished_at", "timings"]
+
+MAX_PAGE_SIZE = 200
+
+
+def _search_key(value: Optional[str]) -> Optional[str]:
+    return value.strip().lower() if value else None
+
+
+class ResultStore:
+    """
+    Finished jobs on disk (SQLite), indexed by content hash, artist and
+    title. A connection is opened per call, like LyricsCache, so workers
+    and the API can share the file across forks and threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            existing = {row[1] for row in
+                        db.execute("PRAGMA table_info(jobs)").fetchall()}
+            for statement in SCHEMA:
+                db.execute(statement)
+            if existing:
+                for column, kind in ADDED_COLUMNS.items():
+                    if column not in existing:
+                        db.execute(
+                            f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:  # Commits on success
+                yield db
+        finally:
+            db.close()
+
+    def put(self, job_id: str, status: str, audio_hash: str = None,
+            artist: str = None, title: str = None, original_name: str = None,
+            chord_mode: str = None, enqueued_at: float = None,
+            result: Dict = None, error: str = None, timings: Dict = None,
+            fingerprints: Dict = None):
+        """
+        Records one finished job. 'result' is the pipeline's output
+        ({"sheet_text", "sheet", "words", "chords", "raw_words", "lyrics"});
+        a retried (or relyriced) job replaces its earlier row.
+        """
+        result = result or {}
+        row = {
+            "id": job_id, "audio_hash": audio_hash, "artist": artist,
+            "title": title, "artist_key": _search_key(artist),
+            "title_key": _search_key(title), "original_name": original_name,
+            "chord_mode": chord_mode, "status": status, "error": error,
+            "enqueued_at": enqueued_at, "finished_at": time.time(),
+            "timings": timings, "words": result.get("words"),
+            "chords": result.get("chords"), "sheet": result.get("sheet"),
+            "sheet_text": result.get("sheet_text"),
+            "raw_words": result.get("raw_words"), "lyrics": result.get("lyrics"),
+            "fingerprints": fingerprints,
+        }
+        for column in JSON_COLUMNS:
+            if row[column] is not None:
+                row[column] = json.dumps(row[column])
+
+        updates = ", ".join(f"{c} = excluded.{c}" for c in COLUMNS[1:])
+        with self._connect() as db:
+            db.execute(
+                f"INSERT INTO jobs ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))}) "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}",
+                [row[c] for c in COLUMNS])
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """The full row (words, chords and sheet decoded), or None."""
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs "
+                             "WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(COLUMNS, row) if row is not None else None
+
+    def search(self, artist: str = None, title: str = None,
+               audio_hash: str = None, status: str = None, limit: int = 20,
+               offset: int = 0) -> Tuple[int, List[Dict]]:
+        """
+        Returns (total matches, one page of summaries), newest first.
+        artist and title match case-insensitively by prefix, as index
+        range scans (no LIKE, whose case rules differ between databases).
+        """
+        where, params = [], []
+        for column, prefix in (("artist_key", _search_key(artist)),
+                               ("title_key", _search_key(title))):
+            if prefix:
+                where.append(f"{column} >= ? AND {column} < ?")
+                params += [prefix, prefix + "\uffff"]
+        if audio_hash:
+            where.append("audio_hash = ?")
+            params.append(audio_hash)
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        with self._connect() as db:
+            total = db.execute(f"SELECT COUNT(*) FROM jobs{clause}",
+                               params).fetchone()[0]
+            rows = db.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM jobs{clause} "
+                "ORDER BY finished_at DESC, id LIMIT ? OFFSET ?",
+                params + [limit, max(0, offset)]).fetchall()
+        return total, [self._decode(SUMMARY_COLUMNS, row) for row in rows]
+
+    @staticmethod
+    def _decode(columns: List[str], row) -> Dict:
+        record = dict(zip(columns, row))
+        for column in JSON_COLUMNS:
+            if record.get(column) is not None:
+                record[column] = json.loads(record[column])
+        record.pop("artist_key", None)
+        record.pop("title_key", None)
+        return record
+
+
+def task_payload(record: Dict) -> Dict:
+    """A stored job as the value process_audio_task returns to Celery."""
+    if record["status"] == "ERROR":
+        return {"status": "ERROR", "message": record.get("error") or ""}
+    return {"status": "SUCCESS", "sheet_text": record.get("sheet_text"),
+            "sheet": record.get("sheet")}
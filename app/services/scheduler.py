@@ -0,0 +1,236 @@
+# app/services/scheduler.py
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+# Kept free of ML imports: the API schedules, the workers report back.
+#
+# Sits in front of the Celery queue:
+# - in-flight dedupe: a second upload of a song that is still being
+#   processed gets the task id of the first one instead of a second run
+# - priority classes: "interactive" uploads go ahead of "bulk" imports
+#   (Celery priorities, see PRIORITY_STEPS in workers/tasks.py)
+# - per-client fairness: every job a client already has in flight beyond
+#   SCHEDULER_CLIENT_SHARE pushes its next one a priority step down, so
+#   one client's album cannot hold everybody else back
+# - queue position and wait estimates for /upload and /status
+# - admission control: past a maximum expected wait, /upload turns new
+#   jobs away (503 + Retry-After) instead of growing the queue
+#
+# State lives in Redis (CELERY_RESULT_BACKEND), shared by every API and
+# worker process:
+#   sched:inflight:{key}  -> job id of the run producing that result; once
+#                            the job started it expires unless the worker's
+#                            heartbeats renew it (a crashed job lets go soon)
+#   sched:job:{id}        -> {client, key, enqueued_at}
+#   sched:queued          zset of waiting jobs, ordered like the broker
+#   sched:running         zset of started jobs (score: start time)
+#   sched:client:{client} zset of the client's queued and running jobs
+#   sched:job_seconds     recent average job duration
+
+# Redis priorities: 0 is served first. Celery rounds to these steps.
+PRIORITY_STEPS = [0, 3, 6, 9]
+PRIORITY_CLASSES = {"interactive": 0, "bulk": 6}
+PRIORITY_STEP = 3
+LOWEST_PRIORITY = PRIORITY_STEPS[-1]
+
+# Queue order score: priority first, then arrival time
+_PRIORITY_SCALE = 1e10
+_AVERAGE_WEIGHT = 0.2  # Weight of the latest job in the running average
+
+
+def fair_priority(base: int, in_flight: int, share: int) -> int:
+    """
+    Priority of a client's next job: one step down for every 'share'
+    jobs the client already has queued or running.
+    """
+    steps = in_flight // max(1, share)
+    return min(LOWEST_PRIORITY, base + steps * PRIORITY_STEP)
+
+
+def estimate_wait(position: int, running: int, job_seconds: float) -> float:
+    """
+    Seconds until a queued job starts: the jobs ahead of it (and, when
+    every worker is busy, a slot freeing up) shared over the jobs running
+    now, each taking the recent average.
+    """
+    slots = max(1, running)
+    return round(job_seconds * (position + min(running, 1)) / slots, 1)
+
+
+def admission_delay(wait_seconds: Optional[float], max_wait: float
+                    ) -> Optional[float]:
+    """
+    None if a job that would wait 'wait_seconds' is admitted, otherwise the
+    seconds until the queue should be short enough again (Retry-After).
+    Unknown waits and max_wait 0 always admit.
+    """
+    if not max_wait or wait_seconds is None or wait_seconds <= max_wait:
+        return None
+    return wait_seconds - max_wait
+
+
+class JobScheduler:
+    def __init__(self, redis_client, inflight_ttl: float = 6 * 3600,
+                 client_share: int = 2, default_job_seconds: float = 180.0,
+                 lease_seconds: float = None):
+        self.redis = redis_client
+        # Jobs older than this are treated as lost (a worker died mid-job)
+        self.inflight_ttl = inflight_ttl
+        # How long a started job holds its dedupe key between heartbeats
+        self.lease_seconds = lease_seconds or inflight_ttl
+        self.client_share = client_share
+        self.default_job_seconds = default_job_seconds
+
+    def submit(self, dedupe_key: str, client_id: str, priority_class: str,
+               enqueue: Callable[[str, int], str]) -> Dict:
+        """
+        Enqueues a job unless the same result is already in flight.
+        'enqueue(job_id, priority)' sends it to Celery and returns its id.
+        Returns {"task_id", "deduplicated", "priority"}.
+        """
+        job_id = str(uuid.uuid4())
+        ttl = int(self.inflight_ttl)
+        inflight = f"sched:inflight:{dedupe_key}"
+        # Claim the key before enqueueing: of two simultaneous uploads,
+        # exactly one gets to run
+        if not self.redis.set(inflight, job_id, nx=True, ex=ttl):
+            existing = self.redis.get(inflight)
+            if existing is not None:
+                return {"task_id": _text(existing), "deduplicated": True,
+                        "priority": None}
+            # It finished in between: claim it again
+            self.redis.set(inflight, job_id, ex=ttl)
+
+        now = time.time()
+        self._prune(client_id, now)
+        in_flight = self.redis.zcard(f"sched:client:{client_id}")
+        priority = fair_priority(
+            PRIORITY_CLASSES.get(priority_class,
+                                 PRIORITY_CLASSES["interactive"]),
+            in_flight, self.client_share)
+
+        pipe = self.redis.pipeline()
+        pipe.hset(f"sched:job:{job_id}", mapping={
+            "client": client_id, "key": dedupe_key, "enqueued_at": now})
+        pipe.expire(f"sched:job:{job_id}", ttl)
+        pipe.zadd("sched:queued", {job_id: priority * _PRIORITY_SCALE + now})
+        pipe.zadd(f"sched:client:{client_id}", {job_id: now})
+        pipe.expire(f"sched:client:{client_id}", ttl)
+        pipe.execute()
+
+        try:
+            task_id = enqueue(job_id, priority)
+        except Exception:
+            self.finished(job_id)
+            raise
+        return {"task_id": task_id, "deduplicated": False,
+                "priority": priority}
+
+    def started(self, job_id: str):
+        """A worker picked the job up."""
+        pipe = self.redis.pipeline()
+        pipe.zrem("sched:queued", job_id)
+        pipe.zadd("sched:running", {job_id: time.time()})
+        pipe.execute()
+        self.heartbeat(job_id)
+
+    def heartbeat(self, job_id: str):
+        """
+        The job is still running: its dedupe key lives another
+        lease_seconds. If the worker dies, uploads of the song run again
+        after that instead of after inflight_ttl.
+        """
+        key = _text(self.redis.hget(f"sched:job:{job_id}", "key"))
+        inflight = f"sched:inflight:{key}"
+        # Only the run that claimed the key may extend it
+        if key and _text(self.redis.get(inflight)) == job_id:
+            self.redis.expire(inflight, int(self.lease_seconds))
+
+    def finished(self, job_id: str, timed: bool = True):
+        """
+        The job is over (success or error): release its dedupe key.
+        timed=False (cancelled jobs) keeps its run time out of the average.
+        """
+        meta = {_text(k): _text(v) for k, v in
+                self.redis.hgetall(f"sched:job:{job_id}").items()}
+        started_at = self.redis.zscore("sched:running", job_id)
+
+        pipe = self.redis.pipeline()
+        pipe.zrem("sched:queued", job_id)
+        pipe.zrem("sched:running", job_id)
+        pipe.delete(f"sched:job:{job_id}")
+        if meta.get("client"):
+            pipe.zrem(f"sched:client:{meta['client']}", job_id)
+        pipe.execute()
+
+        # Only the run that claimed the key may release it
+        inflight = f"sched:inflight:{meta.get('key')}"
+        if meta.get("key") and _text(self.redis.get(inflight)) == job_id:
+            self.redis.delete(inflight)
+
+        if timed and started_at is not None:
+            seconds = time.time() - started_at
+            average = self.redis.get("sched:job_seconds")
+            if average is not None:
+                seconds = ((1 - _AVERAGE_WEIGHT) * float(average)
+                           + _AVERAGE_WEIGHT * seconds)
+            self.redis.set("sched:job_seconds", seconds)
+
+    def estimate(self, job_id: str) -> Optional[Dict]:
+        """
+        {"position", "depth", "running", "estimated_wait_seconds"} for a
+        queued job ("position" 0 = next); running jobs get position None
+        and a wait of 0. None for jobs the scheduler does not know.
+        """
+        self._prune(None, time.time())
+        pipe = self.redis.pipeline()
+        pipe.zrank("sched:queued", job_id)
+        pipe.zscore("sched:running", job_id)
+        pipe.zcard("sched:queued")
+        pipe.zcard("sched:running")
+        pipe.get("sched:job_seconds")
+        position, started_at, depth, running, average = pipe.execute()
+        if position is None and started_at is None:
+            return None
+
+        wait = 0.0
+        if position is not None:
+            job_seconds = (float(average) if average is not None
+                           else self.default_job_seconds)
+            wait = estimate_wait(position, running, job_seconds)
+        return {"position": position, "depth": depth, "running": running,
+                "estimated_wait_seconds": wait}
+
+    def backlog(self) -> Dict:
+        """
+        {"depth", "running", "estimated_wait_seconds"}: the queue as a job
+        enqueued now would find it (the policy steps down on long waits).
+        """
+        self._prune(None, time.time())
+        pipe = self.redis.pipeline()
+        pipe.zcard("sched:queued")
+        pipe.zcard("sched:running")
+        pipe.get("sched:job_seconds")
+        depth, running, average = pipe.execute()
+        job_seconds = (float(average) if average is not None
+                       else self.default_job_seconds)
+        return {"depth": depth, "running": running,
+                "estimated_wait_seconds": estimate_wait(depth, running,
+                                                        job_seconds)}
+
+    def _prune(self, client_id: Optional[str], now: float):
+        # Jobs whose worker died never report back; they expire here
+        cutoff = now - self.inflight_ttl
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore("sched:running", "-inf", cutoff)
+        for priority in PRIORITY_STEPS:
+            pipe.zremrangebyscore("sched:queued", priority * _PRIORITY_SCALE,
+                                  priority * _PRIORITY_SCALE + cutoff)
+        if client_id is not None:
+            pipe.zremrangebyscore(f"sched:client:{client_id}", "-inf", cutoff)
+        pipe.execute()
+
+
+def _text(value) -> Optional[str]:
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,55 @@
+# app/services/streaming.py
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+import numpy as np
+from app.core.config import settings
+from app.services.buffer import AudioBuffer
+
+# Kept free of ML imports: shared by the madmom and the chroma recognizers.
+
+NO_CHORD = "N"
+
+# decode(mono, sample_rate) -> [(start, end, label)], seconds from the
+# start of 'mono', covering it without gaps ("N" where there is no chord)
+Decoder = Callable[[np.ndarray, int], List[Tuple[float, float, str]]]
+
+
+def as_buffer(audio: Union[str, AudioBuffer]) -> AudioBuffer:
+    return audio if isinstance(audio, AudioBuffer) else AudioBuffer.from_file(audio)
+
+
+def use_windows(audio: AudioBuffer) -> bool:
+    """Recordings longer than CHORD_STREAM_MIN_SECONDS go window by window."""
+    return audio.duration > settings.CHORD_STREAM_MIN_SECONDS
+
+
+def stream_chords(decode: Decoder, audio: AudioBuffer, sample_rate: int,
+                  window: float = None, context: float = None
+                  ) -> Iterator[Dict]:
+    """
+    Chord recognition over overlapping windows, yielded as it goes.
+
+    Every window is decoded with 'context' seconds of audio on each side
+    but only decides its own core, so every instant is labeled by exactly
+    one window and decoders never see a hard cut where it matters. A chord
+    running across a core boundary is the same chord in both windows and
+    is yielded once. Memory is one window of audio and features, whatever
+    the recording length.
+
+    Yields {"timestamp", "label"} like extract_chords(); "N" stretches
+    end a chord but are not yielded.
+    """
+    window = window or settings.CHORD_WINDOW_SECONDS
+    context = settings.CHORD_WINDOW_CONTEXT if context is None else context
+    current = None
+    for start, core_start, core_end, mono in audio.iter_windows(
+            sample_rate, window, context):
+        for seg_start, seg_end, label in decode(mono, sample_rate):
+            seg_start, seg_end = start + seg_start, start + seg_end
+            if seg_end <= core_start or seg_start >= core_end:
+                continue
+            if label == current:
+                continue
+            current = label
+            if label != NO_CHORD:
+                yield {"timestamp": round(max(seg_start, core_start), 3),
+                       "label": label}
@@ -1,50 +1,277 @@
 # app/services/transcription.py
 import os
-from typing import List, Dict
-from faster_whisper import WhisperModel
-from app.core.config import settings
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Dict, Optional, Union
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from app.core.config import compute_type as configured_compute_type
+from app.core.config import inference_device, settings
+from app.core.metrics import model_load_timer, stage_timer
+from app.services.buffer import AudioBuffer
+from app.services.vocals import RegionMap, vocal_regions
+
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_CHUNK_SECONDS = 30
+VAD_OPTIONS = dict(min_silence_duration_ms=500)
+
+
+def _merge_speech(speech: List[Dict], max_samples: int) -> List[Dict]:
+    """
+    Greedily joins neighbouring VAD regions into chunks of at most one
+    Whisper window, so each batch item carries as much speech as it can.
+    """
+    chunks = []
+    for region in speech:
+        if chunks and region["end"] - chunks[-1]["start"] <= max_samples:
+            chunks[-1]["end"] = region["end"]
+        else:
+            chunks.append({"start": region["start"], "end": region["end"]})
+    return chunks
+
+
+def _words_from_segments(segments) -> List[Dict]:
+    word_data = []
+    # 'segment' is Whisper's phrase index; the sheet breaks lines on it
+    for index, segment in enumerate(segments):
+        if segment.words:
+            for word in segment.words:
+                word_data.append({
+                    "text": word.word.strip(),
+                    "start": round(word.start, 3),
+                    "end": round(word.end, 3),
+                    "probability": word.probability,
+                    "segment": index
+                })
+    return word_data
 
 
 class TranscriptionService:
-    def __init__(self, model_size: str = "medium", device: str = None):
-        # Use config defaults if not provided
-        device = device or settings.INFERENCE_DEVICE
-        compute_type = settings.COMPUTE_TYPE
+    def __init__(self, model_size: str = "medium", device: str = None,
+                 cpu_threads: int = 0, batch_size: int = None,
+                 batch_max_wait: float = None, vocal_prepass: bool = None,
+                 compute_type: str = None):
+        # Use config defaults if not provided ("auto" resolves like the config)
+        device = device or inference_device()
+        compute = (compute_type if compute_type and compute_type != "auto"
+                   else configured_compute_type())
+        self.batch_size = (settings.WHISPER_BATCH_SIZE if batch_size is None
+                           else batch_size)
+        self.vocal_prepass = (settings.VOCAL_PREPASS if vocal_prepass is None
+                              else vocal_prepass)
 
         print(
-            f"Loading Whisper Model: {model_size} on {device} ({compute_type})")
-        self.model = WhisperModel(model_size, device=device,
-                                  compute_type=compute_type)
+            f"Loading Whisper Model: {model_size} on {device} ({compute})")
+        # cpu_threads=0 keeps the CTranslate2 default (OMP_NUM_THREADS)
+        with model_load_timer("whisper"):
+            self.model = WhisperModel(model_size, device=device,
+                                      compute_type=compute,
+                                      cpu_threads=cpu_threads)
+
+        # Batched mode: VAD chunks are decoded batch_size at a time instead
+        # of one 30s window after another
+        self.batcher = None
+        if self.batch_size > 0:
+            self.batcher = TranscriptionBatcher(
+                BatchedInferencePipeline(model=self.model),
+                batch_size=self.batch_size,
+                max_wait=(settings.WHISPER_BATCH_MAX_WAIT
+                          if batch_max_wait is None else batch_max_wait))
+
+    def transcribe(self, audio: Union[str, AudioBuffer],
+                   initial_prompt: str = None,
+                   beam_size: int = None) -> List[Dict]:
+        """beam_size defaults to WHISPER_BEAM_SIZE (see policy.py)."""
+        with stage_timer("whisper"):
+            return self._transcribe(audio, initial_prompt,
+                                    beam_size or settings.WHISPER_BEAM_SIZE)
+
+    def _transcribe(self, audio: Union[str, AudioBuffer],
+                    initial_prompt: str = None,
+                    beam_size: int = None) -> List[Dict]:
+        # Shared buffers skip Whisper's own decode; it wants 16kHz mono
+        if isinstance(audio, AudioBuffer):
+            audio_input = audio.mono(WHISPER_SAMPLE_RATE)
+        else:
+            audio_input = audio
+            if not os.path.exists(audio_input):
+                raise FileNotFoundError(f"Audio file not found: {audio_input}")
 
-    def transcribe(self, audio_path: str, initial_prompt: str = None) -> List[
-        Dict]:
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        region_map = None
+        if self.vocal_prepass:
+            if isinstance(audio_input, str):
+                audio_input = decode_audio(audio_input,
+                                           sampling_rate=WHISPER_SAMPLE_RATE)
+            region_map = self._vocal_regions(audio_input)
+            if region_map is not None:
+                if not region_map.regions:
+                    return []  # Nothing but silence
+                audio_input = region_map.compact(audio_input,
+                                                 WHISPER_SAMPLE_RATE)
 
-        # We keep beam_size=5 for maximum quality.
-        # The speedup comes from VAD (skipping silence) and GPU usage.
+        words = self._decode(audio_input, initial_prompt, beam_size)
+        return region_map.remap_words(words) if region_map else words
+
+    def _vocal_regions(self, audio: np.ndarray) -> Optional[RegionMap]:
+        """
+        Where the stem has singing (see vocals.py), or None when that is
+        nearly all of it and cutting would not save Whisper any work.
+        """
+        with stage_timer("vocal_prepass"):
+            regions = vocal_regions(
+                audio, WHISPER_SAMPLE_RATE, level=settings.VOCAL_LEVEL,
+                max_flatness=settings.VOCAL_MAX_FLATNESS,
+                min_gap=settings.VOCAL_MIN_GAP, pad=settings.VOCAL_PAD)
+        region_map = RegionMap(regions)
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        if region_map.seconds > settings.VOCAL_MAX_COVERAGE * duration:
+            return None
+        print(f"DEBUG: Vocal pre-pass: {region_map.seconds:.0f}s of "
+              f"{duration:.0f}s in {len(regions)} regions go to Whisper",
+              flush=True)
+        return region_map
+
+    def _decode(self, audio_input: Union[str, np.ndarray],
+                initial_prompt: str = None,
+                beam_size: int = None) -> List[Dict]:
+        beam_size = beam_size or settings.WHISPER_BEAM_SIZE
+        if self.batcher is not None:
+            if isinstance(audio_input, str):
+                audio_input = decode_audio(audio_input,
+                                           sampling_rate=WHISPER_SAMPLE_RATE)
+            return self.batcher.submit(audio_input, initial_prompt,
+                                       beam_size).result()
+
+        # Beam search (5 by default) for quality; the policy lowers it for
+        # fast-tier jobs. The speedup comes from VAD and GPU usage.
         segments, info = self.model.transcribe(
-            audio_path,
+            audio_input,
             word_timestamps=True,
-            beam_size=5,
+            beam_size=beam_size,
             initial_prompt=initial_prompt,
             condition_on_previous_text=True,
             vad_filter=True,
-            vad_parameters=dict(min_silence_duration_ms=500),
+            vad_parameters=dict(VAD_OPTIONS),
             no_speech_threshold=0.6,
             log_prob_threshold=-1.0,
             language="en"
         )
 
-        word_data = []
-        for segment in segments:
-            if segment.words:
-                for word in segment.words:
-                    word_data.append({
-                        "text": word.word.strip(),
-                        "start": round(word.start, 3),
-                        "end": round(word.end, 3),
-                        "probability": word.probability
-                    })
-
-        return word_data
\ No newline at end of file
+        return _words_from_segments(segments)
+
+
+class TranscriptionBatcher:
+    """
+    Micro-batcher in front of faster-whisper's batched pipeline.
+
+    Requests that arrive within 'max_wait' seconds of each other (e.g. from a
+    threads-pool worker or the batch CLI) are transcribed in ONE batched call:
+    their audio is concatenated with silent gaps, each job's VAD chunks become
+    clip timestamps, and the words are mapped back to their job afterwards.
+    A lone request is transcribed on its own with its Genius prompt.
+    Requests only share a batch with others of the same beam size.
+    """
+
+    GAP_SECONDS = 1.0
+
+    def __init__(self, pipeline, batch_size: int = 8, max_wait: float = 0.2,
+                 max_jobs: int = 8):
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="whisper-batcher")
+        self._thread.start()
+
+    def submit(self, audio: np.ndarray, initial_prompt: str = None,
+               beam_size: int = 5) -> Future:
+        future = Future()
+        self._queue.put((audio, initial_prompt, beam_size, future))
+        return future
+
+    def _run(self):
+        while True:
+            group = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(group) < self.max_jobs:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    group.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            for beam_size in dict.fromkeys(item[2] for item in group):
+                jobs = [item for item in group if item[2] == beam_size]
+                try:
+                    results = self._transcribe_group(jobs, beam_size)
+                except Exception as e:
+                    for *_, future in jobs:
+                        future.set_exception(e)
+                    continue
+
+                for (*_, future), words in zip(jobs, results):
+                    future.set_result(words)
+
+    def _transcribe_group(self, group, beam_size: int = 5) -> List[List[Dict]]:
+        options = dict(
+            word_timestamps=True,
+            beam_size=beam_size,
+            no_speech_threshold=0.6,
+            log_prob_threshold=-1.0,
+            language="en",
+            batch_size=self.batch_size,
+        )
+
+        if len(group) == 1:
+            audio, initial_prompt, _, _ = group[0]
+            segments, info = self.pipeline.transcribe(
+                audio, initial_prompt=initial_prompt, vad_filter=True,
+                vad_parameters=dict(VAD_OPTIONS), **options)
+            return [_words_from_segments(segments)]
+
+        # Lay the jobs end to end, each followed by a silent gap
+        gap = np.zeros(int(self.GAP_SECONDS * WHISPER_SAMPLE_RATE),
+                       dtype=np.float32)
+        vad_options = VadOptions(**VAD_OPTIONS,
+                                 max_speech_duration_s=WHISPER_CHUNK_SECONDS)
+        max_samples = WHISPER_CHUNK_SECONDS * WHISPER_SAMPLE_RATE
+        pieces, clips, offsets = [], [], []
+        offset = 0
+        for audio, *_ in group:
+            offsets.append(offset / WHISPER_SAMPLE_RATE)
+            speech = get_speech_timestamps(audio, vad_options)
+            for chunk in _merge_speech(speech, max_samples):
+                clips.append({
+                    "start": (chunk["start"] + offset) / WHISPER_SAMPLE_RATE,
+                    "end": (chunk["end"] + offset) / WHISPER_SAMPLE_RATE,
+                })
+            pieces.extend([audio, gap])
+            offset += len(audio) + len(gap)
+
+        results = [[] for _ in group]
+        if not clips:
+            return results
+
+        # Prompts are per song, so a shared batch runs unprompted;
+        # sync_lyrics restores the Genius text afterwards anyway.
+        segments, info = self.pipeline.transcribe(
+            np.concatenate(pieces), vad_filter=False, clip_timestamps=clips,
+            **options)
+
+        job_starts = np.asarray(offsets)
+        for word in _words_from_segments(segments):
+            job = int(np.searchsorted(job_starts, word["start"],
+                                      side="right")) - 1
+            shift = job_starts[job]
+            word["start"] = round(word["start"] - shift, 3)
+            word["end"] = round(word["end"] - shift, 3)
+            results[job].append(word)
+
+        return results
@@ -0,0 +1,159 @@
+# app/services/vocals.py
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Kept free of ML imports: plain NumPy, runs before Whisper is touched.
+#
+# Vocal-activity pre-pass. Demucs leaves bleed in the vocal stem (cymbals,
+# a quiet copy of the guitar), and that is enough to keep Whisper's VAD
+# firing through long intros and solos. Singing is both loud in the stem
+# and tonal, bleed is quiet or noisy, so a frame counts as vocal when:
+#   - its RMS is above a level between the stem's bleed floor and its loud
+#     frames (VOCAL_LEVEL: 0 = the floor, 1 = the loud level), and
+#   - its spectral flatness (100 Hz-4 kHz) is below VOCAL_MAX_FLATNESS
+# Only those regions (padded, short gaps bridged) are sent to Whisper,
+# laid end to end; RegionMap moves the word timestamps back.
+
+FRAME = 1024  # 64 ms at 16 kHz
+HOP = 512
+FRAME_BLOCK = 2048  # Frames per FFT block (caps memory on long stems)
+LOUD_PERCENTILE = 95  # "Loud" reference level of the stem
+FLOOR_PERCENTILE = 10  # Bleed level: rests, intros, solos
+MIN_CONTRAST_DB = 6.0  # Loud and floor closer than this: no way to tell
+SILENCE_DB = -60.0  # Frames below this are never vocal
+SMOOTH_FRAMES = 9  # Majority filter length (~0.3 s)
+BAND = (100.0, 4000.0)  # Where the voice's harmonics are
+
+
+def frame_features(mono: np.ndarray, sample_rate: int
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame (RMS in dB, spectral flatness 0..1); frame i starts at i * HOP."""
+    # Contiguous: the frame view below assumes 4-byte sample strides
+    y = np.ascontiguousarray(mono, dtype=np.float32)
+    if len(y) < FRAME:
+        y = np.pad(y, (0, FRAME - len(y)))
+    n_frames = 1 + (len(y) - FRAME) // HOP
+    frames = np.lib.stride_tricks.as_strided(
+        y, shape=(n_frames, FRAME), strides=(HOP * 4, 4), writeable=False)
+
+    freqs = np.fft.rfftfreq(FRAME, 1.0 / sample_rate)
+    band = (freqs >= BAND[0]) & (freqs <= BAND[1])
+    window = np.hanning(FRAME).astype(np.float32)
+    rms_db = np.empty(n_frames, dtype=np.float32)
+    flatness = np.empty(n_frames, dtype=np.float32)
+    for start in range(0, n_frames, FRAME_BLOCK):
+        block = frames[start:start + FRAME_BLOCK]
+        end = start + len(block)
+        rms = np.sqrt(np.mean(block * block, axis=1))
+        rms_db[start:end] = 20 * np.log10(np.maximum(rms, 1e-10))
+
+        power = np.abs(np.fft.rfft(block * window, axis=1)[:, band]) ** 2 + 1e-12
+        # Geometric over arithmetic mean: 1 for white noise, ~0 for a tone
+        flatness[start:end] = (np.exp(np.mean(np.log(power), axis=1))
+                               / np.mean(power, axis=1))
+    return rms_db, flatness
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """(start, end) frame index pairs of the True runs in 'mask'."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.stack([np.flatnonzero(edges == 1),
+                     np.flatnonzero(edges == -1)], axis=1)
+
+
+def vocal_regions(mono: np.ndarray, sample_rate: int, level: float = 0.5,
+                  max_flatness: float = 0.3, min_gap: float = 1.5,
+                  min_length: float = 0.25, pad: float = 0.4
+                  ) -> List[Tuple[float, float]]:
+    """
+    (start, end) seconds of the stem that contain singing, sorted and
+    non-overlapping. Gaps shorter than 'min_gap' are bridged (breaths,
+    rests between lines), blips shorter than 'min_length' dropped, and
+    every region grows by 'pad' on both sides so no word is clipped.
+    A stem without a clear floor/loud contrast comes back as one region.
+    """
+    duration = len(mono) / sample_rate
+    rms_db, flatness = frame_features(mono, sample_rate)
+    audible = rms_db[rms_db > SILENCE_DB]
+    if not len(audible):
+        return []
+    loud = float(np.percentile(audible, LOUD_PERCENTILE))
+    floor = float(np.percentile(audible, FLOOR_PERCENTILE))
+    if loud - floor < MIN_CONTRAST_DB:
+        return [(0.0, duration)]
+    active = ((rms_db > floor + level * (loud - floor))
+              & (flatness < max_flatness) & (rms_db > SILENCE_DB))
+    # Majority over ~0.3 s: drum hits and clicks are shorter than a syllable
+    active = np.convolve(active, np.ones(SMOOTH_FRAMES),
+                         mode="same") > SMOOTH_FRAMES / 2
+
+    frame_seconds = HOP / sample_rate
+    regions = []
+    for start, end in _runs(active):
+        t0, t1 = start * frame_seconds, end * frame_seconds + FRAME / sample_rate
+        if regions and t0 - regions[-1][1] < min_gap:
+            regions[-1][1] = t1
+        else:
+            regions.append([t0, t1])
+
+    padded = []
+    for t0, t1 in regions:
+        if t1 - t0 < min_length:
+            continue
+        t0, t1 = max(0.0, t0 - pad), min(duration, t1 + pad)
+        if padded and t0 <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], t1)
+        else:
+            padded.append((t0, t1))
+    return padded
+
+
+class RegionMap:
+    """
+    Lays regions of a recording end to end (with 'gap' seconds of silence
+    between them, so Whisper sees a pause) and maps times in the compact
+    audio back to the original.
+    """
+
+    def __init__(self, regions: List[Tuple[float, float]], gap: float = 0.5):
+        self.regions = regions
+        self.gap = gap
+        lengths = np.array([end - start for start, end in regions])
+        # Where each region starts in the compact audio
+        self.compact_starts = np.concatenate(
+            [[0.0], np.cumsum(lengths + gap)[:-1]]) if regions else np.zeros(0)
+        self.original_starts = np.array([start for start, _ in regions])
+        self.lengths = lengths
+
+    @property
+    def seconds(self) -> float:
+        """Length of the compact audio."""
+        return float(self.lengths.sum() + self.gap * max(0, len(self.regions) - 1))
+
+    def compact(self, mono: np.ndarray, sample_rate: int) -> np.ndarray:
+        gap = np.zeros(int(round(self.gap * sample_rate)), dtype=np.float32)
+        pieces = []
+        for i, (start, end) in enumerate(self.regions):
+            if i:
+                pieces.append(gap)
+            pieces.append(mono[int(round(start * sample_rate)):
+                               int(round(end * sample_rate))])
+        if not pieces:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(pieces).astype(np.float32, copy=False)
+
+    def to_original(self, t: float) -> float:
+        """A compact-audio time back on the recording's clock."""
+        if not len(self.regions):
+            return t
+        i = max(0, int(np.searchsorted(self.compact_starts, t, side="right")) - 1)
+        # Times inside a gap belong to the end of the region before it
+        offset = min(t - self.compact_starts[i], self.lengths[i])
+        return float(self.original_starts[i] + max(0.0, offset))
+
+    def remap_words(self, words: List[Dict]) -> List[Dict]:
+        for word in words:
+            word["start"] = round(self.to_original(word["start"]), 3)
+            word["end"] = round(max(self.to_original(word["end"]),
+                                    word["start"]), 3)
+        return words
@@ -0,0 +1,97 @@
+"""
+Micro-benchmarks for AlignerService on large synthetic inputs.
+
+    python -m benchmarks.bench_aligner --sizes 10000 100000 1000000 \\
+        --out bench_aligner.json
+
+No models needed: word timings, 'Genius' text and chords are synthetic
+(see benchmarks/synth.py). Each size is timed for sync_lyrics, align_columns
+and the sheet (build_sheet + text rendering) separately; throughput is words
+per second.
+sync_lyrics runs once per engine: "anchor" (default) and the original
+"difflib" SequenceMatcher, which is skipped above --difflib-max-words
+because it goes quadratic.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.aligner import AlignerService, render_sheet_text
+from benchmarks.common import measure, print_results, write_report
+from benchmarks.synth import make_chords, make_words
+
+
+def matched_words(synced) -> int:
+    """Words that kept their own Whisper timing (not interpolated)."""
+    return sum(1 for w in synced if w["probability"] not in (0.0, 0.5))
+
+
+def bench_size(n_words: int, repeats: int, trace: bool, engines,
+               difflib_max_words: int):
+    words, genius_text = make_words(n_words, seed=n_words)
+    chords = make_chords(words[-1]["end"])
+    aligner = AlignerService()
+    synced = aligner.sync_lyrics(words, genius_text)
+    alignment = aligner.align_columns(synced, chords)
+    params = {"words": n_words, "chords": len(chords)}
+
+    cases = []
+    for engine in engines:
+        if engine == "difflib" and n_words > difflib_max_words:
+            continue
+        engine_aligner = AlignerService(sync_engine=engine)
+        cases.append(("aligner.sync_lyrics", {"engine": engine},
+                      lambda a=engine_aligner: a.sync_lyrics(words,
+                                                             genius_text)))
+    cases += [
+        ("aligner.align", {}, lambda: aligner.align_columns(synced, chords)),
+        ("aligner.sheet", {},
+         lambda: render_sheet_text(aligner.build_sheet(alignment))),
+    ]
+
+    results = []
+    for name, extra, fn in cases:
+        print(f"DEBUG: {name} {extra} on {n_words} words...", flush=True)
+        result = measure(fn, repeats=repeats, warmup=0, trace=trace)
+        p50 = result["latency"]["p50"]
+        entry = {
+            "name": name,
+            "params": {**params, **extra},
+            **result,
+            "throughput": {"value": round(n_words / p50) if p50 else None,
+                           "unit": "words/s"},
+        }
+        if name == "aligner.sync_lyrics":
+            entry["quality"] = {"matched_words": matched_words(fn())}
+        results.append(entry)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--engines", nargs="+", choices=["anchor", "difflib"],
+                        default=["anchor", "difflib"])
+    parser.add_argument("--difflib-max-words", type=int, default=100_000)
+    parser.add_argument("--no-trace", action="store_true",
+                        help="Skip the tracemalloc run (it is slow on 1M words)")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for n_words in args.sizes:
+        results.extend(bench_size(n_words, args.repeats,
+                                  trace=not args.no_trace,
+                                  engines=args.engines,
+                                  difflib_max_words=args.difflib_max_words))
+
+    print_results(results)
+    write_report(results, args.out, suite="aligner")
+
+
+if __name__ == "__main__":
+    main()
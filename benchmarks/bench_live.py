@@ -0,0 +1,157 @@
+"""
+Replays recordings through a live session (WebSocket /live) on a simulated
+real-time clock and measures how far the results trail the input.
+
+    python -m benchmarks.bench_live song.mp3 other.wav --out bench_live.json
+    python -m benchmarks.bench_live --synth 90 --model tiny
+
+Audio "arrives" in --chunk second pieces at the pace it would be recorded.
+Whatever arrived while an update ran is fed at once, like the live worker
+does with the chunks that queued up in Redis. Compute times are real; the
+waiting is simulated, so a replay takes as long as the analysis, not the
+song. Per recording:
+- latency: update lag, the time from the newest audio of an update
+  reaching the server to the update being sent (the target is
+  LIVE_LATENCY_BUDGET, e.g. < 3 s on CPU)
+- word_commit_lag / chord_commit_lag: from a word's end (a chord change)
+  to the update that commits it; about LIVE_LOOKAHEAD_SECONDS more
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.buffer import AudioBuffer
+from app.services.live import LiveSession
+from benchmarks.common import percentiles, print_results, write_report
+from benchmarks.synth import SAMPLE_RATE, make_song
+
+
+def replay(session: LiveSession, mono: np.ndarray,
+           chunk_seconds: float = 0.1) -> Dict:
+    """Feeds 'mono' (at session.sample_rate) as if it was being recorded."""
+    sample_rate = session.sample_rate
+    step = max(1, int(chunk_seconds * sample_rate))
+    now, fed, compute = 0.0, 0, 0.0
+    update_lag, word_lag, chord_lag = [], [], []
+
+    def sent(event):
+        # Everything in the event is out at 'now'
+        for word in event["committed"]["words"]:
+            word_lag.append(now - word["end"])
+        for chord in event["committed"]["chords"]:
+            chord_lag.append(now - chord["timestamp"])
+
+    while fed < len(mono):
+        # Chunks that arrived while the last update ran, or the next one
+        ready = int(now / chunk_seconds) * step
+        arrived = min(len(mono), max(ready, fed + step))
+        now = max(now, arrived / sample_rate)
+        started = time.perf_counter()
+        event = session.feed(mono[fed:arrived])
+        spent = time.perf_counter() - started
+        fed, now, compute = arrived, now + spent, compute + spent
+        if event is not None:
+            update_lag.append(now - event["time"])
+            sent(event)
+
+    started = time.perf_counter()
+    final = session.finish()
+    spent = time.perf_counter() - started
+    now, compute = now + spent, compute + spent
+    sent(final)
+
+    duration = len(mono) / sample_rate
+    return {
+        "latency": percentiles(update_lag or [0.0]),
+        "word_commit_lag": percentiles(word_lag) if word_lag else None,
+        "chord_commit_lag": percentiles(chord_lag) if chord_lag else None,
+        "updates": len(update_lag),
+        "words": len(session.words),
+        "chords": len(session.chords),
+        # > 1 = the analysis keeps up with the input
+        "throughput": {"value": round(duration / compute, 2),
+                       "unit": "x realtime"},
+    }
+
+
+def load_models(args) -> Dict:
+    """LiveSession arguments; loaded once, before any replay is measured."""
+    from app.services.transcription import TranscriptionService
+    transcriber = TranscriptionService(model_size=args.model,
+                                       compute_type=args.compute_type)
+    if args.chord_mode == "fast":
+        from app.services.chroma import FAST_SAMPLE_RATE, FastChordService
+        decode, chord_sample_rate = FastChordService().decode, FAST_SAMPLE_RATE
+    else:
+        from app.services.harmony import MADMOM_SAMPLE_RATE, HarmonyService
+        decode, chord_sample_rate = HarmonyService().decode, MADMOM_SAMPLE_RATE
+    separate = None
+    if args.separation:
+        from app.services.audio import AudioEngine
+        separate = AudioEngine().separate
+    return {"transcriber": transcriber, "decode": decode,
+            "chord_sample_rate": chord_sample_rate, "separate": separate,
+            "sample_rate": settings.LIVE_SAMPLE_RATE,
+            "beam_size": args.beam_size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("files", nargs="*", help="Recordings (full mixes)")
+    parser.add_argument("--synth", type=float, default=0,
+                        help="Also replay a synthetic song of this many seconds")
+    parser.add_argument("--model", default=settings.LIVE_WHISPER_MODEL)
+    parser.add_argument("--compute-type", default=settings.LIVE_COMPUTE_TYPE)
+    parser.add_argument("--beam-size", type=int, default=settings.LIVE_BEAM_SIZE)
+    parser.add_argument("--chord-mode", choices=["fast", "accurate"],
+                        default=settings.LIVE_CHORD_MODE)
+    parser.add_argument("--separation", action="store_true",
+                        default=settings.LIVE_SEPARATION)
+    parser.add_argument("--chunk", type=float, default=0.1,
+                        help="Seconds of audio per client frame")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+    if not args.files and not args.synth:
+        parser.error("give recordings and/or --synth SECONDS")
+
+    recordings = [(Path(f).name, AudioBuffer.from_file(f)) for f in args.files]
+    if args.synth:
+        audio, _ = make_song(args.synth, seed=3)
+        recordings.append((f"synth-{args.synth:g}s",
+                           AudioBuffer.from_array(audio, SAMPLE_RATE)))
+
+    params = {"model": args.model, "compute_type": args.compute_type,
+              "beam_size": args.beam_size, "chord_mode": args.chord_mode,
+              "separation": args.separation,
+              "window": settings.LIVE_WINDOW_SECONDS,
+              "hop": settings.LIVE_HOP_SECONDS,
+              "lookahead": settings.LIVE_LOOKAHEAD_SECONDS}
+    models = load_models(args)
+    results = []
+    for name, buffer in recordings:
+        session = LiveSession(**models)
+        mono = buffer.mono(session.sample_rate)
+        result = dict(name=name, params=params, **replay(session, mono,
+                                                         args.chunk))
+        result["within_budget"] = (result["latency"]["p90"]
+                                   <= settings.LIVE_LATENCY_BUDGET)
+        results.append(result)
+        buffer.release()
+
+    print_results(results)
+    for r in results:
+        verdict = "within" if r["within_budget"] else "OVER"
+        print(f"{r['name']:>24}: p90 update lag {r['latency']['p90']:.2f}s, "
+              f"{verdict} the {settings.LIVE_LATENCY_BUDGET:g}s budget")
+    write_report(results, args.out, benchmark="live")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Offline benchmark of ChordSheetGenerator: each stage alone, then end to end.
+
+    python -m benchmarks.bench_pipeline --durations 30 120 300 \\
+        --stages separation transcription chords end_to_end \\
+        --chord-modes accurate fast --repeats 3 --out bench_pipeline.json
+
+Songs are synthesized (benchmarks/synth.py), Genius is stubbed and the
+result cache is disabled, so runs are reproducible and need no network
+beyond the first model download. Every stage runs in its own spawned
+process: 'peak_rss_mb' is that stage's own peak, model weights included.
+The chords stage runs once per chord mode, with 'chord_accuracy' against
+the synthetic ground truth, so the quick-draft tier's speed/accuracy trade
+is measured on the same songs.
+Diff two reports with benchmarks/compare.py.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import (measure, print_results, run_isolated,
+                               write_report)
+from benchmarks.synth import LYRICS, SAMPLE_RATE, make_song, write_wav
+
+STAGES = ["separation", "transcription", "chords", "end_to_end"]
+
+
+def chord_accuracy(predicted, truth, duration, hop=0.1) -> float:
+    """Fraction of 100ms frames whose predicted label matches the truth."""
+    def label_at(chords, t):
+        current = "N"
+        for chord in chords:
+            if chord["timestamp"] > t:
+                break
+            current = chord["label"]
+        return current
+
+    frames = [i * hop for i in range(int(duration / hop))]
+    if not frames:
+        return 0.0
+    hits = sum(label_at(predicted, t) == label_at(truth, t) for t in frames)
+    return round(hits / len(frames), 3)
+
+
+def _load_timed(factory):
+    start = time.perf_counter()
+    service = factory()
+    return service, round(time.perf_counter() - start, 3)
+
+
+# Stage entry points: module level so run_isolated can spawn them
+
+def bench_separation(path: str, repeats: int):
+    from app.services.audio import AudioEngine
+    from app.services.buffer import AudioBuffer
+    from app.services.cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = AudioEngine(output_dir=tmp,
+                             cache=ResultCache(tmp, enabled=False),
+                             in_process=True)
+        _, load_seconds = _load_timed(engine.load_model)
+        audio = AudioBuffer.from_file(path)
+        audio.samples  # Decode outside the timed region
+
+        def run():
+            for stem in engine.split_stems(audio, audio_hash="bench").values():
+                stem.release()
+
+        return {"load_seconds": load_seconds,
+                **measure(run, repeats=repeats, warmup=0)}
+
+
+def bench_transcription(path: str, repeats: int):
+    from app.core.config import settings
+    from app.services.buffer import AudioBuffer
+    from app.services.transcription import TranscriptionService
+
+    service, load_seconds = _load_timed(lambda: TranscriptionService(
+        model_size=settings.WHISPER_MODEL_SIZE))
+    audio = AudioBuffer.from_file(path)
+    audio.mono(16000)
+
+    words = []
+    result = measure(lambda: words.append(len(service.transcribe(audio))),
+                     repeats=repeats, warmup=0)
+    return {"load_seconds": load_seconds, "words": words[-1], **result}
+
+
+def bench_chords(path: str, repeats: int, truth, duration: float,
+                 chord_mode: str = "accurate"):
+    from app.services.buffer import AudioBuffer
+
+    if chord_mode == "fast":
+        from app.services.chroma import FAST_SAMPLE_RATE, FastChordService
+        service, load_seconds = _load_timed(FastChordService)
+        sample_rate = FAST_SAMPLE_RATE
+    else:
+        from app.services.harmony import HarmonyService
+        service, load_seconds = _load_timed(HarmonyService)
+        sample_rate = 44100
+    audio = AudioBuffer.from_file(path)
+    audio.mono(sample_rate)
+
+    chords = []
+    result = measure(lambda: chords.append(service.extract_chords(audio)),
+                     repeats=repeats, warmup=0)
+    return {"load_seconds": load_seconds,
+            "quality": {"chord_accuracy": chord_accuracy(chords[-1], truth,
+                                                         duration)},
+            **result}
+
+
+def bench_end_to_end(path: str, repeats: int, lyrics: str):
+    from app.core.config import settings
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Every repeat must do the full work, not hit the result cache
+        settings.CACHE_ENABLED = False
+        settings.CACHE_DIR = tmp
+
+        from app.services.lyrics import FakeLyricsProvider, LyricsService
+        from app.services.orchestrator import ChordSheetGenerator
+        generator, load_seconds = _load_timed(ChordSheetGenerator)
+        # No cache: every repeat pays the (zero) lookup like a first upload
+        generator.lyrics = LyricsService(
+            [FakeLyricsProvider({("Bench", "Synthetic"): lyrics})])
+        try:
+            result = measure(
+                lambda: generator.process_song(path, artist="Bench",
+                                               title="Synthetic"),
+                repeats=repeats, warmup=0)
+        finally:
+            generator.close()
+        return {"load_seconds": load_seconds, **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--durations", type=float, nargs="+",
+                        default=[30, 120, 300], help="Song lengths in seconds")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--chord-modes", nargs="+", choices=["accurate", "fast"],
+                        default=["accurate", "fast"],
+                        help="Chord recognizers to compare in the 'chords' stage")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    lyrics = " ".join(LYRICS)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in args.durations:
+            mix, truth = make_song(duration, seed=args.seed)
+            vocals, _ = make_song(duration, seed=args.seed, accompaniment=False)
+            other, _ = make_song(duration, seed=args.seed, vocals=False)
+
+            paths = {}
+            for name, audio in (("mix", mix), ("vocals", vocals),
+                                ("other", other)):
+                paths[name] = str(Path(tmp) / f"{name}_{int(duration)}s.wav")
+                write_wav(paths[name], audio)
+
+            jobs = {
+                "separation": [(bench_separation, dict(path=paths["mix"]))],
+                "transcription": [(bench_transcription,
+                                   dict(path=paths["vocals"]))],
+                # Same song through both recognizers: accuracy vs CPU
+                "chords": [(bench_chords,
+                            dict(path=paths["other"], truth=truth,
+                                 duration=duration, chord_mode=mode))
+                           for mode in args.chord_modes],
+                "end_to_end": [(bench_end_to_end,
+                                dict(path=paths["mix"], lyrics=lyrics))],
+            }
+            for stage in args.stages:
+                for target, kwargs in jobs[stage]:
+                    params = {"audio_seconds": duration}
+                    if "chord_mode" in kwargs:
+                        params["chord_mode"] = kwargs["chord_mode"]
+                    print(f"DEBUG: {stage} {params} ...", flush=True)
+                    result = run_isolated(target, repeats=args.repeats, **kwargs)
+                    entry = {"name": f"pipeline.{stage}", "params": params,
+                             **result}
+                    if "latency" in result:
+                        p50 = result["latency"]["p50"]
+                        entry["throughput"] = {
+                            "value": round(duration / p50, 2) if p50 else None,
+                            "unit": "x realtime"}
+                    results.append(entry)
+
+    print_results(results)
+    write_report(results, args.out, suite="pipeline",
+                 sample_rate=SAMPLE_RATE, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
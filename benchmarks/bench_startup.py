@@ -0,0 +1,111 @@
+"""
+Cold-start benchmark: import time and memory of the API and worker entry points.
+
+    python -m benchmarks.bench_startup --modules app.main workers.tasks \\
+        --repeats 5 --out bench_startup.json
+
+Every import runs in a fresh interpreter, like a new container or a
+uvicorn/Celery process starting up. 'latency' is the time to import the
+module, 'peak_rss_mb' the interpreter's peak RSS afterwards, and
+'heavy_modules' the ML libraries it pulled in: the API (app.main) should
+list none. --importtime adds the slowest top-level imports reported by
+python -X importtime.
+Diff two reports with benchmarks/compare.py.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import ROOT, percentiles, print_results, write_report
+
+# Libraries that cost seconds and hundreds of MB to import
+HEAVY_MODULES = ["torch", "torchaudio", "demucs", "faster_whisper",
+                 "ctranslate2", "madmom", "librosa", "lyricsgenius"]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe_import(module: str, importtime: bool = False) -> dict:
+    """Imports 'module' in a fresh interpreter; raises if the import fails."""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)]
+    done = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if done.returncode != 0:
+        error = done.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"exit {done.returncode}")
+    result = json.loads(done.stdout.strip().splitlines()[-1])
+    if importtime:
+        result["slowest"] = _slowest_imports(done.stderr)
+    return result
+
+
+def _slowest_imports(report: str, top: int = 10) -> list:
+    """Top-level packages by cumulative import time (-X importtime lines)."""
+    totals = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        package = name.strip().split(".")[0]
+        totals[package] = max(totals.get(package, 0), int(cumulative))
+    ranked = sorted(totals.items(), key=lambda item: -item[1])[:top]
+    return [{"module": name, "seconds": round(us / 1e6, 3)}
+            for name, us in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--modules", nargs="+",
+                        default=["app.main", "workers.celery_app",
+                                 "workers.tasks"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        entry = {"name": "import", "params": {"module": module}}
+        try:
+            # One unmeasured run warms the OS page cache and __pycache__
+            probe_import(module)
+            runs = [probe_import(module) for _ in range(args.repeats)]
+        except RuntimeError as e:
+            results.append(dict(entry, error=str(e)))
+            continue
+        entry["latency"] = percentiles([run["seconds"] for run in runs])
+        entry["peak_rss_mb"] = round(
+            max(run["peak_rss_kb"] for run in runs) / 1024, 1)
+        entry["heavy_modules"] = runs[-1]["heavy"]
+        if args.importtime:
+            entry["slowest_imports"] = probe_import(module,
+                                                    importtime=True)["slowest"]
+        results.append(entry)
+
+    print_results(results)
+    for r in results:
+        if "heavy_modules" in r:
+            print(f"{r['params']['module']:>24}: "
+                  f"{', '.join(r['heavy_modules']) or 'no ML libraries'}")
+    write_report(results, args.out, benchmark="startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compares the sequential Whisper path against batched transcription.
+
+    python -m benchmarks.bench_transcription data/processed/*/vocals.wav \\
+        --model small --batch-size 8 --out bench_transcription.json
+
+Three runs over the same vocal stems:
+- sequential: one file after another, beam search over 30s windows (current path)
+- batched: one file after another, VAD chunks decoded batch_size at a time
+- batched-concurrent: all files submitted at once, so the micro-batcher
+  packs several jobs into shared batches
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.buffer import AudioBuffer
+from app.services.transcription import TranscriptionService
+
+
+def _summarize(name, latencies, words, wall, audio_seconds):
+    return {
+        "mode": name,
+        "jobs": len(latencies),
+        "words": words,
+        "wall_seconds": round(wall, 3),
+        "words_per_second": round(words / wall, 2) if wall else None,
+        "realtime_factor": round(audio_seconds / wall, 2) if wall else None,
+        "latency_p50": round(statistics.median(latencies), 3),
+        "latency_max": round(max(latencies), 3),
+    }
+
+
+def _run_sequential(service, buffers):
+    latencies, words = [], 0
+    start = time.perf_counter()
+    for buffer in buffers:
+        t0 = time.perf_counter()
+        words += len(service.transcribe(buffer))
+        latencies.append(time.perf_counter() - t0)
+    return latencies, words, time.perf_counter() - start
+
+
+def _run_concurrent(service, buffers):
+    def job(buffer):
+        t0 = time.perf_counter()
+        n = len(service.transcribe(buffer))
+        return time.perf_counter() - t0, n
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(buffers)) as pool:
+        results = list(pool.map(job, buffers))
+    wall = time.perf_counter() - start
+    return [r[0] for r in results], sum(r[1] for r in results), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("files", nargs="+", help="Vocal stems to transcribe")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=0.5)
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    # Decode once up front so only Whisper is measured
+    buffers = [AudioBuffer.from_file(f) for f in args.files]
+    for buffer in buffers:
+        buffer.mono(16000)
+    audio_seconds = sum(b.duration for b in buffers)
+
+    report = {"files": args.files, "model": args.model,
+              "batch_size": args.batch_size, "audio_seconds": audio_seconds,
+              "runs": []}
+
+    sequential = TranscriptionService(model_size=args.model, batch_size=0)
+    report["runs"].append(_summarize(
+        "sequential", *_run_sequential(sequential, buffers), audio_seconds))
+    del sequential
+
+    batched = TranscriptionService(model_size=args.model,
+                                   batch_size=args.batch_size,
+                                   batch_max_wait=args.max_wait)
+    report["runs"].append(_summarize(
+        "batched", *_run_sequential(batched, buffers), audio_seconds))
+    report["runs"].append(_summarize(
+        "batched-concurrent", *_run_concurrent(batched, buffers),
+        audio_seconds))
+
+    for run in report["runs"]:
+        print(f"{run['mode']:>20}: {run['words_per_second']} words/s, "
+              f"{run['realtime_factor']}x realtime, "
+              f"p50 latency {run['latency_p50']}s")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
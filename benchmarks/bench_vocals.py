@@ -0,0 +1,118 @@
+"""
+Benchmark of the vocal-activity pre-pass on songs with long intros/solos.
+
+    python -m benchmarks.bench_vocals --bleed-db -30 -20 --repeats 5 \\
+        --model small --out bench_vocals.json
+
+Vocal stems are synthesized (benchmarks/synth.py) with the accompaniment
+leaking through at --bleed-db, like Demucs output. For every layout the
+report has the pre-pass cost ('vocal_prepass'), how much of the stem it
+sends to Whisper ('sent_fraction') and how much of the real singing that
+covers ('recall'). With --model, Whisper itself runs on each stem with
+and without the pre-pass ('whisper', params.prepass), so the decoder time
+saved is measured too (needs faster-whisper and the model download).
+Diff two reports with benchmarks/compare.py.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.common import measure, print_results, write_report
+from benchmarks.synth import SAMPLE_RATE, make_vocal_stem
+
+WHISPER_SAMPLE_RATE = 16000
+
+# (seconds, sings) per section
+LAYOUTS = {
+    "long_intro": [(60, False), (50, True), (20, False), (50, True)],
+    "guitar_solo": [(10, False), (45, True), (90, False), (45, True),
+                    (20, False)],
+    "mostly_vocal": [(8, False), (80, True), (8, False), (80, True)],
+}
+
+
+def coverage(regions, truth, duration: float, hop: float = 0.05) -> dict:
+    """recall: singing covered by 'regions'; sent_fraction: stem sent."""
+    grid = np.arange(0.0, duration, hop)
+
+    def mask(spans):
+        m = np.zeros(len(grid), dtype=bool)
+        for start, end in spans:
+            m |= (grid >= start) & (grid < end)
+        return m
+
+    sent, sings = mask(regions), mask(truth)
+    return {"recall": round(float((sent & sings).sum() / max(1, sings.sum())), 3),
+            "sent_fraction": round(float(sent.mean()), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS))
+    parser.add_argument("--bleed-db", nargs="+", type=float,
+                        default=[-30.0, -20.0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--model", default=None,
+                        help="Also time Whisper with and without the pre-pass")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    from app.services.buffer import AudioBuffer
+    from app.services.vocals import RegionMap, vocal_regions
+
+    services = {}
+    if args.model:
+        from app.services.transcription import TranscriptionService
+        services = {flag: TranscriptionService(model_size=args.model,
+                                               batch_size=0,
+                                               vocal_prepass=flag)
+                    for flag in (False, True)}
+
+    results = []
+    for layout in args.layouts:
+        for bleed_db in args.bleed_db:
+            stem, truth = make_vocal_stem(LAYOUTS[layout], bleed_db=bleed_db)
+            buffer = AudioBuffer.from_array(stem, SAMPLE_RATE)
+            mono = buffer.mono(WHISPER_SAMPLE_RATE)
+            duration = len(mono) / WHISPER_SAMPLE_RATE
+            params = {"layout": layout, "bleed_db": bleed_db,
+                      "audio_seconds": round(duration, 1)}
+
+            regions = vocal_regions(mono, WHISPER_SAMPLE_RATE)
+            entry = {"name": "vocal_prepass", "params": params,
+                     **measure(lambda: vocal_regions(mono, WHISPER_SAMPLE_RATE),
+                               repeats=args.repeats, trace=True),
+                     **coverage(regions, truth, duration),
+                     "regions": len(regions),
+                     "sent_seconds": round(RegionMap(regions).seconds, 1)}
+            entry["throughput"] = {
+                "value": round(duration / entry["latency"]["p50"], 1),
+                "unit": "audio s/s"}
+            results.append(entry)
+
+            for flag, service in services.items():
+                timed = measure(lambda: service.transcribe(buffer),
+                                repeats=1, warmup=0)
+                words = service.transcribe(buffer)
+                results.append({
+                    "name": "whisper", "params": dict(params, prepass=flag),
+                    **timed, "words": len(words),
+                    "throughput": {
+                        "value": round(duration / timed["latency"]["p50"], 2),
+                        "unit": "audio s/s"}})
+
+    print_results(results)
+    for r in results:
+        if r["name"] == "vocal_prepass":
+            print(f"{r['params']['layout']:>14} @ {r['params']['bleed_db']} dB: "
+                  f"sends {r['sent_fraction']:.0%} of the stem, "
+                  f"recall {r['recall']:.3f}")
+    write_report(results, args.out, benchmark="vocals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Shared helpers for the benchmark scripts: timing, memory and the JSON report.
+
+Every script writes the same report shape so benchmarks/compare.py can diff
+any two of them:
+
+    {"meta": {...}, "results": [{"name", "params", "latency", "throughput",
+                                 "peak_rss_mb", "peak_traced_mb"}]}
+"""
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).parent.parent
+
+
+def percentiles(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+
+    def pick(q):
+        # Nearest-rank: with few repeats, p99 is simply the slowest run
+        index = min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))
+        return round(ordered[index], 6)
+
+    return {
+        "runs": len(ordered),
+        "mean": round(statistics.fmean(ordered), 6),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "min": round(ordered[0], 6),
+        "max": round(ordered[-1], 6),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (Linux reports KiB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def measure(fn: Callable, repeats: int = 5, warmup: int = 1,
+            trace: bool = False) -> Dict:
+    """
+    Runs fn() warmup + repeats times. Returns latency percentiles and, if
+    'trace' is set, the peak Python-heap allocation of a single run.
+    tracemalloc slows pure-Python code a lot, so it only wraps one extra run.
+    """
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    result = {"latency": percentiles(latencies)}
+    if trace:
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_traced_mb"] = round(
+                tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def _isolated_entry(target, kwargs, conn):
+    try:
+        result = target(**kwargs)
+        result["peak_rss_mb"] = peak_rss_mb()
+        conn.send(("ok", result))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def run_isolated(target: Callable, **kwargs) -> Dict:
+    """
+    Runs target(**kwargs) in a fresh spawned interpreter so its peak RSS
+    covers only that benchmark (model weights included), not whatever ran
+    before it. 'target' must be a module-level function returning a dict.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_isolated_entry, args=(target, kwargs, child))
+    process.start()
+    child.close()
+    try:
+        status, payload = parent.recv()
+    except EOFError:
+        status, payload = "error", "benchmark process died"
+    process.join()
+
+    if status != "ok":
+        return {"error": payload}
+    return payload
+
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+    }
+
+
+def write_report(results: List[Dict], out: str = None, **extra_meta) -> Dict:
+    report = {"meta": {**metadata(), **extra_meta}, "results": results}
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {out}")
+    return report
+
+
+def print_results(results: List[Dict]):
+    for r in results:
+        params = ", ".join(f"{k}={v}" for k, v in r.get("params", {}).items())
+        if "error" in r:
+            print(f"{r['name']:>24} [{params}]: ERROR {r['error']}")
+            continue
+        latency = r["latency"]
+        line = (f"{r['name']:>24} [{params}]: p50 {latency['p50']:.4f}s "
+                f"p90 {latency['p90']:.4f}s")
+        if r.get("throughput"):
+            line += f", {r['throughput']['value']} {r['throughput']['unit']}"
+        if r.get("peak_rss_mb") is not None:
+            line += f", peak RSS {r['peak_rss_mb']} MB"
+        if r.get("peak_traced_mb") is not None:
+            line += f", peak heap {r['peak_traced_mb']} MB"
+        print(line)
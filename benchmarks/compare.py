@@ -0,0 +1,98 @@
+"""
+Diffs two benchmark reports (e.g. from two commits).
+
+    python -m benchmarks.compare baseline.json candidate.json --fail-over 10
+
+Results are matched by name and params. For each pair it prints p50/p90
+latency, throughput and peak memory with the relative change. With
+--fail-over N, exits with status 1 if any p50 latency or peak memory grew
+by more than N percent, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+
+def _key(result):
+    return result["name"], json.dumps(result.get("params", {}), sort_keys=True)
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return round(100.0 * (new - old) / old, 1)
+
+
+def compare(baseline, candidate):
+    """Returns one row per benchmark present in both reports."""
+    old_results = {_key(r): r for r in baseline["results"] if "error" not in r}
+    rows = []
+    for result in candidate["results"]:
+        old = old_results.get(_key(result))
+        if old is None or "error" in result:
+            continue
+
+        metrics = {
+            "p50": (old["latency"]["p50"], result["latency"]["p50"]),
+            "p90": (old["latency"]["p90"], result["latency"]["p90"]),
+            "throughput": ((old.get("throughput") or {}).get("value"),
+                           (result.get("throughput") or {}).get("value")),
+            "peak_rss_mb": (old.get("peak_rss_mb"), result.get("peak_rss_mb")),
+            "peak_traced_mb": (old.get("peak_traced_mb"),
+                               result.get("peak_traced_mb")),
+        }
+        rows.append({
+            "name": result["name"],
+            "params": result.get("params", {}),
+            "metrics": {name: {"old": a, "new": b, "change_pct": _change(a, b)}
+                        for name, (a, b) in metrics.items()
+                        if a is not None or b is not None},
+        })
+    return rows
+
+
+def regressions(rows, threshold):
+    """Latency and memory are lower-is-better; throughput is not checked twice."""
+    found = []
+    for row in rows:
+        for metric in ("p50", "peak_rss_mb", "peak_traced_mb"):
+            change = row["metrics"].get(metric, {}).get("change_pct")
+            if change is not None and change > threshold:
+                found.append((row["name"], row["params"], metric, change))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--fail-over", type=float, default=None,
+                        help="Exit 1 if a metric regressed by more than this %%")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    print(f"baseline {baseline['meta'].get('commit')} -> "
+          f"candidate {candidate['meta'].get('commit')}")
+    rows = compare(baseline, candidate)
+    for row in rows:
+        params = ", ".join(f"{k}={v}" for k, v in row["params"].items())
+        print(f"{row['name']} [{params}]")
+        for metric, values in row["metrics"].items():
+            change = values["change_pct"]
+            change = "" if change is None else f" ({change:+.1f}%)"
+            print(f"    {metric:>15}: {values['old']} -> {values['new']}{change}")
+
+    if args.fail_over is not None:
+        found = regressions(rows, args.fail_over)
+        for name, params, metric, change in found:
+            print(f"REGRESSION: {name} {params} {metric} +{change}%")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,23 +3,111 @@ import { Upload, Music, CheckCircle, Loader2, AlertCircle, Copy } from 'lucide-r
 
 const API_BASE = "http://localhost:8000";
 
+// Flattens a structured sheet into renderable lines
+const sheetLines = (sheet) =>
+  sheet.sections.flatMap((section, index) =>
+    section.lines.map((line) => ({ ...line, section: index })));
+
+// Chord names above the lyric, at the character where each chord starts
+const chordRow = (line) => {
+  let row = '';
+  for (const chord of line.chords) {
+    const pad = Math.max(chord.offset - row.length, row.length ? 1 : 0);
+    row += ' '.repeat(pad) + chord.chord;
+  }
+  return row;
+};
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Reads /sheet as JSON Lines and hands over lines as they arrive,
+// so long sheets show up top-first instead of after the whole download.
+// The 'done' event can beat the Celery result to the backend: until
+// /status reports SUCCESS, /sheet answers 404, so that is retried.
+async function streamSheet(taskId, onLines, attempts = 10) {
+  let res;
+  for (let attempt = 1; ; attempt++) {
+    res = await fetch(`${API_BASE}/sheet/${taskId}?format=jsonl`);
+    if (res.status !== 404 || attempt >= attempts) break;
+    await sleep(Math.min(250 * attempt, 2000));
+  }
+  if (!res.ok || !res.body) throw new Error('Sheet not available');
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const parts = buffered.split('\n');
+    buffered = parts.pop();
+    const lines = parts.filter(Boolean).map((p) => JSON.parse(p))
+      .filter((item) => item.type === 'line');
+    if (lines.length) onLines(lines);
+  }
+}
+
+function SheetView({ lines }) {
+  return (
+    <div className="bg-slate-950 p-6 rounded-lg border border-slate-700 font-mono overflow-x-auto">
+      {lines.map((line, i) => (
+        <div key={i} className={i > 0 && line.section !== lines[i - 1].section ? 'mt-6' : ''}>
+          {line.chords.length > 0 && <div className="text-amber-300 whitespace-pre">{chordRow(line)}</div>}
+          <div className="text-blue-300 whitespace-pre mb-1">{line.text}</div>
+        </div>
+      ))}
+    </div>
+  );
+}
+
 function App() {
   const [file, setFile] = useState(null);
   const [taskId, setTaskId] = useState(null);
   const [status, setStatus] = useState('IDLE');
   const [result, setResult] = useState('');
   const [error, setError] = useState('');
+  const [progress, setProgress] = useState(null);
+  const [lines, setLines] = useState([]);
+  const [quickDraft, setQuickDraft] = useState(false);
 
   useEffect(() => {
+    if (status !== 'PROCESSING' || !taskId) return;
+
+    // Push updates over Server-Sent Events; fall back to polling if the
+    // stream can't be opened (old proxies, API without Redis pub/sub).
     let interval;
-    if (status === 'PROCESSING' && taskId) {
+    const source = new EventSource(`${API_BASE}/events/${taskId}`);
+
+    source.addEventListener('progress', (msg) => {
+      const event = JSON.parse(msg.data);
+      setProgress(event);
+      if (event.stage === 'done') {
+        setResult(event.partial ? event.partial.sheet_text : '');
+        setStatus('SUCCESS');
+        source.close();
+        streamSheet(taskId, (more) => setLines((prev) => [...prev, ...more]))
+          .catch((e) => console.error("Sheet stream error:", e));
+      } else if (event.stage === 'error') {
+        setError(event.message || 'AI Processing failed');
+        setStatus('ERROR');
+        source.close();
+      }
+    });
+
+    source.onerror = () => {
+      source.close();
+      if (interval) return;
       interval = setInterval(async () => {
         try {
           const res = await fetch(`${API_BASE}/status/${taskId}`);
           const data = await res.json();
 
-          if (data.status === 'SUCCESS' || data.status === 'COMPLETED') {
+          if (data.status === 'PROGRESS' && data.progress) {
+            setProgress(data.progress);
+          } else if (data.status === 'SUCCESS' || data.status === 'COMPLETED') {
             setResult(data.result);
+            if (data.sheet) setLines(sheetLines(data.sheet));
             setStatus('SUCCESS');
             clearInterval(interval);
           } else if (data.status === 'FAILURE') {
@@ -31,21 +119,46 @@ function App() {
           console.error("Polling error:", e);
         }
       }, 3000);
-    }
-    return () => clearInterval(interval);
+    };
+
+    return () => {
+      source.close();
+      clearInterval(interval);
+    };
   }, [status, taskId]);
 
   const handleUpload = async () => {
     if (!file) return;
     setStatus('UPLOADING');
     setError('');
+    setProgress(null);
+    setLines([]);
 
     const formData = new FormData();
     formData.append('file', file);
 
     try {
-      const res = await fetch(`${API_BASE}/upload`, { method: 'POST', body: formData });
+      // Quick draft: fast chord recognition instead of the CNN model
+      const query = quickDraft ? '?chord_mode=fast' : '';
+      const res = await fetch(`${API_BASE}/upload${query}`, { method: 'POST', body: formData });
       const data = await res.json();
+      if (!res.ok) {
+        setError(data.detail || 'Upload rejected');
+        setStatus('ERROR');
+        return;
+      }
+      // Duplicate uploads come back with the cached sheet right away
+      if (data.status === 'SUCCESS') {
+        setResult(data.result);
+        if (data.sheet) setLines(sheetLines(data.sheet));
+        setStatus('SUCCESS');
+        return;
+      }
+      // Queue position and wait estimate until the first progress event
+      if (data.queue && data.queue.position !== null) {
+        setProgress({ stage: 'queued', percent: 0, elapsed: 0,
+                      message: `Queued (#${data.queue.position + 1}, about ${Math.round(data.queue.estimated_wait_seconds)}s)` });
+      }
       setTaskId(data.task_id);
       setStatus('PROCESSING');
     } catch (e) {
@@ -71,10 +184,25 @@ function App() {
             <Upload className="mx-auto mb-4 text-slate-500 group-hover:text-blue-400 transition-colors" size={48} />
             <span className="text-lg font-medium block mb-2">{file ? file.name : "Select Audio File"}</span>
           </label>
+          <label className="mt-4 flex items-center justify-center gap-2 text-sm text-slate-400 cursor-pointer">
+            <input type="checkbox" checked={quickDraft} onChange={(e) => setQuickDraft(e.target.checked)} />
+            Quick draft (faster, less accurate chords)
+          </label>
           <button onClick={handleUpload} disabled={!file || status === 'PROCESSING'} className="mt-8 px-8 py-3 bg-blue-600 hover:bg-blue-500 disabled:bg-slate-700 rounded-full font-bold transition-all flex items-center gap-2 mx-auto">
             {status === 'PROCESSING' && <Loader2 className="animate-spin" size={20} />}
             {status === 'PROCESSING' ? 'Processing...' : 'Generate Sheet'}
           </button>
+          {status === 'PROCESSING' && progress && (
+            <div className="mt-6 max-w-md mx-auto text-left">
+              <div className="flex justify-between text-sm text-slate-400 mb-1">
+                <span>{progress.message || progress.stage}</span>
+                <span>{Math.round(progress.percent)}% · {Math.round(progress.elapsed || 0)}s</span>
+              </div>
+              <div className="h-2 bg-slate-700 rounded-full overflow-hidden">
+                <div className="h-full bg-blue-500 transition-all" style={{ width: `${progress.percent}%` }} />
+              </div>
+            </div>
+          )}
         </div>
 
         {status === 'SUCCESS' && (
@@ -83,7 +211,9 @@ function App() {
                 <h2 className="text-xl font-semibold flex items-center gap-2"><CheckCircle className="text-green-500" /> Result</h2>
                 <button onClick={() => navigator.clipboard.writeText(result)} className="p-2 hover:bg-slate-700 rounded"><Copy size={18} /></button>
              </div>
-             <pre className="bg-slate-950 p-6 rounded-lg border border-slate-700 text-blue-300 font-mono whitespace-pre-wrap">{result}</pre>
+             {lines.length > 0
+               ? <SheetView lines={lines} />
+               : <pre className="bg-slate-950 p-6 rounded-lg border border-slate-700 text-blue-300 font-mono whitespace-pre-wrap">{result}</pre>}
           </div>
         )}
       </div>
@@ -0,0 +1,124 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.batch import BatchRun, _file_id, find_audio_files, load_checkpoint
+from app.core.config import settings
+from app.services.cache import ResultCache, hash_file, stage_fingerprints
+from app.services.results import ResultStore
+
+
+def test_plan_skips_finished_songs_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "RESULT_STORE_FILE",
+                        str(tmp_path / "results.sqlite3"))
+    library = tmp_path / "library"
+    (library / "Album").mkdir(parents=True)
+    names = ["Queen - One.mp3", "Queen - Two.mp3", "Album/Queen - Three.flac",
+             "Album/Queen - Four.wav", "notes.txt"]
+    for i, name in enumerate(names):
+        (library / name).write_bytes(bytes([i]) * 100)
+    files = find_audio_files(str(library))
+    assert len(files) == 4
+
+    # "One" finished in an earlier, interrupted run
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    first = BatchRun(files, checkpoint=str(checkpoint))
+    one = str(library / "Queen - One.mp3")
+    first._record(dict(_file_id(one), hash=hash_file(one), status="done"))
+    # "Two" has a cached sheet, "Three" a result store row
+    two = str(library / "Queen - Two.mp3")
+    cache = ResultCache(settings.CACHE_DIR)
+    cache.put_json("sheet", cache.sheet_key(hash_file(two), settings, "Queen",
+                                            "Two"), {"sheet_text": ""})
+    three = str(library / "Album" / "Queen - Three.flac")
+    store = ResultStore(settings.RESULT_STORE_FILE)
+    store.put("job-3", "SUCCESS", audio_hash=hash_file(three),
+              fingerprints=stage_fingerprints(settings))
+    # "Four" only has a sheet from a smaller Whisper model: not good enough
+    four = str(library / "Album" / "Queen - Four.wav")
+    store.put("job-4", "SUCCESS", audio_hash=hash_file(four),
+              fingerprints=stage_fingerprints(
+                  settings, plan={"whisper_model": "tiny"}))
+
+    resumed = BatchRun(files, checkpoint=str(checkpoint))
+    todo = resumed._plan()
+    assert [Path(e["path"]).name for e in todo] == ["Queen - Four.wav"]
+    statuses = {Path(e["path"]).name: e["status"] for e in resumed.entries}
+    assert statuses == {"Queen - One.mp3": "resumed",
+                        "Queen - Two.mp3": "skipped",
+                        "Queen - Three.flac": "skipped"}
+    # Skips are checkpointed too: the next run does not even hash them
+    assert {Path(p).name for p in load_checkpoint(str(checkpoint))} == {
+        "Queen - One.mp3", "Queen - Two.mp3", "Queen - Three.flac"}
+
+    # A song that changed on disk is looked at again
+    (library / "Queen - One.mp3").write_bytes(b"remastered")
+    todo = BatchRun(files, checkpoint=str(checkpoint))._plan()
+    assert len(todo) == 2
+
+
+
+# Stand-ins for the pool stages: the spawned workers import them from here
+
+
+def _no_init():
+    pass
+
+
+def _fake_separate(path, audio_hash):
+    started = time.time()
+    time.sleep(0.5)
+    if "Broken" in path:
+        raise ValueError("not audio")
+    return {"seconds": 0.5, "timings": {"separation_at": [started, time.time()]}}
+
+
+def _fake_analyze(path, audio_hash, chord_mode=None):
+    started = time.time()
+    time.sleep(0.5)
+    if "Silent" in path:
+        raise RuntimeError("no vocals")
+    return {"seconds": 0.5, "timings": {"analysis_at": [started, time.time()]}}
+
+
+class FakeBatchRun(BatchRun):
+    stages = {"separation": (_no_init, _fake_separate),
+              "analysis": (_no_init, _fake_analyze)}
+
+
+def test_run_pipelines_songs_and_records_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "RESULT_STORE_FILE", "")
+    names = ["A - One.mp3", "A - Two.mp3", "A - Broken.mp3", "A - Silent.mp3",
+             "A - Three.mp3"]
+    for i, name in enumerate(names):
+        (tmp_path / name).write_bytes(bytes([i]) * 100)
+    files = [str(tmp_path / name) for name in names]
+    checkpoint = tmp_path / "checkpoint.jsonl"
+
+    batch = FakeBatchRun(files, checkpoint=str(checkpoint))
+    entries = {Path(e["path"]).name: e for e in batch.run()}
+    assert {name: e["status"] for name, e in entries.items()} == {
+        "A - One.mp3": "done", "A - Two.mp3": "done",
+        "A - Broken.mp3": "failed", "A - Silent.mp3": "failed",
+        "A - Three.mp3": "done"}
+    assert entries["A - Broken.mp3"]["error"] == "separation: not audio"
+    assert entries["A - Silent.mp3"]["error"] == "analysis: no vocals"
+
+    # While one song was analyzed, the next one was being separated
+    done = sorted((e for e in entries.values() if e["status"] == "done"),
+                  key=lambda e: e["timings"]["separation_at"][0])
+    assert all(e["timings"]["separation_at"][1]
+               <= e["timings"]["analysis_at"][0] for e in done)
+    assert any(later["timings"]["separation_at"][0]
+               < earlier["timings"]["analysis_at"][1]
+               for earlier, later in zip(done, done[1:]))
+
+    # Failed songs are retried by the next run, finished ones are not
+    todo = FakeBatchRun(files, checkpoint=str(checkpoint))._plan()
+    assert sorted(Path(e["path"]).name for e in todo) == [
+        "A - Broken.mp3", "A - Silent.mp3"]
@@ -0,0 +1,43 @@
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add the root directory to sys.path so we can import 'app'
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.buffer import AudioBuffer
+
+
+def test_buffer_resamples_once_per_rate():
+    """
+    Whisper (16kHz) and madmom (44.1kHz) share one decoded stem.
+    """
+    t = np.arange(44100, dtype=np.float32) / 44100
+    stereo = np.stack([np.sin(2 * np.pi * 440 * t)] * 2)
+    buffer = AudioBuffer.from_array(stereo, 44100)
+
+    whisper_input = buffer.mono(16000)
+    assert whisper_input.shape == (16000,)
+    assert whisper_input.dtype == np.float32
+    assert buffer.mono(16000) is whisper_input  # Cached, not recomputed
+    assert buffer.mono(44100).shape == (44100,)
+    assert abs(buffer.duration - 1.0) < 1e-6
+
+
+def test_spilled_buffer_pickles_as_a_path(tmp_path):
+    """
+    A memory-mapped buffer sent to a stage process carries no sample data.
+    """
+    samples = np.random.default_rng(0).standard_normal((2, 44100 * 5))
+    buffer = AudioBuffer.from_array(samples, 44100).spill(str(tmp_path))
+
+    payload = pickle.dumps(buffer)
+    assert len(payload) < 10_000
+
+    clone = pickle.loads(payload)
+    np.testing.assert_array_equal(clone.samples, buffer.samples)
+
+    buffer.release()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+# Add the root directory to sys.path so we can import 'app'
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.cache import ResultCache, hash_file
+
+
+def test_cache_is_content_addressed(tmp_path):
+    """
+    Same bytes under different filenames share a key; different bytes do not.
+    """
+    a = tmp_path / "Artist_-_Song.mp3"
+    b = tmp_path / "renamed_upload.mp3"
+    c = tmp_path / "Artist_-_Song_other.mp3"
+    a.write_bytes(b"same audio")
+    b.write_bytes(b"same audio")
+    c.write_bytes(b"other audio")
+
+    assert hash_file(str(a)) == hash_file(str(b))
+    assert hash_file(str(a)) != hash_file(str(c))
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.key(hash_file(str(a)), "sheet", "cfg")
+    assert cache.get_json("sheet", key) is None
+
+    cache.put_json("sheet", key, {"sheet_text": "[C] Hello"})
+    assert cache.get_json("sheet", cache.key(hash_file(str(b)), "sheet", "cfg")) == {
+        "sheet_text": "[C] Hello"}
+    assert cache.stats()["sheet"] == {"hits": 1, "misses": 1}
+
+
+def test_cache_lru_eviction(tmp_path):
+    """
+    The least recently used entry is dropped once the size budget is exceeded.
+    """
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=250)
+
+    for name in ["a", "b"]:
+        src = tmp_path / f"{name}.wav"
+        src.write_bytes(b"x" * 100)
+        cache.put_files("stems", name, {"vocals": str(src)})
+
+    # Touch 'a' so 'b' becomes the eviction candidate
+    assert cache.get_files("stems", "a", {"vocals": "a.wav"})
+
+    src = tmp_path / "c.wav"
+    src.write_bytes(b"x" * 100)
+    cache.put_files("stems", "c", {"vocals": str(src)})
+
+    assert cache.get_files("stems", "a", {"vocals": "a.wav"})
+    assert cache.get_files("stems", "b", {"vocals": "b.wav"}) is None
+    assert cache.get_files("stems", "c", {"vocals": "c.wav"})
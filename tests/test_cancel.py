@@ -0,0 +1,54 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.parallel import (StageTimeout, StageWorker, run_killable,
+                                   wait_for)
+from app.services.progress import JobCancelled, ProgressReporter
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(60)"]
+
+
+def test_cancelled_and_stuck_commands_are_killed():
+    result = run_killable([sys.executable, "-c", "print('stems')"], timeout=30)
+    assert result.returncode == 0 and result.stdout.strip() == "stems"
+
+    started = time.monotonic()
+    try:
+        run_killable(SLEEP, timeout=1)
+        assert False, "the command should have timed out"
+    except StageTimeout:
+        pass
+    assert time.monotonic() - started < 5
+
+    # DELETE /jobs/{id} sets the flag; the next checkpoint stops the job
+    flag = {"cancelled": False}
+    progress = ProgressReporter(cancelled=lambda: flag["cancelled"])
+    progress.checkpoint()
+    flag["cancelled"] = True
+    try:
+        run_killable(SLEEP, checkpoint=progress.checkpoint)
+        assert False, "the command should have been cancelled"
+    except JobCancelled:
+        pass
+    assert time.monotonic() - started < 10
+    print("✅ Killable commands passed!")
+
+
+def test_stuck_stage_worker_is_replaced():
+    # A stage process whose "model" call never returns
+    worker = StageWorker("threading:Event")
+    try:
+        first_pid = worker.pid
+        try:
+            wait_for(worker.submit("wait", 60), timeout=1, worker=worker)
+            assert False, "the call should have timed out"
+        except StageTimeout:
+            pass
+        # The next call gets a fresh process
+        assert wait_for(worker.submit("is_set"), timeout=30) is False
+        assert worker.pid != first_pid
+    finally:
+        worker.shutdown()
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.services.buffer import AudioBuffer
+from app.services.chroma import FastChordService, viterbi_decode
+from benchmarks.bench_pipeline import chord_accuracy
+from benchmarks.synth import SAMPLE_RATE, make_song
+
+
+def test_fast_mode_recovers_the_progression():
+    audio, truth = make_song(60, bpm=100, seed=3, vocals=False)
+    chords = FastChordService().extract_chords(
+        AudioBuffer.from_array(audio, SAMPLE_RATE))
+
+    assert chord_accuracy(chords, truth, 60) > 0.9
+    assert {c["label"] for c in chords} == {c["label"] for c in truth}
+    print("✅ Fast chord mode passed!")
+
+
+def test_viterbi_ignores_one_beat_blips():
+    scores = np.array([[1.0, 0.0]] * 4 + [[0.4, 0.6]] + [[1.0, 0.0]] * 4)
+    assert viterbi_decode(scores, change_penalty=0.15).tolist() == [0] * 9
+    assert viterbi_decode(scores, change_penalty=0.0)[4] == 1
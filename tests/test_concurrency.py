@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+import billiard
+
+# Add the root directory to sys.path so we can import 'app'
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.parallel import StageWorker, StageWorkerDied
+
+
+class SlowModel:
+    """
+    Stands in for Whisper/madmom: loads 'weights' once, then burns time per call.
+    """
+
+    def __init__(self, delay: float = 0.5):
+        self.delay = delay
+        self.threads = os.environ.get("OMP_NUM_THREADS")
+
+    def run(self, value):
+        started = time.time()
+        time.sleep(self.delay)
+        return value, self.threads, started, time.time()
+
+    def crash(self):
+        os._exit(1)  # Like a segfault in native code
+
+
+def _fake_job(results, job_id):
+    """
+    One song on a Celery prefork child: two stage workers called concurrently.
+    """
+    words = StageWorker("test_concurrency:SlowModel", threads=2)
+    chords = StageWorker("test_concurrency:SlowModel", threads=1)
+    try:
+        f_chords = chords.submit("run", f"chords-{job_id}")
+        f_words = words.submit("run", f"words-{job_id}")
+        outputs = [f_words.result(timeout=30), f_chords.result(timeout=30)]
+        results.put((job_id, outputs))
+    finally:
+        words.shutdown()
+        chords.shutdown()
+
+
+def test_stage_workers_do_not_hang_under_concurrency():
+    """
+    Mimics 'celery worker --concurrency=2': two daemonic forked children each
+    run a job with parallel stage workers. Every job must finish, with the
+    two stages overlapped instead of summed.
+    """
+    ctx = billiard.get_context("fork")
+    results = ctx.Queue()
+    jobs = [ctx.Process(target=_fake_job, args=(results, i), daemon=True)
+            for i in range(2)]
+    for job in jobs:
+        job.start()
+
+    finished = {}
+    for _ in jobs:
+        job_id, outputs = results.get(timeout=60)
+        finished[job_id] = outputs
+
+    for job in jobs:
+        job.join(timeout=10)
+        assert not job.is_alive(), "Worker process hung"
+
+    for job_id, outputs in finished.items():
+        (words, words_threads, words_start, words_end), \
+            (chords, chords_threads, chords_start, chords_end) = outputs
+        assert (words, words_threads) == (f"words-{job_id}", "2")
+        assert (chords, chords_threads) == (f"chords-{job_id}", "1")
+        # The two stages ran at the same time, not one after the other
+        assert words_start < chords_end and chords_start < words_end
+
+    print("✅ Parallel stages finished without deadlock!")
+
+
+def test_dead_stage_worker_is_respawned():
+    worker = StageWorker("test_concurrency:SlowModel", delay=0)
+    try:
+        first_pid = worker.pid
+        try:
+            worker.submit("crash").result(timeout=30)
+            assert False, "the call should have failed"
+        except StageWorkerDied:
+            pass
+        # The next call gets a fresh process, and a clean error still comes back
+        assert worker.submit("run", "again").result(timeout=30)[0] == "again"
+        assert worker.pid != first_pid
+        try:
+            worker.submit("missing").result(timeout=30)
+            assert False, "the call should have failed"
+        except AttributeError:
+            pass
+        assert worker.submit("run", "still").result(timeout=30)[0] == "still"
+    finally:
+        worker.shutdown()
@@ -0,0 +1,99 @@
+import io
+import sys
+from pathlib import Path
+
+import anyio
+import pytest
+
+# Add the root directory to sys.path so we can import 'app'
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.cache import hash_file
+from app.services.ingest import UploadRejected, save_upload
+
+
+class FakeUpload:
+    """Minimal stand-in for FastAPI's UploadFile."""
+
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self._file = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+
+def test_upload_is_streamed_and_content_addressed(tmp_path):
+    data = b"RIFF" + b"\x00" * 10_000
+
+    async def upload_twice():
+        first = await save_upload(FakeUpload("../../etc/Artist - Song.wav", data),
+                                  str(tmp_path), max_bytes=1_000_000,
+                                  chunk_size=1024)
+        second = await save_upload(FakeUpload("renamed.wav", data),
+                                   str(tmp_path), max_bytes=1_000_000,
+                                   chunk_size=1024)
+        return first, second
+
+    first, second = anyio.run(upload_twice)
+
+    assert first.path == second.path
+    assert Path(first.path).parent == tmp_path
+    assert first.original_name == "Artist - Song.wav"
+    assert first.content_hash == hash_file(first.path)
+    assert first.size == len(data)
+
+
+def test_upload_over_limit_is_rejected(tmp_path):
+    async def upload():
+        await save_upload(FakeUpload("big.wav", b"x" * 5000), str(tmp_path),
+                          max_bytes=4096, chunk_size=1024)
+
+    with pytest.raises(UploadRejected) as e:
+        anyio.run(upload)
+
+    assert e.value.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_normalized_uploads_are_keyed_by_the_re_encode(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.api import endpoints
+    from app.core.config import settings
+    from app.main import app
+    from app.services.cache import ResultCache
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    monkeypatch.setattr(settings, "RAW_DATA_PATH", str(raw))
+    monkeypatch.setattr(settings, "UPLOAD_NORMALIZE", True)
+    monkeypatch.setattr(settings, "POLICY_ENABLED", False)
+    monkeypatch.setattr(endpoints, "scheduler", None)
+    monkeypatch.setattr(endpoints, "result_cache",
+                        ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(endpoints, "probe_duration", lambda path: 10.0)
+
+    def normalize(path):
+        # Stands in for the ffmpeg re-encode
+        if Path(path).read_bytes().startswith(b"junk"):
+            raise UploadRejected(415, "Could not decode audio")
+        out = path + ".wav"
+        Path(out).write_bytes(b"mono " + Path(path).read_bytes())
+        return out
+
+    submitted = []
+    monkeypatch.setattr(endpoints, "normalize_audio", normalize)
+    monkeypatch.setattr(endpoints, "submit_job", lambda app, path, **kwargs:
+                        submitted.append((path, kwargs["audio_hash"])) or "t1")
+
+    client = TestClient(app)
+    response = client.post("/upload", files={"file": ("A - B.mp3", b"RIFF" * 100)})
+    assert response.status_code == 200
+    path, audio_hash = submitted[0]
+    # Stems and sheets of the mono copy never mix with full-quality ones
+    assert audio_hash == hash_file(path) != hash_file(path[:-len(".wav")])
+
+    response = client.post("/upload", files={"file": ("C - D.mp3", b"junk" * 100)})
+    assert response.status_code == 415
+    assert sorted(p.name for p in raw.iterdir()) == sorted(
+        Path(p).name for p in (path, path[:-len(".wav")]))
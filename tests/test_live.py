@@ -0,0 +1,139 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.buffer import AudioBuffer
+from app.services.chroma import FAST_SAMPLE_RATE, FastChordService
+from app.services.live import LiveSession, pcm16_to_float
+from benchmarks.bench_live import replay
+from benchmarks.bench_pipeline import chord_accuracy
+from benchmarks.synth import SAMPLE_RATE, make_song, make_words
+
+
+class ScriptedWhisper:
+    """Hears the words of a script that fall in the window it is given."""
+
+    def __init__(self, words):
+        self.words = words
+        self.session = None
+
+    def transcribe(self, audio, initial_prompt=None, beam_size=None):
+        end = self.session.stream_seconds
+        start = end - audio.duration
+        heard = []
+        for word in self.words:
+            if word["end"] <= start or word["start"] >= end:
+                continue
+            # Words cut by the window come out garbled, like Whisper's
+            cut = word["start"] < start or word["end"] > end
+            heard.append({"text": word["text"][:2] if cut else word["text"],
+                          "start": max(word["start"], start) - start,
+                          "end": min(word["end"], end) - start,
+                          "probability": 0.9, "segment": 0})
+        return heard
+
+
+def test_live_session_commits_every_word_once():
+    audio, truth = make_song(40, bpm=110, seed=5, vocals=False)
+    mono = AudioBuffer.from_array(audio, SAMPLE_RATE).mono(16000)
+    words, _ = make_words(95, seed=2, words_per_second=2.5)
+    whisper = ScriptedWhisper(words)
+    session = LiveSession(whisper, FastChordService().decode, FAST_SAMPLE_RATE,
+                          window=10, hop=1, lookahead=2, beam_size=1)
+    whisper.session = session
+
+    events = []
+    original_feed = session.feed
+    session.feed = lambda samples: _record(events, original_feed(samples))
+    result = replay(session, mono, chunk_seconds=0.25)
+    assert result["updates"] >= 30
+
+    # Committed words come once, in order, whole, with their chord
+    committed = [w for e in events for w in e["committed"]["words"]]
+    assert [w["word"] for w in committed] == [w["text"] for w in words][
+        :len(committed)]
+    assert len(session.words) == len(words)
+    assert all(w["chord"] for w in committed)
+    # Aligned a window at a time, as if against the whole session
+    assert committed == session.aligner.align(session.words,
+                                              session.chords)[:len(committed)]
+    # Every update commits up to the lookahead; the rest is tentative
+    for event in events:
+        horizon = event["time"] - 2
+        assert all(w["end"] <= horizon for w in event["committed"]["words"])
+        assert all(c["timestamp"] < horizon
+                   for c in event["committed"]["chords"])
+
+    labels = [c["label"] for c in session.chords]
+    assert all(a != b for a, b in zip(labels, labels[1:]))
+    whole = FastChordService().extract_chords(
+        AudioBuffer.from_array(audio, SAMPLE_RATE))
+    assert chord_accuracy(session.chords, truth, 40) >= chord_accuracy(
+        whole, truth, 40) - 0.1
+
+    assert session.result["sheet_text"].split()[-1] == words[-1]["text"]
+    print("✅ Live session passed!")
+
+
+def _record(events, event):
+    if event is not None:
+        events.append(event)
+    return event
+
+
+def test_odd_pcm_frames_keep_their_samples():
+    samples = (np.arange(-50, 50) * 300).astype("<i2")
+    data = samples.tobytes()
+    # Frames that end mid-sample: the odd byte starts the next batch
+    decoded, rest = [], b""
+    for start in range(0, len(data), 7):
+        chunk, rest = pcm16_to_float(rest + data[start:start + 7])
+        decoded.append(chunk)
+    assert rest == b""
+    assert np.array_equal(np.concatenate(decoded) * 32768, samples)
+
+
+def test_live_mode_off_closes_with_an_error(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.main import app
+
+    monkeypatch.setattr(settings, "LIVE_ENABLED", False)
+    with TestClient(app).websocket_connect("/live") as websocket:
+        assert websocket.receive_json()["type"] == "error"
+        assert websocket.receive()["code"] == 1013
+
+
+def test_dead_live_worker_closes_the_session(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from fastapi.testclient import TestClient
+    from types import SimpleNamespace
+    from app.api import endpoints
+    from app.core.config import settings
+    from app.main import app
+    from app.services.live import live_channel
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(endpoints.aioredis, "from_url",
+                        lambda url: fakeredis.aioredis.FakeRedis(server=server))
+
+    def send_task(name, args, kwargs):
+        # Takes the session, then dies without its "closed" event
+        fakeredis.FakeRedis(server=server).publish(
+            live_channel(args[0]), '{"type": "ready"}')
+        return SimpleNamespace(revoke=lambda: None)
+
+    monkeypatch.setattr(endpoints.celery_app, "send_task", send_task)
+    monkeypatch.setattr(settings, "LIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "LIVE_IDLE_TIMEOUT", 0.5)
+    monkeypatch.setattr(settings, "EVENTS_KEEPALIVE_SECONDS", 0.1)
+    with TestClient(app).websocket_connect("/live") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        assert websocket.receive_json()["type"] == "ready"
+        websocket.send_bytes(b"\0\0" * 1600)
+        assert websocket.receive_json()["type"] == "error"
+        assert websocket.receive()["code"] == 1011
@@ -0,0 +1,72 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.lyrics import (FakeLyricsProvider, LocalLyricsProvider,
+                                 LyricsCache, LyricsService, normalize_key)
+
+
+def test_cache_hits_skip_the_remote_provider(tmp_path):
+    remote = FakeLyricsProvider({("Beyoncé", "Halo"): "remember those walls"},
+                                delay=0.05)
+    cache = LyricsCache(str(tmp_path / "lyrics.sqlite3"), ttl=60, miss_ttl=60)
+    service = LyricsService([remote], cache)
+
+    # Two jobs for the same song while it is in flight: one lookup
+    first = service.fetch_async("Beyoncé", "Halo")
+    second = service.fetch_async("Beyonce", "Halo (Live)")
+    assert first.result() == second.result() == "remember those walls"
+    assert len(remote.calls) == 1
+
+    # Cache hit: already finished, no thread, no provider call
+    started = time.perf_counter()
+    hit = service.fetch_async("BEYONCE", "halo")
+    assert hit.done() and time.perf_counter() - started < 0.05
+    assert hit.result() == "remember those walls"
+
+    # Misses are remembered too, until their TTL runs out
+    assert service.fetch("Nobody", "Nothing") is None
+    assert service.fetch("Nobody", "Nothing") is None
+    assert len(remote.calls) == 2
+    cache.miss_ttl = 0
+    time.sleep(0.01)
+    service.fetch("Nobody", "Nothing")
+    assert len(remote.calls) == 3
+
+
+def test_local_lrc_files_win_over_remote(tmp_path):
+    lyrics_dir = tmp_path / "lyrics"
+    lyrics_dir.mkdir()
+    (lyrics_dir / "Queen - Bohemian Rhapsody.lrc").write_text(
+        "[ar:Queen]\n[00:01.00]Is this the real life\n"
+        "[00:04.50]Is this just fantasy\n", encoding="utf-8")
+    remote = FakeLyricsProvider({("Queen", "Bohemian Rhapsody"): "remote"})
+    local = LocalLyricsProvider(str(lyrics_dir))
+    service = LyricsService([local, remote])
+
+    assert service.fetch("Queen", "Bohemian Rhapsody") == (
+        "Is this the real life Is this just fantasy")
+    assert remote.calls == []
+
+    # Files added later are found without a restart
+    (lyrics_dir / "Queen").mkdir()
+    (lyrics_dir / "Queen" / "Under Pressure (feat. David Bowie).txt").write_text(
+        "[Intro]\nPressure pushing down on me\n", encoding="utf-8")
+    assert service.fetch("Queen", "Under Pressure") == (
+        "Pressure pushing down on me")
+    assert normalize_key("Queen", "Under Pressure ft. Bowie") == "queen|under pressure"
+
+    # Misses do not walk an unchanged tree again; a new file in an artist
+    # folder is still found
+    walks = []
+    original_rescan = local.rescan
+    local.rescan = lambda: walks.append(1) or original_rescan()
+    for _ in range(5):
+        assert local.search("Nobody", "Nothing") is None
+    assert walks == []
+    (lyrics_dir / "Queen" / "Radio Ga Ga.lrc").write_text(
+        "[00:01.00]All we hear is\n", encoding="utf-8")
+    assert local.search("Queen", "Radio Ga Ga") == "All we hear is"
+    assert walks == [1]
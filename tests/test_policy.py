@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.services.cache import stage_fingerprints
+from app.services.policy import choose_plan, configured_plan
+
+
+def test_plans_step_down_with_duration_and_load():
+    song = choose_plan(settings, "balanced", duration=200, wait_seconds=0)
+    assert song["step"] == 0
+    assert {k: song[k] for k in configured_plan(settings)} == \
+        configured_plan(settings)
+
+    # Long track: as asked on an idle queue, cheaper once others wait,
+    # then down to the tier's floor as the queue backs up
+    assert choose_plan(settings, "balanced", duration=600,
+                       wait_seconds=0)["step"] == 0
+    assert choose_plan(settings, "balanced", duration=600,
+                       wait_seconds=60)["whisper_model"] == "small"
+    busy = choose_plan(settings, "balanced", duration=600, wait_seconds=1200)
+    assert (busy["step"], busy["beam_size"], busy["compute_type"]) == (2, 2, "int8")
+    assert busy["chord_mode"] == settings.CHORD_MODE
+
+    # 'best' waits instead; 'fast' short clips go a step up
+    assert choose_plan(settings, "best", duration=600, wait_seconds=1200)["step"] == 0
+    assert choose_plan(settings, "fast", duration=30)["step"] == 1
+    fast = choose_plan(settings, "fast", duration=600, wait_seconds=60,
+                       chord_mode="accurate")
+    assert (fast["whisper_model"], fast["chord_mode"]) == ("base", "accurate")
+    print("✅ Policy passed!")
+
+
+def test_plans_have_their_own_cache_keys():
+    default = stage_fingerprints(settings)
+    same = stage_fingerprints(settings, plan=choose_plan(settings, "best"))
+    assert same == default
+    cheap = stage_fingerprints(settings, plan=choose_plan(
+        settings, "balanced", duration=600, wait_seconds=60))
+    assert cheap["stems"] == default["stems"]
+    assert cheap["words"] != default["words"]
+    assert cheap["chords"] == default["chords"]
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core import config
+from app.services.registry import ModelRegistry, recommend_concurrency
+
+
+def _config(tmp_path, **overrides):
+    values = dict(MODEL_FOOTPRINTS_FILE=str(tmp_path / "footprints.json"),
+                  WHISPER_MODEL_SIZE="small", COMPUTE_TYPE="int8",
+                  INFERENCE_DEVICE="auto",
+                  DEMUCS_IN_PROCESS=True, DEMUCS_MODEL="htdemucs",
+                  DEMUCS_THREADS=0, PARALLEL_STAGES=False,
+                  TRANSCRIPTION_THREADS=2, HARMONY_THREADS=1,
+                  WORKER_CONCURRENCY=0, WORKER_RESERVED_MB=1024,
+                  JOB_WORKING_MB=1500)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_registry_loads_once_and_records_footprint(tmp_path):
+    loads = []
+    registry = ModelRegistry(str(tmp_path / "footprints.json"))
+    registry.register("blob", lambda: loads.append(1) or bytearray(50 * 2 ** 20),
+                      variant="v1", fork_safe=True)
+    registry.register("lazy", lambda: object())
+
+    registry.preload(fork_safe_only=True)
+    assert registry.names() == ["blob", "lazy"]
+    assert registry.is_loaded("blob") and not registry.is_loaded("lazy")
+    assert registry.get("blob") is registry.get("blob")
+    assert loads == [1]
+
+    assert registry.footprints["blob"]["rss_mb"] >= 40
+    # Measured sizes feed the next sizing decision
+    assert "blob:v1" in (tmp_path / "footprints.json").read_text()
+
+    # Unloaded models load again on the next get()
+    registry.unload("blob")
+    assert not registry.is_loaded("blob") and "blob" not in registry.footprints
+    registry.get("blob")
+    assert loads == [1, 1]
+
+
+def test_concurrency_is_bounded_by_memory_and_cores(tmp_path, monkeypatch):
+    # small Whisper (700) + Demucs (1200) + job (1500) = 3400 MB per child
+    sizing = recommend_concurrency(_config(tmp_path), total_mb=16 * 1024,
+                                   cores=16)
+    assert sizing["concurrency"] == 4 and sizing["limited_by"] == "memory"
+
+    sizing = recommend_concurrency(_config(tmp_path), total_mb=64 * 1024,
+                                   cores=2)
+    assert sizing["concurrency"] == 2 and sizing["limited_by"] == "cpu"
+
+    pinned = _config(tmp_path, WORKER_CONCURRENCY=3)
+    assert recommend_concurrency(pinned, total_mb=4096, cores=1)[
+        "concurrency"] == 3
+
+    # "auto" is sized without probing the GPU (no torch import)
+    def no_probe():
+        raise AssertionError("sizing probed for CUDA")
+    monkeypatch.setattr(config, "_cuda_available", no_probe)
+    auto = _config(tmp_path, COMPUTE_TYPE="auto")
+    assert recommend_concurrency(auto, total_mb=16 * 1024, cores=16)[
+        "concurrency"] == 4
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.metrics import collect_stage_times, stage_timer
+from app.services.results import ResultStore, task_payload
+
+
+def test_store_search_and_pagination(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"))
+    for i in range(5):
+        store.put(f"job-{i}", "SUCCESS", audio_hash=f"hash-{i % 2}",
+                  artist="Queen", title=f"Song {i}", original_name=f"{i}.mp3",
+                  result={"sheet_text": f"sheet {i}", "sheet": {"lines": []},
+                          "words": [{"word": "hi", "start": 0.0, "end": 0.5}],
+                          "chords": [{"timestamp": 0.0, "label": "C:maj"}]},
+                  timings={"demucs": 1.5})
+    store.put("job-x", "ERROR", artist="Queens of the Stone Age",
+              title="No One Knows", error="Demucs crashed")
+
+    # Newest first, pages of 2, large columns left out of the listing
+    total, page = store.search(artist="QUEEN", limit=2, offset=0)
+    assert total == 6
+    assert [item["id"] for item in page] == ["job-x", "job-4"]
+    assert "sheet" not in page[0] and "words" not in page[0]
+    total, page = store.search(artist="queen", limit=2, offset=4)
+    assert [item["id"] for item in page] == ["job-1", "job-0"]
+
+    assert store.search(audio_hash="hash-1")[0] == 2
+    assert store.search(artist="queens of")[0] == 1
+    assert store.search(title="song", status="SUCCESS")[0] == 5
+
+    record = store.get("job-3")
+    assert record["chords"][0]["label"] == "C:maj"
+    assert record["timings"] == {"demucs": 1.5}
+    assert task_payload(record) == {"status": "SUCCESS",
+                                    "sheet_text": "sheet 3",
+                                    "sheet": {"lines": []}}
+    assert task_payload(store.get("job-x")) == {"status": "ERROR",
+                                                "message": "Demucs crashed"}
+
+    # A retried job replaces its row
+    store.put("job-x", "SUCCESS", artist="Queens of the Stone Age",
+              result={"sheet_text": "fixed"})
+    assert store.get("job-x")["sheet_text"] == "fixed"
+    assert store.get("missing") is None
+
+
+def test_stage_times_are_collected_per_job():
+    with stage_timer("outside"):
+        pass
+    with collect_stage_times() as times:
+        for _ in range(3):  # Windowed stages add up
+            with stage_timer("chroma_features"):
+                pass
+        with stage_timer("align"):
+            pass
+    assert set(times) == {"chroma_features", "align"}
@@ -0,0 +1,107 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.scheduler import (LOWEST_PRIORITY, PRIORITY_CLASSES,
+                                    PRIORITY_STEPS, JobScheduler,
+                                    admission_delay, estimate_wait,
+                                    fair_priority)
+
+
+def test_busy_clients_drop_priority_steps():
+    interactive, bulk = PRIORITY_CLASSES["interactive"], PRIORITY_CLASSES["bulk"]
+    # A client's first jobs keep their class; an album upload sinks step by step
+    priorities = [fair_priority(interactive, n, share=2) for n in range(8)]
+    assert priorities == [0, 0, 3, 3, 6, 6, 9, 9]
+    assert all(p in PRIORITY_STEPS for p in priorities)
+
+    # Bulk never overtakes a fresh interactive upload, and never falls off
+    assert fair_priority(bulk, 0, share=2) > fair_priority(interactive, 3, share=2)
+    assert fair_priority(bulk, 100, share=2) == LOWEST_PRIORITY
+
+
+def test_wait_estimate():
+    # Next in line, idle workers: starts right away
+    assert estimate_wait(0, 0, 120.0) == 0.0
+    # Next in line behind 2 busy workers: half a job on average
+    assert estimate_wait(0, 2, 120.0) == 60.0
+    # 3 jobs ahead, 2 workers: two more rounds
+    assert estimate_wait(3, 2, 120.0) == 240.0
+
+
+def test_admission_turns_jobs_away_past_the_limit():
+    assert admission_delay(600.0, 1800.0) is None
+    # Retry once the queue could be back under the limit
+    assert admission_delay(2000.0, 1800.0) == 200.0
+    # Unknown load (no scheduler) and a disabled limit always admit
+    assert admission_delay(None, 1800.0) is None
+    assert admission_delay(10 ** 6, 0) is None
+
+
+def _scheduler(**kwargs):
+    fakeredis = pytest.importorskip("fakeredis")
+    return JobScheduler(fakeredis.FakeRedis(), default_job_seconds=100.0,
+                        **kwargs)
+
+
+def test_scheduler_dedupes_orders_and_releases_jobs():
+    scheduler = _scheduler(client_share=2)
+    sent = []
+
+    def enqueue(job_id, priority):
+        sent.append((job_id, priority))
+        return job_id
+
+    first = scheduler.submit("song-a", "alice", "interactive", enqueue)
+    assert not first["deduplicated"] and first["priority"] == 0
+    # The same song while the first run is in flight: no second run
+    again = scheduler.submit("song-a", "bob", "interactive", enqueue)
+    assert again == {"task_id": first["task_id"], "deduplicated": True,
+                     "priority": None}
+    assert len(sent) == 1
+
+    bulk = scheduler.submit("song-b", "bob", "bulk", enqueue)
+    second = scheduler.submit("song-c", "alice", "interactive", enqueue)
+    # Interactive jobs wait ahead of bulk ones, in arrival order
+    assert scheduler.estimate(first["task_id"])["position"] == 0
+    assert scheduler.estimate(second["task_id"])["position"] == 1
+    assert scheduler.estimate(bulk["task_id"]) == {
+        "position": 2, "depth": 3, "running": 0,
+        "estimated_wait_seconds": 200.0}
+
+    scheduler.started(first["task_id"])
+    running = scheduler.estimate(first["task_id"])
+    assert running["position"] is None and running["running"] == 1
+    assert scheduler.estimate(second["task_id"])["position"] == 0
+
+    # Finished: the song runs again on its next upload
+    scheduler.finished(first["task_id"])
+    assert scheduler.estimate(first["task_id"]) is None
+    rerun = scheduler.submit("song-a", "alice", "interactive", enqueue)
+    assert not rerun["deduplicated"] and rerun["task_id"] != first["task_id"]
+
+
+def test_failed_enqueue_and_crashed_jobs_release_the_song():
+    scheduler = _scheduler(inflight_ttl=3600, lease_seconds=30)
+
+    def broken(job_id, priority):
+        raise ConnectionError("broker down")
+
+    with pytest.raises(ConnectionError):
+        scheduler.submit("song-a", "alice", "interactive", broken)
+    retry = scheduler.submit("song-a", "alice", "interactive",
+                             lambda job_id, priority: job_id)
+    assert not retry["deduplicated"]
+
+    # A queued job holds the song for inflight_ttl, a started one only
+    # for its lease: a crashed worker stops renewing it
+    inflight = "sched:inflight:song-a"
+    assert scheduler.redis.ttl(inflight) > 30
+    scheduler.started(retry["task_id"])
+    assert 0 < scheduler.redis.ttl(inflight) <= 30
+    scheduler.redis.expire(inflight, 1)
+    scheduler.heartbeat(retry["task_id"])
+    assert scheduler.redis.ttl(inflight) > 1
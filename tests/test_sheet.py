@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.aligner import AlignerService, render_sheet_text
+
+
+def _word(text, start, segment):
+    return {"text": text, "start": start, "end": start + 0.4,
+            "segment": segment}
+
+
+def test_structured_sheet_lines_and_offsets():
+    aligner = AlignerService()
+    words = [
+        _word("Hello", 1.0, 0), _word("darkness", 1.5, 0),
+        _word("my", 2.0, 0), _word("old", 2.5, 0),
+        _word("friend", 3.0, 1),  # New Whisper segment: new line
+        _word("again", 10.0, 1),  # Long pause: new section
+    ]
+    chords = [{"label": "Am", "timestamp": 0.0},
+              {"label": "G", "timestamp": 1.9},
+              {"label": "Am", "timestamp": 2.9}]
+
+    sheet = aligner.build_sheet(aligner.align_columns(words, chords))
+
+    assert [len(s["lines"]) for s in sheet["sections"]] == [2, 1]
+    first, second = sheet["sections"][0]["lines"]
+    assert first["text"] == "Hello darkness my old"
+    assert [(c["offset"], c["chord"]) for c in first["chords"]] == [
+        (0, "Am"), (15, "G")]
+    assert [(c["offset"], c["chord"]) for c in second["chords"]] == [
+        (0, "Am")]
+    # Sections restate the chord even when it did not change
+    assert sheet["sections"][1]["lines"][0]["chords"][0]["chord"] == "Am"
+
+    assert render_sheet_text(sheet) == (
+        "[Am] Hello darkness [G] my old\n[Am] friend\n\n[Am] again")
+    print("✅ Structured sheet passed!")
+
+
+def test_vectorized_align_matches_two_pointer():
+    aligner = AlignerService()
+    words = [_word(f"w{i}", i * 0.3, None) for i in range(200)]
+    chords = [{"label": ["C", "G", "G", "F"][i % 4], "timestamp": 0.5 + i * 1.1}
+              for i in range(50)]
+
+    # Reference: the original walk over both lists
+    expected, last, idx = [], None, 0
+    for word in words:
+        while idx + 1 < len(chords) and chords[idx + 1]["timestamp"] <= word["start"]:
+            idx += 1
+        label = chords[idx]["label"]
+        expected.append((label, label != last))
+        last = label
+
+    result = aligner.align(words, chords)
+    assert [(r["chord"], r["is_new_chord"]) for r in result] == expected
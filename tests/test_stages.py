@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from celery import Celery
+from app.core.config import settings
+from workers.pipeline import models_for_queues, submit_job
+
+
+def test_stage_workflow_passes_refs_and_ends_on_job_id(monkeypatch):
+    monkeypatch.setattr(settings, "PIPELINE_MODE", "stages")
+    app = Celery("test", backend="cache+memory://")
+    app.conf.task_always_eager = True
+    app.conf.task_store_eager_result = True
+    calls = []
+
+    @app.task(name="stage.separate")
+    def separate(job):
+        calls.append("separate")
+        return {"stems": {"stage": "stems", "key": job["audio_hash"]}}
+
+    @app.task(name="stage.lyrics")
+    def lyrics(job):
+        calls.append("lyrics")
+        return {"lyrics": {"stage": "lyrics", "key": "l"}}
+
+    @app.task(name="stage.transcribe")
+    def transcribe(results, job):
+        calls.append("transcribe")
+        return dict(results[0], **results[1], words={"stage": "words",
+                                                   "key": "w"})
+
+    @app.task(name="stage.chords")
+    def chords(results, job):
+        calls.append("chords")
+        return dict(results[0], **results[1], chords={"stage": "chords",
+                                                     "key": "c"})
+
+    @app.task(name="stage.assemble", bind=True)
+    def assemble(self, results, job):
+        refs = {}
+        for result in results:
+            refs.update(result)
+        return {"task_id": self.request.id, "refs": sorted(refs)}
+
+    @app.task(name="stage.failed")
+    def failed(request, exc, traceback, job):
+        pass
+
+    job_id = submit_job(app, "song.mp3", "Artist - Title.mp3", "abc")
+
+    assert calls[:2] == ["separate", "lyrics"]
+    result = app.AsyncResult(job_id).get()
+    assert result["task_id"] == job_id
+    assert result["refs"] == ["chords", "lyrics", "stems", "words"]
+
+
+def test_workers_preload_only_their_stage_models():
+    assert models_for_queues(["transcription"]) == ["whisper"]
+    assert models_for_queues(["alignment"]) == []
+    assert set(models_for_queues(["celery", "chords"])) == {
+        "demucs", "whisper", "madmom", "chroma", "lyrics"}
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.config import compute_type, inference_device
+from benchmarks.bench_startup import probe_import
+
+
+def test_api_imports_no_ml_libraries(tmp_path, monkeypatch):
+    # The probes inherit the environment: keep their files out of data/
+    store = tmp_path / "results.sqlite3"
+    monkeypatch.setenv("RESULT_STORE_FILE", str(store))
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path / "cache"))
+    for module in ("app.main", "workers.celery_app"):
+        assert probe_import(module)["heavy"] == [], module
+    # The result store is opened by the first request, not by the import
+    assert not store.exists()
+    print("✅ API startup passed!")
+
+
+def test_explicit_device_needs_no_probe():
+    cpu = SimpleNamespace(INFERENCE_DEVICE="cpu", COMPUTE_TYPE="auto")
+    assert (inference_device(cpu), compute_type(cpu)) == ("cpu", "int8")
+    gpu = SimpleNamespace(INFERENCE_DEVICE="cuda:1", COMPUTE_TYPE="auto")
+    assert compute_type(gpu) == "float16"
+    pinned = SimpleNamespace(INFERENCE_DEVICE="cuda", COMPUTE_TYPE="int8_float16")
+    assert compute_type(pinned) == "int8_float16"
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.buffer import AudioBuffer
+from app.services.chroma import FAST_SAMPLE_RATE, FastChordService
+from app.services.streaming import stream_chords
+from benchmarks.bench_pipeline import chord_accuracy
+from benchmarks.synth import SAMPLE_RATE, make_song, write_wav
+
+
+def test_windows_stitch_into_the_whole_track_result(tmp_path):
+    audio, truth = make_song(180, bpm=110, seed=5, vocals=False)
+    path = str(tmp_path / "no_vocals.wav")
+    write_wav(path, audio)
+    service = FastChordService()
+    whole = service.extract_chords(AudioBuffer.from_array(audio, SAMPLE_RATE))
+
+    decoded = []
+
+    def decode(mono, sample_rate):
+        decoded.append(len(mono) / sample_rate)
+        return service.decode(mono, sample_rate)
+
+    stem = AudioBuffer.from_file(path)
+    chords = stream_chords(decode, stem, FAST_SAMPLE_RATE, window=30,
+                           context=4)
+
+    # Chords come out before the rest of the file is read
+    first = next(chords)
+    assert first["timestamp"] < 2 and len(decoded) == 1
+    streamed = [first] + list(chords)
+
+    # Six windows of at most 30 + 2 * 4 seconds; the stem is never decoded whole
+    assert len(decoded) == 6 and max(decoded) <= 38.01
+    assert stem._samples is None
+
+    # One entry per chord change: no duplicates at window boundaries
+    labels = [c["label"] for c in streamed]
+    assert all(a != b for a, b in zip(labels, labels[1:]))
+    assert chord_accuracy(streamed, truth, 180) >= chord_accuracy(
+        whole, truth, 180) - 0.02
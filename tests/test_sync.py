@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.services.aligner import (AlignerService, _banded_lcs, encode_tokens,
+                                  match_tokens)
+
+CHORUS = "hold on to the light we found tonight and never let it go".split()
+
+
+def _repeated_chorus_song(verses=6, seed=0):
+    """
+    Verses with mostly unique words, each followed by the same chorus.
+    Returns (whisper_words, genius_text, true_start_per_genius_token).
+    """
+    rng = np.random.default_rng(seed)
+    truth = []
+    for verse in range(verses):
+        truth += [f"verse{verse}word{i}" for i in range(20)] + CHORUS
+
+    step = 0.5
+    whisper, genius, starts = [], [], []
+    for k, token in enumerate(truth):
+        r = rng.random()
+        # Genius spells it with case/punctuation; Whisper sometimes misses it
+        genius.append(token.capitalize() + "," if r < 0.1 else token)
+        starts.append(k * step)
+        if r > 0.95:
+            continue
+        whisper.append({"text": token, "start": k * step,
+                        "end": k * step + 0.4, "probability": 0.9})
+        if r < 0.03:
+            whisper.append({"text": "uh", "start": k * step + 0.45,
+                            "end": k * step + 0.48, "probability": 0.2})
+    return whisper, " ".join(genius), starts
+
+
+def test_lcs_is_exact_without_band():
+    a = np.array([1, 2, 3, 2, 1, 4], dtype=np.int32)
+    b = np.array([2, 3, 1, 4, 2], dtype=np.int32)
+    pairs = _banded_lcs(a, b, band=len(b))
+    assert len(pairs) == 4  # 2 3 1 4
+    assert all(a[i] == b[j] for i, j in pairs)
+
+
+def test_punctuation_is_normalized():
+    a, b = encode_tokens(["night", "go"], ["Night,", "go!"])
+    assert match_tokens(a, b) == [(0, 0), (1, 1)]
+
+
+def test_sync_beats_difflib_on_repeated_choruses():
+    # 200 verses is a live-recording length: anchors, not one big DP
+    for verses in (6, 200):
+        _check_against_difflib(*_repeated_chorus_song(verses))
+
+
+def _check_against_difflib(whisper, genius, starts):
+    results = {}
+    for engine in ("anchor", "difflib"):
+        synced = AlignerService(sync_engine=engine).sync_lyrics(whisper,
+                                                                genius)
+        # Every Genius token comes back, in order
+        assert [w["text"] for w in synced] == genius.split()
+        errors = np.abs(np.array([w["start"] for w in synced]) - starts)
+        results[engine] = (float(errors.mean()), int((errors < 1e-6).sum()))
+
+    anchor_error, anchor_exact = results["anchor"]
+    difflib_error, difflib_exact = results["difflib"]
+    assert anchor_error <= difflib_error
+    assert anchor_exact >= difflib_exact
+    assert anchor_exact >= 0.9 * len(starts)
+    print(f"✅ anchor: {results['anchor']}, difflib: {results['difflib']}")
@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.services.buffer import AudioBuffer
+from app.services.vocals import RegionMap, frame_features, vocal_regions
+from benchmarks.bench_vocals import coverage
+from benchmarks.synth import SAMPLE_RATE, make_vocal_stem
+
+
+def test_prepass_skips_intro_and_solo():
+    stem, truth = make_vocal_stem([(40, False), (30, True), (50, False),
+                                   (30, True)], bleed_db=-20)
+    mono = AudioBuffer.from_array(stem, SAMPLE_RATE).mono(16000)
+    regions = vocal_regions(mono, 16000)
+
+    result = coverage(regions, truth, 150)
+    assert result["recall"] > 0.98
+    assert result["sent_fraction"] < 0.5
+    assert len(regions) == 2
+    print("✅ Vocal pre-pass passed!")
+
+
+def test_region_map_restores_timestamps():
+    region_map = RegionMap([(40.0, 70.0), (120.0, 150.0)], gap=0.5)
+    compact = region_map.compact(np.ones(160 * 100, dtype=np.float32), 100)
+    assert len(compact) == int(round(region_map.seconds * 100)) == 6050
+
+    words = region_map.remap_words([
+        {"text": "hold", "start": 1.0, "end": 1.5},
+        {"text": "on", "start": 30.2, "end": 30.4},  # In the gap
+        {"text": "light", "start": 31.0, "end": 31.6},
+    ])
+    assert [(w["start"], w["end"]) for w in words] == [
+        (41.0, 41.5), (70.0, 70.0), (120.5, 121.1)]
+
+
+def test_strided_input_reads_the_right_samples():
+    x = np.random.default_rng(0).standard_normal(16000 * 4).astype(np.float32)
+    x *= np.linspace(0.01, 1, len(x), dtype=np.float32)
+    strided = x[::2]  # e.g. one channel of interleaved stereo
+    for got, want in zip(frame_features(strided, 16000),
+                         frame_features(np.ascontiguousarray(strided), 16000)):
+        assert np.allclose(got, want)
@@ -0,0 +1,25 @@
+# workers/celery_app.py
+from celery import Celery
+from app.core.config import settings
+from app.services.scheduler import PRIORITY_STEPS
+from workers.pipeline import TASK_ROUTES
+
+# Kept free of ML imports: the API sends tasks by name through this app.
+# The task modules (and with them Whisper, Demucs, madmom) are only
+# imported by workers: 'include' is read when a worker boots.
+
+celery_app = Celery("worker", broker=settings.CELERY_BROKER_URL,
+                    backend=settings.CELERY_RESULT_BACKEND,
+                    include=["workers.tasks", "workers.stages",
+                             "workers.live"])
+# Stage tasks go to their own queues; start a worker per queue with -Q
+celery_app.conf.task_routes = TASK_ROUTES
+# Children load every model in worker_process_init; Celery's default of
+# 4 seconds would kill them mid-load
+celery_app.conf.worker_proc_alive_timeout = settings.MODEL_PRELOAD_TIMEOUT
+# Priorities (interactive before bulk): Redis keeps one list per step.
+# Prefetching one job at a time keeps a child from reserving bulk work
+# while interactive jobs arrive behind it.
+celery_app.conf.broker_transport_options = {
+    "priority_steps": PRIORITY_STEPS, "queue_order_strategy": "priority"}
+celery_app.conf.worker_prefetch_multiplier = 1
@@ -0,0 +1,96 @@
+# workers/live.py
+import json
+import logging
+import time
+from functools import partial
+from types import SimpleNamespace
+from app.core.config import settings
+from app.core.metrics import LIVE_LAG_SECONDS, collect_stage_times
+from app.services.chroma import FAST_SAMPLE_RATE
+from app.services.harmony import MADMOM_SAMPLE_RATE
+from app.services.live import (END_OF_STREAM, LiveSession, live_audio_key,
+                               live_channel, pcm16_to_float)
+from workers.stages import _call, get_aligner, get_audio_engine
+from workers.tasks import celery_app, get_redis, record_result, registry
+
+logger = logging.getLogger(__name__)
+
+# One task per live session (WebSocket /live), on the 'live' queue: start
+# its workers with -Q live and a concurrency of the sessions they may run
+# at once. The API pushes the client's audio to live:{id}:audio; this task
+# analyzes it window by window and publishes the events to live:{id}:events.
+
+
+def _session() -> LiveSession:
+    chord_mode = settings.LIVE_CHORD_MODE
+    # _call: with PARALLEL_STAGES the models are stage worker processes
+    whisper = registry.get("live-whisper")
+    chords = registry.get("chroma" if chord_mode == "fast" else "madmom")
+    # Demucs on every window (LIVE_SEPARATION) only keeps up on a GPU
+    separate = (get_audio_engine().separate if settings.LIVE_SEPARATION
+                else None)
+    return LiveSession(
+        SimpleNamespace(transcribe=partial(_call, whisper, "transcribe")),
+        partial(_call, chords, "decode"),
+        FAST_SAMPLE_RATE if chord_mode == "fast" else MADMOM_SAMPLE_RATE,
+        separate=separate, sample_rate=settings.LIVE_SAMPLE_RATE,
+        aligner=get_aligner())
+
+
+@celery_app.task(name="live.session", bind=True)
+def live_session_task(self, session_id: str, title: str = None):
+    client = get_redis()
+    key, channel = live_audio_key(session_id), live_channel(session_id)
+    session = _session()
+    started = time.time()
+    first_chunk_at = None
+
+    def publish(event):
+        if first_chunk_at is not None and event.get("time") is not None:
+            # How far the results trail the audio the client sent
+            behind = time.time() - first_chunk_at - event["time"]
+            event["behind"] = round(max(0.0, behind), 3)
+            LIVE_LAG_SECONDS.observe(event["behind"])
+        client.publish(channel, json.dumps(event))
+
+    publish({"type": "ready"})
+    ended = False
+    rest = b""  # Half a sample left over from the last batch
+    try:
+        with collect_stage_times() as timings:
+            while not ended:
+                popped = client.blpop(key, timeout=settings.LIVE_IDLE_TIMEOUT)
+                if popped is None:
+                    logger.info(f"Live session {session_id} idle, closing")
+                    break
+                # Everything that queued up while the last update ran goes
+                # in at once: the analysis never falls more than one hop behind
+                chunks = [popped[1]] + (client.lpop(key, 1000) or [])
+                if first_chunk_at is None:
+                    first_chunk_at = time.time()
+                if END_OF_STREAM in chunks:
+                    chunks, ended = chunks[:chunks.index(END_OF_STREAM)], True
+                if chunks:
+                    samples, rest = pcm16_to_float(rest + b"".join(chunks))
+                    event = session.feed(samples)
+                    if event is not None:
+                        publish(event)
+            publish(session.finish())
+
+        job = {"file_path": title or "live", "original_name": title,
+               "chord_mode": settings.LIVE_CHORD_MODE,
+               "plan": {"whisper_model": settings.LIVE_WHISPER_MODEL,
+                        "beam_size": settings.LIVE_BEAM_SIZE,
+                        "compute_type": settings.LIVE_COMPUTE_TYPE}}
+        timings["total"] = round(time.time() - started, 3)
+        record_result(f"live-{session_id}", job, result=session.result,
+                      timings=timings)
+        return {"status": "SUCCESS", "seconds": session.stream_seconds}
+    except Exception as e:
+        logger.error(f"Live session {session_id} failed: {e}")
+        print(f"DEBUG: Live session failed: {e}", flush=True)
+        publish({"type": "error", "message": str(e)})
+        raise
+    finally:
+        client.delete(key)
+        client.publish(channel, json.dumps({"type": "closed"}))
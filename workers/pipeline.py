@@ -0,0 +1,97 @@
+# workers/pipeline.py
+import uuid
+from celery import chord, group
+from app.core.config import settings
+
+# Kept free of ML imports: the API builds the workflow from task names.
+#
+# PIPELINE_MODE=stages runs each step as its own Celery task on its own
+# queue, so every stage scales (and retries) independently:
+#
+#   group(separate, lyrics) -> group(transcribe, chords) -> assemble
+#
+# Stems, words and chords stay in the result cache; tasks pass references
+# ({"stage", "key"}) so audio never goes through Redis.
+
+QUEUES = {
+    "stage.separate": "separation",
+    "stage.lyrics": "lyrics",
+    "stage.transcribe": "transcription",
+    "stage.chords": "chords",
+    "stage.assemble": "alignment",
+    "stage.failed": "alignment",
+    "live.session": "live",
+}
+
+# Celery routing table (task name -> queue); process_audio_task stays on
+# the default 'celery' queue
+TASK_ROUTES = {name: {"queue": queue} for name, queue in QUEUES.items()}
+
+# Models a worker needs for the queues it consumes (see MODEL_PRELOAD)
+QUEUE_MODELS = {
+    "celery": ["demucs", "whisper", "madmom", "chroma", "lyrics"],
+    "separation": ["demucs"],
+    "lyrics": ["lyrics"],
+    "transcription": ["whisper"],
+    "chords": ["madmom", "chroma"],
+    "alignment": [],
+    "live": ["live-whisper", "chroma"],
+}
+
+
+def models_for_queues(queues) -> list:
+    models = []
+    for queue in queues:
+        for model in QUEUE_MODELS.get(queue, []):
+            if model not in models:
+                models.append(model)
+    return models
+
+
+def submit_job(celery_app, file_path: str, original_name: str = None,
+               audio_hash: str = None, enqueued_at: float = None,
+               chord_mode: str = None, task_id: str = None,
+               priority: int = None, plan: dict = None) -> str:
+    """
+    Enqueues one song and returns its job id ('task_id' if given, e.g. by
+    the scheduler, otherwise a new one).
+
+    Monolithic mode: the id of process_audio_task. Stage mode: the id given
+    to the final 'assemble' task, so /status and /sheet read its result like
+    before; every stage publishes progress under this same id.
+    'priority' (0 = first, see app/services/scheduler.py) applies to every
+    stage, 'plan' (see app/services/policy.py) to the stages it configures.
+    """
+    job = {"file_path": file_path, "original_name": original_name,
+           "audio_hash": audio_hash, "enqueued_at": enqueued_at,
+           "chord_mode": chord_mode, "plan": plan}
+
+    if settings.PIPELINE_MODE != "stages":
+        task = celery_app.send_task("process_audio_task", args=[file_path],
+                                    kwargs={k: v for k, v in job.items()
+                                            if k != "file_path"},
+                                    task_id=task_id, priority=priority)
+        return task.id
+
+    job_id = task_id or str(uuid.uuid4())
+    job["job_id"] = job_id
+
+    failed = celery_app.signature("stage.failed", kwargs={"job": job},
+                                  queue=QUEUES["stage.failed"])
+
+    def stage(name, **options):
+        # Every stage reports its own failure: a failed chord header never
+        # reaches the final task, whose result the client is waiting on
+        return celery_app.signature(name, kwargs={"job": job},
+                                    queue=QUEUES[name], link_error=[failed],
+                                    priority=priority, **options)
+
+    # A chord hands its group's results list to the next step; nesting
+    # them gives group -> group -> task
+    workflow = chord(
+        group(stage("stage.separate"), stage("stage.lyrics")),
+        chord(group(stage("stage.transcribe"), stage("stage.chords")),
+              stage("stage.assemble", task_id=job_id)),
+    )
+    workflow.apply_async()
+    return job_id
@@ -0,0 +1,236 @@
+# workers/stages.py
+import logging
+import time
+from celery import Task
+from app.core.config import settings
+from app.core.metrics import (QUEUE_WAIT_SECONDS, TASK_SECONDS,
+                              collect_stage_times)
+from app.services.aligner import AlignerService
+from app.services.assembly import assemble_sheet
+from app.services.audio import AudioEngine
+from app.services.buffer import AudioBuffer
+from app.services.cache import (ResultCache, fingerprint,
+                                stage_fingerprints)
+from app.services.ingest import parse_filename
+from app.services.orchestrator import fetch_lyrics, whisper_model
+from app.services.parallel import StageWorker, wait_for
+from app.services.policy import whisper_params
+from app.services.progress import JobCancelled, ProgressReporter
+from workers.tasks import (celery_app, job_cancelled, make_progress_reporter,
+                           record_result, registry, report_job)
+
+logger = logging.getLogger(__name__)
+
+# One task per pipeline stage (PIPELINE_MODE=stages, see workers/pipeline.py).
+# Each task gets the job dict and the merged artifact references of the
+# stages before it, and returns them plus its own:
+#   {"stems": ref, "lyrics": ref, "words": ref, "chords": ref,
+#    "timings": {stage: seconds}}
+# A ref is {"stage", "key"} into the shared result cache (CACHE_DIR must be
+# a volume every stage worker mounts).
+
+# Per-process services, created on first use like the generator
+_cache = None
+_audio_engine = None
+_aligner = None
+
+
+def get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache(settings.CACHE_DIR,
+                             max_bytes=settings.CACHE_MAX_BYTES,
+                             enabled=settings.CACHE_ENABLED)
+    return _cache
+
+
+def get_audio_engine() -> AudioEngine:
+    global _audio_engine
+    if _audio_engine is None:
+        demucs = (registry.get("demucs") if settings.DEMUCS_IN_PROCESS
+                  else None)
+        _audio_engine = AudioEngine(cache=get_cache(), model=demucs)
+    return _audio_engine
+
+
+def get_aligner() -> AlignerService:
+    global _aligner
+    if _aligner is None:
+        _aligner = AlignerService()
+    return _aligner
+
+
+def _call(service, method: str, *args, progress: ProgressReporter = None):
+    # PARALLEL_STAGES registers the models as stage worker processes; one
+    # past STAGE_TIMEOUT_SECONDS or of a cancelled job is killed
+    if isinstance(service, StageWorker):
+        return wait_for(service.submit(method, *args),
+                        settings.STAGE_TIMEOUT_SECONDS or None,
+                        progress.checkpoint if progress else None, service)
+    return getattr(service, method)(*args)
+
+
+def _merge(results) -> dict:
+    refs, timings = {}, {}
+    for result in results:
+        timings.update(result.get("timings", {}))
+        refs.update(result)
+    refs["timings"] = timings
+    return refs
+
+
+def _stem_buffer(refs: dict, name: str) -> AudioBuffer:
+    files = get_cache().artifact_files(refs["stems"], AudioEngine.STEM_FILES)
+    return AudioBuffer.from_file(files[name])
+
+
+class StageTask(Task):
+    # Transient errors (a full disk, a dropped connection) retry only this
+    # stage; acks_late re-queues it if the worker dies mid-task
+    autoretry_for = (OSError, ConnectionError)
+    retry_backoff = True
+    max_retries = settings.STAGE_MAX_RETRIES
+    acks_late = True
+    soft_time_limit = settings.STAGE_TIMEOUT_SECONDS or None
+    time_limit = (settings.STAGE_TIMEOUT_SECONDS + 60
+                  if settings.STAGE_TIMEOUT_SECONDS else None)
+
+    def __call__(self, *args, **kwargs):
+        # Stages of a cancelled job (DELETE /jobs/{id}) fail before they
+        # start; stage.failed records it like any other error
+        if job_cancelled(kwargs["job"]["job_id"]):
+            raise JobCancelled()
+        # The job is alive: keep its dedupe key past the wait between stages
+        report_job(kwargs["job"]["job_id"], "heartbeat")
+        return super().__call__(*args, **kwargs)
+
+
+@celery_app.task(name="stage.separate", bind=True, base=StageTask)
+def separate_task(self, job: dict):
+    if job.get("enqueued_at") and not self.request.retries:
+        QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - job["enqueued_at"]))
+    if not self.request.retries:
+        report_job(job["job_id"], "started")
+    progress = make_progress_reporter(self, job["job_id"])
+    progress.update("separation", "Splitting stems")
+
+    engine = get_audio_engine()
+    # store=True: the next stages read the WAVs, even with the cache disabled
+    with collect_stage_times() as timings:
+        stems = engine.split_stems(job["file_path"],
+                                   audio_hash=job["audio_hash"], store=True,
+                                   checkpoint=progress.checkpoint)
+    for stem in stems.values():
+        stem.release()
+    return {"stems": ResultCache.artifact_ref(
+        "stems", engine.stems_key(job["audio_hash"])), "timings": timings}
+
+
+@celery_app.task(name="stage.lyrics", bind=True, base=StageTask)
+def lyrics_task(self, job: dict):
+    artist, title = parse_filename(job["original_name"] or job["file_path"])
+    with collect_stage_times() as timings:
+        full_text, prompt = fetch_lyrics(registry.get("lyrics"), artist,
+                                         title)
+
+    key = get_cache().key(job["audio_hash"], "lyrics",
+                          fingerprint(artist=artist, title=title))
+    get_cache().put_json("lyrics", key, {"text": full_text, "prompt": prompt})
+    return {"lyrics": ResultCache.artifact_ref("lyrics", key),
+            "timings": timings}
+
+
+@celery_app.task(name="stage.transcribe", bind=True, base=StageTask)
+def transcribe_task(self, results: list, job: dict):
+    refs = _merge(results)
+    cache = get_cache()
+    prompt = cache.load_artifact(refs["lyrics"])["prompt"]
+
+    # The Genius prompt steers Whisper, so it is part of the key
+    plan = job.get("plan")
+    key = cache.key(job["audio_hash"], "words",
+                    fingerprint(words=stage_fingerprints(
+                        settings, plan=plan)["words"], prompt=prompt))
+    if cache.get_json("words", key) is None:
+        progress = make_progress_reporter(self, job["job_id"])
+        progress.update("transcription", "Transcribing vocals")
+        vocals = _stem_buffer(refs, "vocals")
+        with collect_stage_times() as timings:
+            words = _call(registry.get(whisper_model(registry, plan)),
+                          "transcribe", vocals, prompt,
+                          whisper_params(settings, plan)["beam_size"],
+                          progress=progress)
+        refs["timings"].update(timings)
+        vocals.release()
+        cache.put_json("words", key, words)
+    return dict(refs, words=ResultCache.artifact_ref("words", key))
+
+
+@celery_app.task(name="stage.chords", bind=True, base=StageTask)
+def chords_task(self, results: list, job: dict):
+    refs = _merge(results)
+    cache = get_cache()
+
+    chord_mode = job.get("chord_mode") or settings.CHORD_MODE
+    key = cache.key(job["audio_hash"], "chords",
+                    stage_fingerprints(settings, chord_mode)["chords"])
+    if cache.get_json("chords", key) is None:
+        progress = make_progress_reporter(self, job["job_id"])
+        progress.update("chords", "Extracting chords")
+        other = _stem_buffer(refs, "other")
+        service = registry.get("chroma" if chord_mode == "fast" else "madmom")
+        with collect_stage_times() as timings:
+            chords = _call(service, "extract_chords", other,
+                           progress=progress)
+        refs["timings"].update(timings)
+        other.release()
+        cache.put_json("chords", key, chords)
+    return dict(refs, chords=ResultCache.artifact_ref("chords", key))
+
+
+@celery_app.task(name="stage.assemble", bind=True, base=StageTask)
+def assemble_task(self, results: list, job: dict):
+    refs = _merge(results)
+    cache = get_cache()
+    progress = make_progress_reporter(self, job["job_id"])
+
+    artist, title = parse_filename(job["original_name"] or job["file_path"])
+    lyrics = cache.load_artifact(refs["lyrics"])
+    timings = refs["timings"]
+    with collect_stage_times() as tail_timings:
+        result = assemble_sheet(get_aligner(),
+                                cache.load_artifact(refs["words"]),
+                                cache.load_artifact(refs["chords"]),
+                                lyrics["text"], progress)
+    cache.put_json("sheet", cache.sheet_key(job["audio_hash"], settings,
+                                            artist, title,
+                                            job.get("chord_mode"),
+                                            job.get("plan")), result)
+
+    timings.update(tail_timings)
+    if job.get("enqueued_at"):
+        timings["total"] = round(time.time() - job["enqueued_at"], 3)
+    record_result(job["job_id"], job, result=result, timings=timings)
+
+    progress.update("done", "Sheet ready",
+                    partial={"sheet_text": result["sheet_text"]})
+    if job.get("enqueued_at"):
+        TASK_SECONDS.labels("success").observe(time.time() - job["enqueued_at"])
+    return {"status": "SUCCESS", "sheet_text": result["sheet_text"],
+            "sheet": result["sheet"]}
+
+
+@celery_app.task(name="stage.failed", bind=True)
+def stage_failed_task(self, request, exc, traceback, job: dict):
+    """
+    Error callback of every stage (runs in the worker of the failed stage).
+    Stores the same ERROR result process_audio_task returns under the job id.
+    """
+    logger.error(f"Stage {request.task} failed for {job['job_id']}: {exc}")
+    print(f"DEBUG: CRITICAL FAILURE in {request.task}: {exc}", flush=True)
+    make_progress_reporter(self, job["job_id"]).update("error", str(exc))
+    celery_app.backend.store_result(
+        job["job_id"], {"status": "ERROR", "message": str(exc)}, "SUCCESS")
+    record_result(job["job_id"], job, error=str(exc))
+    if job.get("enqueued_at"):
+        TASK_SECONDS.labels("error").observe(time.time() - job["enqueued_at"])
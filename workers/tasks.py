@@ -1,21 +1,99 @@
 # workers/tasks.py
 import os
+import json
 import logging
-from celery import Celery
+import time
+import redis
+from celery.signals import (worker_init, worker_process_init,
+                            worker_process_shutdown)
 from pathlib import Path
 from app.core.config import settings
-from app.services.orchestrator import ChordSheetGenerator
+from app.core.metrics import (QUEUE_WAIT_SECONDS, TASK_SECONDS,
+                              collect_stage_times, mark_process_dead,
+                              model_load_timer, serve_metrics)
+from app.services.cache import stage_fingerprints
+from app.services.ingest import parse_filename
+from app.services.orchestrator import ChordSheetGenerator, register_models
+from app.services.progress import (JobCancelled, ProgressReporter,
+                                   cancel_key, progress_channel)
+from app.services.registry import ModelRegistry, recommend_concurrency
+from app.services.results import ResultStore
+from app.services.scheduler import JobScheduler
+from workers.celery_app import celery_app
+from workers.pipeline import models_for_queues
 
 logger = logging.getLogger(__name__)
 
-celery_app = Celery("worker", broker=settings.CELERY_BROKER_URL,
-                    backend=settings.CELERY_RESULT_BACKEND)
-
 # --- FIX: Initialize as None (Lazy Loading) ---
 # We do not instantiate the generator globally. This prevents the
 # "Fork Safety" deadlock where the model loads in the parent process
 # and hangs when the worker process tries to use it.
 generator = None
+redis_client = None
+result_store = None
+scheduler = None
+
+# Factories only: nothing is loaded until preload or the first job
+registry = register_models(ModelRegistry(settings.MODEL_FOOTPRINTS_FILE))
+
+# Seconds between the scheduler heartbeats of a running job
+HEARTBEAT_SECONDS = 60.0
+
+
+def worker_queues() -> list:
+    """The queues this worker consumes (WORKER_QUEUES, comma-separated)."""
+    return [q.strip() for q in settings.WORKER_QUEUES.split(",") if q.strip()]
+
+
+def worker_models() -> list:
+    """Models needed by the queues this worker consumes."""
+    return [name for name in models_for_queues(worker_queues())
+            if name in registry.names()]
+
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    # One exporter in the main worker process; with PROMETHEUS_MULTIPROC_DIR
+    # set it aggregates the samples of every child process.
+    if settings.WORKER_METRICS_PORT:
+        serve_metrics(settings.WORKER_METRICS_PORT)
+
+
+@worker_init.connect
+def preload_shared_models(**kwargs):
+    """
+    Parent process, before the fork: only fork-safe models (madmom, the
+    lyrics service). Children inherit them copy-on-write instead of each
+    loading a private copy.
+    """
+    sizing = recommend_concurrency()
+    logger.info(f"Worker sizing: {sizing}")
+    print(f"DEBUG: Recommended worker concurrency: {sizing['recommended']} "
+          f"(limited by {sizing['limited_by']})", flush=True)
+    if settings.MODEL_PRELOAD and worker_models():
+        registry.preload(worker_models(), fork_safe_only=True)
+
+
+@worker_process_init.connect
+def preload_models(**kwargs):
+    # FIX: Runs in each child right after the fork, so torch/CTranslate2
+    # thread pools are created in the process that uses them (no deadlock)
+    # and the first job no longer pays the model load.
+    if not settings.MODEL_PRELOAD:
+        return
+    if "celery" in worker_queues():
+        get_generator()
+    elif worker_models():
+        # Stage worker: only the model of its own stage
+        registry.preload(worker_models())
+    logger.info(f"Models ready: {registry.report()}")
+
+
+@worker_process_shutdown.connect
+def release_process_metrics(pid=None, **kwargs):
+    if generator is not None:
+        generator.close()
+    mark_process_dead(pid or os.getpid())
 
 
 def get_generator():
@@ -27,47 +105,160 @@ def get_generator():
     if generator is None:
         logger.info("Initializing ChordSheetGenerator (Lazy Load)...")
         print("DEBUG: Loading AI Models inside worker process...", flush=True)
-        generator = ChordSheetGenerator()
+        with model_load_timer("generator"):
+            generator = ChordSheetGenerator(registry)
     return generator
 
 
-def parse_filename(file_path: str):
+def get_redis():
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.Redis.from_url(settings.CELERY_RESULT_BACKEND)
+    return redis_client
+
+
+def get_scheduler():
+    global scheduler
+    if scheduler is None and settings.SCHEDULER_ENABLED:
+        # Between heartbeats a job spends at most one stage (checkpoints
+        # run before each stage and while waiting on one)
+        lease = (settings.STAGE_TIMEOUT_SECONDS + 2 * HEARTBEAT_SECONDS
+                 if settings.STAGE_TIMEOUT_SECONDS else None)
+        scheduler = JobScheduler(
+            get_redis(), inflight_ttl=settings.SCHEDULER_INFLIGHT_TTL,
+            client_share=settings.SCHEDULER_CLIENT_SHARE,
+            default_job_seconds=settings.SCHEDULER_DEFAULT_JOB_SECONDS,
+            lease_seconds=lease)
+    return scheduler
+
+
+def report_job(job_id: str, event: str):
     """
-    Extracts Artist and Title safely.
+    Tells the scheduler a job 'started', is still alive ('heartbeat') or
+    'finished' (best effort).
     """
-    file_stem = Path(file_path).stem
+    if not job_id or get_scheduler() is None:
+        return
+    try:
+        getattr(get_scheduler(), event)(job_id)
+    except Exception as e:
+        logger.warning(f"Scheduler update failed for {job_id}: {e}")
+
 
-    if "_-_" in file_stem:
-        parts = file_stem.split("_-_", 1)
-        return parts[0].strip(), parts[1].strip()
+def get_result_store():
+    global result_store
+    if result_store is None and settings.RESULT_STORE_FILE:
+        result_store = ResultStore(settings.RESULT_STORE_FILE)
+    return result_store
 
-    for sep in [" - ", " – "]:
-        if sep in file_stem:
-            parts = file_stem.split(sep, 1)
-            return parts[0].strip(), parts[1].strip()
 
-    return "Unknown Artist", file_stem
+def record_result(job_id: str, job: dict, result: dict = None,
+                  error: str = None, timings: dict = None):
+    """
+    Saves a finished job (both pipeline modes): a result store row and,
+    with SHEET_EXPORTS, the old {name}_final_sheet.txt/.json files. The
+    scheduler releases the job, so the next upload of the song runs again
+    (or hits the result cache).
+    """
+    name = job.get("original_name") or job["file_path"]
+    artist, title = parse_filename(name)
 
+    if result is not None and settings.SHEET_EXPORTS:
+        file_stem = Path(name).stem
+        with open(os.path.join(settings.PROCESSED_DATA_PATH,
+                               f"{file_stem}_final_sheet.txt"),
+                  "w", encoding="utf-8") as f:
+            f.write(result["sheet_text"])
+        with open(os.path.join(settings.PROCESSED_DATA_PATH,
+                               f"{file_stem}_final_sheet.json"),
+                  "w", encoding="utf-8") as f:
+            json.dump(result["sheet"], f)
 
-@celery_app.task(name="process_audio_task")
-def process_audio_task(file_path: str):
+    report_job(job_id, "finished")
+    store = get_result_store()
+    if store is None or not job_id:
+        # Called directly (not through Celery): no job id to file it under
+        return
+    try:
+        store.put(job_id, "ERROR" if error is not None else "SUCCESS",
+                  audio_hash=job.get("audio_hash"), artist=artist,
+                  title=title, original_name=job.get("original_name"),
+                  chord_mode=job.get("chord_mode"),
+                  enqueued_at=job.get("enqueued_at"), result=result,
+                  error=error, timings=timings,
+                  fingerprints=stage_fingerprints(settings,
+                                                  job.get("chord_mode"),
+                                                  job.get("plan")))
+    except Exception as e:
+        # The Celery result still has the sheet; the row is best effort
+        logger.error(f"Result store write failed for {job_id}: {e}")
+        print(f"DEBUG: Result store write failed: {e}", flush=True)
+
+
+def job_cancelled(job_id: str) -> bool:
+    """Whether DELETE /jobs/{job_id} was called for the job."""
+    return bool(job_id) and bool(get_redis().exists(cancel_key(job_id)))
+
+
+def make_progress_reporter(task, task_id: str = None) -> ProgressReporter:
+    """
+    Progress events go to two places:
+    - the task state (PROGRESS + meta), for clients polling /status
+    - a Redis pub/sub channel, for clients streaming /events
+    Its checkpoints stop the job once the client cancelled it.
+    Stage tasks pass the job id: clients only know the id of the last stage.
+    """
+    task_id = task_id or task.request.id
+    if not task_id:
+        # Called directly (not through Celery): nobody is listening
+        return ProgressReporter()
+
+    def publish(event):
+        task.update_state(task_id=task_id, state="PROGRESS", meta=event)
+        get_redis().publish(progress_channel(task_id), json.dumps(event))
+
+    last_heartbeat = [time.time()]
+
+    def cancelled():
+        # Checkpoints double as the scheduler heartbeat
+        if time.time() - last_heartbeat[0] >= HEARTBEAT_SECONDS:
+            last_heartbeat[0] = time.time()
+            report_job(task_id, "heartbeat")
+        return job_cancelled(task_id)
+
+    return ProgressReporter(publish, cancelled=cancelled)
+
+
+# Past the soft limit the task fails like any error (SoftTimeLimitExceeded);
+# the hard limit kills a child stuck in native code
+@celery_app.task(name="process_audio_task", bind=True,
+                 soft_time_limit=settings.TASK_SOFT_TIME_LIMIT or None,
+                 time_limit=settings.TASK_TIME_LIMIT or None)
+def process_audio_task(self, file_path: str, original_name: str = None,
+                       audio_hash: str = None, enqueued_at: float = None,
+                       chord_mode: str = None, plan: dict = None):
+    started = time.time()
+    if enqueued_at:
+        QUEUE_WAIT_SECONDS.observe(max(0.0, started - enqueued_at))
+
+    report_job(self.request.id, "started")
+    progress = make_progress_reporter(self)
+    job = {"file_path": file_path, "original_name": original_name,
+           "audio_hash": audio_hash, "enqueued_at": enqueued_at,
+           "chord_mode": chord_mode, "plan": plan}
     try:
         # --- FIX: Get the generator safely ---
         # This triggers the model load on the first run, inside the correct process.
         gen = get_generator()
 
-        artist, title = parse_filename(file_path)
-        file_stem = Path(file_path).stem
-
-        output_filename = f"{file_stem}_final_sheet.txt"
-        output_path = os.path.join(settings.PROCESSED_DATA_PATH,
-                                   output_filename)
+        # Uploads are stored under their content hash, so the artist/title
+        # guess comes from the name the client sent
+        artist, title = parse_filename(original_name or file_path)
+        file_stem = Path(original_name or file_path).stem
 
-        # Deduplication check
-        if os.path.exists(output_path):
-            print(f"DEBUG: File already exists at {output_path}", flush=True)
-            with open(output_path, "r", encoding="utf-8") as f:
-                return {"status": "SUCCESS", "sheet_text": f.read()}
+        # Deduplication is done by the generator's content-addressed cache:
+        # the same audio under any filename is a cache hit, and two songs
+        # that share a filename no longer collide.
 
         logger.info(f"Processing: {artist} - {title} (Folder: {file_stem})")
 
@@ -75,20 +266,36 @@ def process_audio_task(file_path: str):
               flush=True)
 
         # Use 'gen' instead of the global 'generator'
-        sheet_text = gen.process_song(file_path, artist=artist,
-                                      title=title)
+        with collect_stage_times() as timings:
+            result = gen.process_song(file_path, artist=artist,
+                                      title=title, audio_hash=audio_hash,
+                                      progress=progress,
+                                      chord_mode=chord_mode, plan=plan)
+        sheet_text = result["sheet_text"]
 
         print(
             f"DEBUG: 2. Finished generator.process_song! Length: {len(sheet_text)}",
             flush=True)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(sheet_text)
+        timings["total"] = round(time.time() - started, 3)
+        record_result(self.request.id, job, result=result,
+                      timings=timings)
 
-        return {"status": "SUCCESS", "sheet_text": sheet_text}
+        # The structured sheet can be large: clients fetch it from /sheet.
+        # Without the result store /sheet reads the Celery result, which is
+        # only stored after this returns: clients retry its 404s
+        progress.update("done", "Sheet ready",
+                        partial={"sheet_text": sheet_text})
+        TASK_SECONDS.labels("success").observe(time.time() - started)
+        return {"status": "SUCCESS", "sheet_text": sheet_text,
+                "sheet": result["sheet"]}
 
     except Exception as e:
         logger.error(f"Task failed: {str(e)}")
         print(f"DEBUG: CRITICAL FAILURE: {str(e)}",
               flush=True)
+        record_result(self.request.id, job, error=str(e))
+        progress.update("error", str(e))
+        TASK_SECONDS.labels("cancelled" if isinstance(e, JobCancelled)
+                            else "error").observe(time.time() - started)
         return {"status": "ERROR", "message": str(e)}
\ No newline at end of file